@@ -1,348 +1,3198 @@
 import base64
+import codecs
+import contextlib
+import math
+import os
+import queue
+import sys
+import threading
+import time
 import zlib
 import json
-import tkinter as tk
-from tkinter import scrolledtext, messagebox
+from array import array
+from bisect import bisect_left, insort
+from itertools import chain, compress, islice, repeat
+from operator import contains, is_not, ne, not_
+from collections import Counter, OrderedDict, deque
 
-def parse_blueprint(blueprint_string):
+# Everything outside parsing and analysis (tkinter, the server in server.py, process
+# pools, hashing and tracemalloc) is imported where it is used, so headless runs start
+# quickly
+
+class StageProfiler:
+    # Records wall time, entity count and, with trace_memory, peak traced allocation for
+    # each named stage of parsing and analysis. Pass one to parse_blueprint and
+    # run_analysis; the results dict then carries as_dict() under 'timings'.
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.stages = {}
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        timing = self.stages.setdefault(name, {'seconds': 0.0, 'calls': 0})
+        if self.trace_memory:
+            import tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        try:
+            yield timing
+        finally:
+            timing['seconds'] += time.perf_counter() - started
+            timing['calls'] += 1
+            if self.trace_memory:
+                peak = tracemalloc.get_traced_memory()[1] - baseline
+                timing['peak_bytes'] = max(timing.get('peak_bytes', 0), peak)
+
+    def as_dict(self):
+        return {name: dict(timing) for name, timing in self.stages.items()}
+
+
+class _NullProfiler:
+    def stage(self, name):
+        return contextlib.nullcontext({})
+
+
+NULL_PROFILER = _NullProfiler()
+
+
+def parse_blueprint(blueprint_string, profiler=None):
+    stages = profiler or NULL_PROFILER
+    
     # Remove version number (the '0' at the start)
     if blueprint_string.startswith('0'):
         blueprint_string = blueprint_string[1:]
     
     # Decode from base64
-    compressed_data = base64.b64decode(blueprint_string)
+    with stages.stage('base64_decode'):
+        compressed_data = base64.b64decode(blueprint_string)
     
     # Decompress using zlib
-    decompressed_data = zlib.decompress(compressed_data)
+    with stages.stage('zlib_inflate'):
+        decompressed_data = zlib.decompress(compressed_data)
     
     # Load JSON data
-    blueprint_json = json.loads(decompressed_data)
+    with stages.stage('json_load') as timing:
+        blueprint_json = json.loads(decompressed_data)
+    if profiler is not None and isinstance(blueprint_json, dict) and isinstance(blueprint_json.get('blueprint'), dict):
+        timing['entities'] = len(blueprint_json['blueprint'].get('entities', []))
     
     return blueprint_json
 
-def analyze_space_efficiency(blueprint_data):
-    entities = blueprint_data['blueprint'].get('entities', [])
-    
-    # Create a grid or spatial index for quick neighbor lookups
-    entity_positions = {}
-    for entity in entities:
-        pos = (entity['position']['x'], entity['position']['y'])
-        entity_positions[pos] = entity['name']
+STREAM_CHUNK_SIZE = 1 << 16
+
+_JSON_DECODER = json.JSONDecoder()
+
+
+def _iter_source_chunks(blueprint_source, chunk_size):
+    # Accepts either the blueprint string itself or a text file object holding it
+    if isinstance(blueprint_source, str):
+        for start in range(0, len(blueprint_source), chunk_size):
+            yield blueprint_source[start:start + chunk_size]
+    else:
+        while True:
+            chunk = blueprint_source.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+def iter_blueprint_text(blueprint_source, chunk_size=STREAM_CHUNK_SIZE):
+    # Streaming equivalent of the decode steps in parse_blueprint: yields the blueprint
+    # JSON text in pieces, never holding more than about one chunk of each stage
+    decompressor = zlib.decompressobj()
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    pending = ''
+    version_checked = False
+    for chunk in _iter_source_chunks(blueprint_source, chunk_size):
+        pending += ''.join(chunk.split())
+        if not version_checked:
+            if not pending:
+                continue
+            # Remove version number (the '0' at the start)
+            if pending.startswith('0'):
+                pending = pending[1:]
+            version_checked = True
+        
+        # Base64 only decodes cleanly in groups of four characters
+        usable = len(pending) - len(pending) % 4
+        compressed_data = base64.b64decode(pending[:usable])
+        pending = pending[usable:]
+        while compressed_data:
+            text = text_decoder.decode(decompressor.decompress(compressed_data, chunk_size * 4))
+            if text:
+                yield text
+            compressed_data = decompressor.unconsumed_tail
     
-    suggestions = []
-    for entity in entities:
+    compressed_data = base64.b64decode(pending)
+    text = text_decoder.decode(decompressor.decompress(compressed_data) + decompressor.flush(), final=True)
+    if text:
+        yield text
+
+
+class _JSONStream:
+    # Pull parser over JSON text arriving in chunks. Values are decoded whole with
+    # raw_decode, except objects and arrays the caller walks member by member, so only
+    # one such value is buffered at a time.
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.buffer = ''
+        self.position = 0
+
+    def _read_more(self):
+        chunk = next(self.chunks, None)
+        if chunk is None:
+            return False
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+        return True
+
+    def peek(self):
+        # The next non-whitespace character, without consuming it
+        while True:
+            buffer = self.buffer
+            position = self.position
+            while position < len(buffer) and buffer[position] in ' \t\r\n':
+                position += 1
+            self.position = position
+            if position < len(buffer):
+                return buffer[position]
+            if not self._read_more():
+                raise ValueError("Blueprint JSON ended unexpectedly")
+
+    def take(self, expected):
+        character = self.peek()
+        if character not in expected:
+            raise ValueError(f"Expected one of {expected!r} in the blueprint JSON, found {character!r}")
+        self.position += 1
+        return character
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = _JSON_DECODER.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError:
+                # Most likely the value is split across chunks; fetch more and retry
+                if not self._read_more():
+                    raise
+                continue
+            # A number running up to the end of the buffer may continue in the next chunk
+            if end == len(self.buffer) and self._read_more():
+                continue
+            self.position = end
+            return value
+
+    def members(self):
+        # Yields the keys of the object at the current position. The caller consumes
+        # each value before asking for the next key.
+        self.take('{')
+        if self.peek() == '}':
+            self.position += 1
+            return
+        while True:
+            key = self.value()
+            self.take(':')
+            yield key
+            if self.take(',}') == '}':
+                return
+
+    def elements(self):
+        # Like members, for the array at the current position
+        self.take('[')
+        if self.peek() == ']':
+            self.position += 1
+            return
+        while True:
+            yield
+            if self.take(',]') == ']':
+                return
+
+
+def iter_blueprint_events(blueprint_source, chunk_size=STREAM_CHUNK_SIZE):
+    # Walks a blueprint or blueprint book as it is decoded, yielding:
+    #   ('start', blueprint)  when a blueprint begins
+    #   ('entity', entity)    for each of its entities
+    #   ('end', blueprint)    when it ends, its other fields ('version', 'wires', ...) now filled in
+    #   ('document', data)    last, the whole document without entities or tiles
+    # Both blueprint events carry the same dict, the one the document holds.
+    # Only one entity is held at a time; everything else is small next to them.
+    stream = _JSONStream(iter_blueprint_text(blueprint_source, chunk_size))
+    document = yield from _stream_item(stream)
+    yield 'document', document
+
+
+def _stream_item(stream):
+    # An object holding a blueprint or a book: the document itself or a book entry
+    item = {}
+    for key in stream.members():
+        if key == 'blueprint':
+            item[key] = yield from _stream_blueprint(stream)
+        elif key == 'blueprint_book':
+            item[key] = yield from _stream_book(stream)
+        else:
+            item[key] = stream.value()
+    return item
+
+
+def _stream_blueprint(stream):
+    blueprint = {}
+    yield 'start', blueprint
+    for key in stream.members():
+        if key == 'entities':
+            for _ in stream.elements():
+                yield 'entity', stream.value()
+        elif key == 'tiles':
+            # Not analyzed, and as numerous as entities in some designs
+            for _ in stream.elements():
+                stream.value()
+        else:
+            blueprint[key] = stream.value()
+    yield 'end', blueprint
+    return blueprint
+
+
+def _stream_book(stream):
+    book = {}
+    for key in stream.members():
+        if key == 'blueprints':
+            entries = book[key] = []
+            for _ in stream.elements():
+                entries.append((yield from _stream_item(stream)))
+        else:
+            book[key] = stream.value()
+    return book
+
+
+def iter_blueprint_entities(blueprint_source, chunk_size=STREAM_CHUNK_SIZE):
+    # Yields entity dicts one at a time from the blueprint, or from each blueprint of a
+    # book in turn, without materialising the whole JSON document
+    for kind, value in iter_blueprint_events(blueprint_source, chunk_size):
+        if kind == 'entity':
+            yield value
+
+
+def is_blueprint_book(blueprint_source):
+    # Whether a blueprint string holds a book, from the first decoded chunk only
+    stream = _JSONStream(iter_blueprint_text(blueprint_source))
+    return next(stream.members(), None) == 'blueprint_book'
+
+
+# Tile footprints (width, height) for entities larger than 1x1, as placed facing north
+ENTITY_FOOTPRINTS = {
+    'assembling-machine-1': (3, 3),
+    'assembling-machine-2': (3, 3),
+    'assembling-machine-3': (3, 3),
+    'stone-furnace': (2, 2),
+    'steel-furnace': (2, 2),
+    'electric-furnace': (3, 3),
+    'chemical-plant': (3, 3),
+    'oil-refinery': (5, 5),
+    'centrifuge': (3, 3),
+    'lab': (3, 3),
+    'beacon': (3, 3),
+    'electric-mining-drill': (3, 3),
+    'burner-mining-drill': (2, 2),
+    'pumpjack': (3, 3),
+    'solar-panel': (3, 3),
+    'accumulator': (2, 2),
+    'roboport': (4, 4),
+    'radar': (3, 3),
+    'train-stop': (2, 2),
+    'straight-rail': (2, 2),
+    'rail': (2, 2),
+    'big-electric-pole': (2, 2),
+    'substation': (2, 2),
+    'splitter': (2, 1),
+    'fast-splitter': (2, 1),
+    'express-splitter': (2, 1),
+    'arithmetic-combinator': (1, 2),
+    'decider-combinator': (1, 2),
+}
+
+
+# Furthest distance, in tiles, between the two ends of an underground belt or pipe
+UNDERGROUND_MAX_SPANS = {
+    'underground-belt': 5,
+    'fast-underground-belt': 7,
+    'express-underground-belt': 9,
+    'pipe-to-ground': 10,
+}
+
+# Unit vectors for the four cardinal directions, for 8-way (1.x) blueprints
+CARDINAL_VECTORS = {0: (0, -1), 2: (1, 0), 4: (0, 1), 6: (-1, 0)}
+
+
+def direction_vector(direction, sixteen_way=False):
+    # Factorio 2.0 blueprints number directions 0-15 instead of 0-7
+    if sixteen_way:
+        if direction % 2:
+            return None
+        direction //= 2
+    return CARDINAL_VECTORS.get(direction)
+
+
+def footprint(name, direction=0):
+    width, height = ENTITY_FOOTPRINTS.get(name, (1, 1))
+    # East/west facing entities have their footprint rotated
+    if direction in (2, 6):
+        width, height = height, width
+    return width, height
+
+
+class EntityTable:
+    # Columnar store for a blueprint's entities. Positions and directions live in flat
+    # arrays and names are interned as integer codes, so aggregate checks run over
+    # compact arrays instead of a dict per entity. The rarely present `items`, `recipe`,
+    # `control_behavior`, `type` and `neighbours` fields are kept in sparse side tables
+    # keyed by row.
+
+    def __init__(self):
+        self.names = []
+        self.name_codes = {}
+        self.codes = array('l')
+        self.numbers = array('q')
+        self.xs = array('d')
+        self.ys = array('d')
+        self.directions = array('b')
+        # Bit 0/1 set when x/y was an integer in the JSON, so positions print as they were written
+        self.integral = bytearray()
+        self.items = {}
+        self.recipes = {}
+        self.control_behavior = {}
+        self.types = {}
+        self.neighbours = {}
+
+    @classmethod
+    def from_entities(cls, entities):
+        table = cls()
+        table.extend(entities)
+        return table
+
+    def __len__(self):
+        return len(self.codes)
+
+    def _code(self, name):
+        code = self.name_codes.get(name)
+        if code is None:
+            code = self.name_codes[name] = len(self.names)
+            self.names.append(name)
+        return code
+
+    def append(self, entity):
+        row = len(self.codes)
+        self.codes.append(self._code(entity['name']))
+        self.numbers.append(entity.get('entity_number', 0))
+        x = entity['position']['x']
+        y = entity['position']['y']
+        self.xs.append(x)
+        self.ys.append(y)
+        self.integral.append((type(x) is int) | (type(y) is int) << 1)
+        self.directions.append(entity.get('direction', 0))
+        if 'items' in entity:
+            self.items[row] = entity['items']
+        if 'recipe' in entity:
+            self.recipes[row] = entity['recipe']
+        if 'control_behavior' in entity:
+            self.control_behavior[row] = entity['control_behavior']
+        if 'type' in entity:
+            self.types[row] = entity['type']
+        if 'neighbours' in entity:
+            self.neighbours[row] = entity['neighbours']
+
+    def extend(self, entities):
+        append = self.append
+        for entity in entities:
+            append(entity)
+
+    def update_row(self, row, entity):
+        # Overwrites a row in place with an edited entity
+        self.codes[row] = self._code(entity['name'])
+        self.numbers[row] = entity.get('entity_number', 0)
         x = entity['position']['x']
         y = entity['position']['y']
-        neighbors = [
-            (x + dx, y + dy)
-            for dx in (-1, 0, 1)
-            for dy in (-1, 0, 1)
-            if not (dx == 0 and dy == 0)
+        self.xs[row] = x
+        self.ys[row] = y
+        self.integral[row] = (type(x) is int) | (type(y) is int) << 1
+        self.directions[row] = entity.get('direction', 0)
+        for field, side_table in (('items', self.items), ('recipe', self.recipes), ('control_behavior', self.control_behavior),
+                                  ('type', self.types), ('neighbours', self.neighbours)):
+            if field in entity:
+                side_table[row] = entity[field]
+            else:
+                side_table.pop(row, None)
+
+    def name(self, row):
+        return self.names[self.codes[row]]
+
+    def position(self, row):
+        x = self.xs[row]
+        y = self.ys[row]
+        flags = self.integral[row]
+        return (int(x) if flags & 1 else x, int(y) if flags & 2 else y)
+
+    def positions(self):
+        return [
+            (int(x) if flags & 1 else x, int(y) if flags & 2 else y)
+            for x, y, flags in zip(self.xs, self.ys, self.integral)
+        ]
+
+    def name_counts(self):
+        names = self.names
+        return {names[code]: count for code, count in Counter(self.codes).items()}
+
+    def bounds(self):
+        return min(self.xs), min(self.ys), max(self.xs), max(self.ys)
+
+    def codes_of(self, names):
+        return {self.name_codes[name] for name in names if name in self.name_codes}
+
+    def codes_where(self, predicate):
+        return {code for code, name in enumerate(self.names) if predicate(name)}
+
+    def rows_with_codes(self, codes):
+        if not codes:
+            return []
+        return [row for row, code in enumerate(self.codes) if code in codes]
+
+    def rows_with(self, names):
+        return self.rows_with_codes(self.codes_of(names))
+
+    def renumber(self, renumbering, entities):
+        # Reorders the rows in place to follow an edited blueprint: each row takes the
+        # previous row renumbering.old_rows[row], or the added entity entities[row]
+        for column in ('codes', 'numbers', 'xs', 'ys', 'directions', 'integral'):
+            setattr(self, column, renumbering.column(getattr(self, column), 0))
+        for side_table in ('items', 'recipes', 'control_behavior', 'types', 'neighbours'):
+            renumbered = renumbering.keys(getattr(self, side_table))
+            if renumbering.reordered:
+                renumbered = dict(sorted(renumbered.items()))
+            setattr(self, side_table, renumbered)
+        for row in renumbering.added():
+            self.update_row(row, entities[row])
+
+
+class RowRenumbering:
+    # How rows moved between two versions of a blueprint, for IncrementalAnalysis.
+    # old_rows[row] is the previous row of each new row, None for an added entity, and
+    # new_rows[row] the new row of each previous row, None for a removed one. Reordered
+    # is set when rows that were kept didn't keep their relative order.
+    #
+    # Rows before `start` keep their number and rows from old_end on shift to new_end
+    # on, so the helpers below copy those spans with slices and C-level maps and only
+    # walk the rows in between in Python.
+
+    def __init__(self, old_rows, old_count):
+        self.old_rows = old_rows
+        self.reordered = False
+        new_count = len(old_rows)
+        shared = min(new_count, old_count)
+        self.start = start = next(compress(range(shared), map(ne, old_rows, range(shared))), shared)
+        suffix = next(compress(range(shared - start), map(ne, reversed(old_rows), range(old_count - 1, -1, -1))), shared - start)
+        self.new_end = new_count - suffix
+        self.old_end = old_count - suffix
+        self.new_rows = new_rows = list(range(start))
+        new_rows.extend(repeat(None, self.old_end - start))
+        new_rows.extend(range(self.new_end, new_count))
+        previous = -1
+        for row, old_row in enumerate(old_rows[start:self.new_end], start):
+            if old_row is not None:
+                new_rows[old_row] = row
+                if old_row < previous:
+                    self.reordered = True
+                previous = old_row
+
+    def added(self):
+        # New rows of added entities
+        return [row for row, old_row in enumerate(self.old_rows[self.start:self.new_end], self.start) if old_row is None]
+
+    def removed(self):
+        # Previous rows of removed entities
+        return [row for row, new_row in enumerate(self.new_rows[self.start:self.old_end], self.start) if new_row is None]
+
+    def rows(self, rows):
+        # New rows of the given previous rows that were kept, in the same order
+        return [row for row in map(self.new_rows.__getitem__, rows) if row is not None]
+
+    def keys(self, mapping):
+        # `mapping` with its previous-row keys renumbered, dropping removed rows
+        renumbered = dict(zip(map(self.new_rows.__getitem__, mapping), mapping.values()))
+        renumbered.pop(None, None)
+        return renumbered
+
+    def values(self, mapping):
+        # `mapping` with its previous-row values renumbered, dropping removed rows
+        rows = list(map(self.new_rows.__getitem__, mapping.values()))
+        return dict(compress(zip(mapping, rows), map(is_not, rows, repeat(None))))
+
+    def lists(self, mapping):
+        # Renumbers, in place, the previous rows in each list or set value of `mapping`,
+        # dropping removed rows and the keys of emptied values. Reusing the values keeps
+        # a renumbering from allocating (and the collector from walking) a new container
+        # per key.
+        new_row = self.new_rows.__getitem__
+        for rows in mapping.values():
+            if type(rows) is list:
+                rows[:] = map(new_row, rows)
+            else:
+                renumbered = set(map(new_row, rows))
+                rows.clear()
+                rows.update(renumbered)
+        for key in list(compress(mapping, map(contains, mapping.values(), repeat(None)))):
+            rows = mapping[key]
+            rows.remove(None)
+            if None in rows:
+                rows[:] = [row for row in rows if row is not None]
+            if not rows:
+                del mapping[key]
+        return mapping
+
+    def column(self, values, fill=None):
+        # A per-row list, array or bytearray in new row order, with `fill` for added rows
+        renumbered = values[:self.start]
+        renumbered.extend(values[row] if row is not None else fill for row in self.old_rows[self.start:self.new_end])
+        renumbered += values[self.old_end:]
+        return renumbered
+
+
+def pair_undergrounds(table, sixteen_way=False):
+    # Pairs underground belt and pipe ends. Ends are grouped into lines by name, axis and
+    # row/column, sorted along the line, and each end is matched with its nearest
+    # neighbour in the line when that neighbour can be its partner and is within the
+    # tier's maximum span. Returns ([(row, partner_row), ...], set of unpaired rows).
+    lines = {}
+    for row in table.rows_with(UNDERGROUND_MAX_SPANS):
+        name = table.name(row)
+        vector = direction_vector(table.directions[row], sixteen_way)
+        if vector is None:
+            continue
+        x = table.xs[row]
+        y = table.ys[row]
+        if name == 'pipe-to-ground':
+            # Pipes going either way along a line can pair, so group only by axis
+            key = (name, 'x', y) if vector[1] == 0 else (name, 'y', x)
+        else:
+            key = (name, vector, y if vector[1] == 0 else x)
+        coordinate = x if vector[1] == 0 else y
+        lines.setdefault(key, []).append((coordinate, row, vector))
+    
+    pairs = []
+    unpaired = set()
+    for (name, kind, _), ends in lines.items():
+        max_span = UNDERGROUND_MAX_SPANS[name]
+        ends.sort()
+        if name != 'pipe-to-ground' and kind[0] + kind[1] < 0:
+            # Walk belts in their direction of travel
+            ends.reverse()
+        index = 0
+        while index < len(ends):
+            coordinate, row, vector = ends[index]
+            if index + 1 < len(ends):
+                next_coordinate, next_row, next_vector = ends[index + 1]
+                if name == 'pipe-to-ground':
+                    # The lower end's connection faces away from the line, the upper end's towards +
+                    partnered = vector[0] + vector[1] < 0 and next_vector[0] + next_vector[1] > 0
+                else:
+                    partnered = table.types.get(row) == 'input' and table.types.get(next_row) == 'output'
+                if partnered and abs(next_coordinate - coordinate) <= max_span:
+                    pairs.append((row, next_row))
+                    index += 2
+                    continue
+            unpaired.add(row)
+            index += 1
+    return pairs, unpaired
+
+
+class SpatialIndex:
+    # Tile-bucketed grid over an EntityTable. Built once per blueprint and queried many
+    # times, so neighbor checks only touch the cells around the query point instead of
+    # rescanning every entity. Queries return table rows.
+
+    def __init__(self, table, cell_size=8):
+        if not isinstance(table, EntityTable):
+            table = EntityTable.from_entities(table)
+        self.table = table
+        self.cell_size = cell_size
+        self.max_half_extent = 0.5
+        self.reindex()
+
+    def reindex(self):
+        # (Re)buckets every row, e.g. after the table's rows were renumbered
+        cell_size = self.cell_size
+        cells = self.cells = {}
+        for row, (x, y) in enumerate(zip(self.table.xs, self.table.ys)):
+            key = (math.floor(x / cell_size), math.floor(y / cell_size))
+            bucket = cells.get(key)
+            if bucket is None:
+                cells[key] = [row]
+            else:
+                bucket.append(row)
+        for name in self.table.names:
+            self._include_extent(name)
+
+    def renumber(self, renumbering):
+        # Follows EntityTable.renumber: renumbers the buckets, dropping removed rows, and
+        # buckets the added rows
+        if renumbering.reordered:
+            self.reindex()
+            return
+        cell_size = self.cell_size
+        cells = renumbering.lists(self.cells)
+        for row in renumbering.added():
+            key = (math.floor(self.table.xs[row] / cell_size), math.floor(self.table.ys[row] / cell_size))
+            insort(cells.setdefault(key, []), row)
+            self._include_extent(self.table.name(row))
+
+    def _include_extent(self, name):
+        width, height = ENTITY_FOOTPRINTS.get(name, (1, 1))
+        self.max_half_extent = max(self.max_half_extent, width / 2, height / 2)
+
+    def add(self, row):
+        # Buckets a row appended to the table
+        cell_size = self.cell_size
+        key = (math.floor(self.table.xs[row] / cell_size), math.floor(self.table.ys[row] / cell_size))
+        self.cells.setdefault(key, []).append(row)
+        self._include_extent(self.table.name(row))
+
+    def move(self, row, old_x, old_y):
+        # Re-buckets a row whose table entry was updated in place
+        cell_size = self.cell_size
+        old_key = (math.floor(old_x / cell_size), math.floor(old_y / cell_size))
+        new_key = (math.floor(self.table.xs[row] / cell_size), math.floor(self.table.ys[row] / cell_size))
+        if old_key != new_key:
+            bucket = self.cells[old_key]
+            bucket.remove(row)
+            if not bucket:
+                del self.cells[old_key]
+            self.cells.setdefault(new_key, []).append(row)
+        self._include_extent(self.table.name(row))
+
+    def _candidates(self, min_x, min_y, max_x, max_y):
+        cell_size = self.cell_size
+        cells = self.cells
+        for cx in range(math.floor(min_x / cell_size), math.floor(max_x / cell_size) + 1):
+            for cy in range(math.floor(min_y / cell_size), math.floor(max_y / cell_size) + 1):
+                bucket = cells.get((cx, cy))
+                if bucket:
+                    yield from bucket
+
+    def query_box(self, x, y, half_width, half_height=None, name=None, overlap=False):
+        # Rows whose position lies within the box centred on (x, y), edges inclusive.
+        # With overlap=True, rows whose footprint intersects the box are returned instead.
+        # `name` may be a single entity name or a collection of names.
+        if half_height is None:
+            half_height = half_width
+        table = self.table
+        codes = table.codes
+        wanted = None
+        if name is not None:
+            wanted = table.codes_of((name,) if isinstance(name, str) else name)
+            if not wanted:
+                return []
+        min_x, max_x = x - half_width, x + half_width
+        min_y, max_y = y - half_height, y + half_height
+        margin = self.max_half_extent if overlap else 0
+        xs = table.xs
+        ys = table.ys
+        found = []
+        for row in self._candidates(min_x - margin, min_y - margin, max_x + margin, max_y + margin):
+            if wanted is not None and codes[row] not in wanted:
+                continue
+            ex = xs[row]
+            ey = ys[row]
+            if overlap:
+                width, height = footprint(table.names[codes[row]], table.directions[row])
+                if ex + width / 2 <= min_x or ex - width / 2 >= max_x or \
+                   ey + height / 2 <= min_y or ey - height / 2 >= max_y:
+                    continue
+            elif not (min_x <= ex <= max_x and min_y <= ey <= max_y):
+                continue
+            found.append(row)
+        return found
+
+    def query_radius(self, x, y, radius, name=None):
+        # Rows whose position lies within `radius` tiles (Euclidean) of (x, y)
+        radius_sq = radius * radius
+        xs = self.table.xs
+        ys = self.table.ys
+        return [
+            row for row in self.query_box(x, y, radius, name=name)
+            if (xs[row] - x) ** 2 + (ys[row] - y) ** 2 <= radius_sq
+        ]
+
+
+# Crafting speed of each machine that runs recipes
+CRAFTING_SPEEDS = {
+    'assembling-machine-1': 0.5,
+    'assembling-machine-2': 0.75,
+    'assembling-machine-3': 1.25,
+    'stone-furnace': 1,
+    'steel-furnace': 2,
+    'electric-furnace': 2,
+    'chemical-plant': 1,
+    'oil-refinery': 1,
+    'centrifuge': 1,
+}
+
+# Furnaces pick their recipe from what they are fed, which blueprints don't record
+FURNACES = frozenset({'stone-furnace', 'steel-furnace', 'electric-furnace'})
+DEFAULT_FURNACE_RECIPE = 'iron-plate'
+
+# Ore/s mined by each drill before modules
+MINING_RATES = {
+    'electric-mining-drill': 0.5,
+    'burner-mining-drill': 0.25,
+}
+
+# What drills mine; blueprints don't record which resource is under a drill
+MINED_ITEMS = frozenset({'iron-ore', 'copper-ore', 'stone', 'coal'})
+
+# Recipe name -> (crafting time in seconds, ingredients, results), amounts per craft
+RECIPES = {
+    'iron-plate': (3.2, {'iron-ore': 1}, {'iron-plate': 1}),
+    'copper-plate': (3.2, {'copper-ore': 1}, {'copper-plate': 1}),
+    'stone-brick': (3.2, {'stone': 2}, {'stone-brick': 1}),
+    'steel-plate': (16, {'iron-plate': 5}, {'steel-plate': 1}),
+    'iron-gear-wheel': (0.5, {'iron-plate': 2}, {'iron-gear-wheel': 1}),
+    'iron-stick': (0.5, {'iron-plate': 1}, {'iron-stick': 2}),
+    'copper-cable': (0.5, {'copper-plate': 1}, {'copper-cable': 2}),
+    'pipe': (0.5, {'iron-plate': 1}, {'pipe': 1}),
+    'electronic-circuit': (0.5, {'iron-plate': 1, 'copper-cable': 3}, {'electronic-circuit': 1}),
+    'advanced-circuit': (6, {'electronic-circuit': 2, 'plastic-bar': 2, 'copper-cable': 4}, {'advanced-circuit': 1}),
+    'processing-unit': (10, {'electronic-circuit': 20, 'advanced-circuit': 2, 'sulfuric-acid': 5}, {'processing-unit': 1}),
+    'engine-unit': (10, {'steel-plate': 1, 'iron-gear-wheel': 1, 'pipe': 2}, {'engine-unit': 1}),
+    'electric-engine-unit': (10, {'engine-unit': 1, 'electronic-circuit': 2, 'lubricant': 15}, {'electric-engine-unit': 1}),
+    'transport-belt': (0.5, {'iron-plate': 1, 'iron-gear-wheel': 1}, {'transport-belt': 2}),
+    'inserter': (0.5, {'electronic-circuit': 1, 'iron-gear-wheel': 1, 'iron-plate': 1}, {'inserter': 1}),
+    'rail': (0.5, {'stone': 1, 'iron-stick': 1, 'steel-plate': 1}, {'rail': 2}),
+    'basic-oil-processing': (5, {'crude-oil': 100}, {'petroleum-gas': 45}),
+    'advanced-oil-processing': (5, {'crude-oil': 100, 'water': 50}, {'heavy-oil': 25, 'light-oil': 45, 'petroleum-gas': 55}),
+    'heavy-oil-cracking': (2, {'heavy-oil': 40, 'water': 30}, {'light-oil': 30}),
+    'light-oil-cracking': (2, {'light-oil': 30, 'water': 30}, {'petroleum-gas': 20}),
+    'plastic-bar': (1, {'petroleum-gas': 20, 'coal': 1}, {'plastic-bar': 2}),
+    'sulfur': (1, {'water': 30, 'petroleum-gas': 30}, {'sulfur': 2}),
+    'sulfuric-acid': (1, {'sulfur': 5, 'iron-plate': 1, 'water': 100}, {'sulfuric-acid': 50}),
+    'battery': (4, {'sulfuric-acid': 20, 'iron-plate': 1, 'copper-plate': 1}, {'battery': 1}),
+    'automation-science-pack': (5, {'copper-plate': 1, 'iron-gear-wheel': 1}, {'automation-science-pack': 1}),
+    'logistic-science-pack': (6, {'inserter': 1, 'transport-belt': 1}, {'logistic-science-pack': 1}),
+}
+
+# Fluids travel in pipes, not on belts or in inserter hands
+FLUIDS = frozenset({'water', 'steam', 'crude-oil', 'heavy-oil', 'light-oil', 'petroleum-gas', 'lubricant', 'sulfuric-acid'})
+
+# (speed bonus, productivity bonus) of each module
+MODULE_EFFECTS = {
+    'speed-module': (0.2, 0),
+    'speed-module-2': (0.3, 0),
+    'speed-module-3': (0.5, 0),
+    'productivity-module': (-0.05, 0.04),
+    'productivity-module-2': (-0.1, 0.06),
+    'productivity-module-3': (-0.15, 0.1),
+}
+
+# Items/s an inserter moves between a belt and a machine, without capacity bonus research
+INSERTER_RATES = {
+    'burner-inserter': 0.6,
+    'inserter': 0.83,
+    'long-handed-inserter': 1.2,
+    'fast-inserter': 2.31,
+    'filter-inserter': 2.31,
+    'stack-inserter': 2.31,
+    'stack-filter-inserter': 2.31,
+    'bulk-inserter': 2.31,
+}
+INSERTER_REACH = {'long-handed-inserter': 2}
+
+# Items/s carried by both lanes of each belt tier, and by its undergrounds and splitters
+BELT_CAPACITIES = {
+    'transport-belt': 15, 'underground-belt': 15, 'splitter': 15,
+    'fast-transport-belt': 30, 'fast-underground-belt': 30, 'fast-splitter': 30,
+    'express-transport-belt': 45, 'express-underground-belt': 45, 'express-splitter': 45,
+    'turbo-transport-belt': 60, 'turbo-underground-belt': 60, 'turbo-splitter': 60,
+}
+
+
+def iter_modules(items):
+    # (module name, count) pairs from an entity's `items`: a {name: count} dict in 1.x
+    # blueprints, a list of {'id': {'name': ...}, 'items': {'in_inventory': [...]}} in 2.0
+    if isinstance(items, dict):
+        return items.items()
+    return [
+        (item['id']['name'], len(item.get('items', {}).get('in_inventory', ())) or 1)
+        for item in items or () if isinstance(item, dict) and 'id' in item
+    ]
+
+
+def module_bonuses(items):
+    speed = productivity = 0
+    for name, count in iter_modules(items):
+        speed_bonus, productivity_bonus = MODULE_EFFECTS.get(name, (0, 0))
+        speed += speed_bonus * count
+        productivity += productivity_bonus * count
+    # The game caps the combined slowdown at -80%
+    return max(speed, -0.8), productivity
+
+
+def _crafting(name, recipe, items):
+    # (RECIPES entry, crafts/s, productivity bonus) of one machine running flat out, or
+    # None when the recipe isn't in RECIPES
+    if recipe is None and name in FURNACES:
+        recipe = DEFAULT_FURNACE_RECIPE
+    if recipe not in RECIPES:
+        return None
+    speed, productivity = module_bonuses(items)
+    return RECIPES[recipe], CRAFTING_SPEEDS[name] * (1 + speed) / RECIPES[recipe][0], productivity
+
+
+def machine_rates(name, recipe, items=None):
+    # Solid items/s consumed and produced by one machine running flat out, or None when
+    # the recipe isn't in RECIPES
+    crafting = _crafting(name, recipe, items)
+    if crafting is None:
+        return None
+    (_, ingredients, results), crafts, productivity = crafting
+    consumed = sum(amount for item, amount in ingredients.items() if item not in FLUIDS) * crafts
+    produced = sum(amount for item, amount in results.items() if item not in FLUIDS) * crafts * (1 + productivity)
+    return consumed, produced
+
+
+def machine_item_rates(name, recipe, items=None):
+    # Like machine_rates, but ({item: items/s consumed}, {item: items/s produced}) per
+    # item, fluids included
+    crafting = _crafting(name, recipe, items)
+    if crafting is None:
+        return None
+    (_, ingredients, results), crafts, productivity = crafting
+    return (
+        {item: amount * crafts for item, amount in ingredients.items()},
+        {item: amount * crafts * (1 + productivity) for item, amount in results.items()},
+    )
+
+
+def _tile(x, y):
+    return math.floor(x), math.floor(y)
+
+
+def _footprint_tiles(x, y, width, height):
+    left = math.floor(x - width / 2 + 0.5)
+    top = math.floor(y - height / 2 + 0.5)
+    return [(tx, ty) for tx in range(left, left + width) for ty in range(top, top + height)]
+
+
+def direction_vectors(sixteen_way=False):
+    # direction_vector for every direction value, for lookups in tight loops
+    return [direction_vector(direction, sixteen_way) for direction in range(16)]
+
+
+def tile_map(table, rows, sixteen_way=False):
+    # (x, y) tile -> row for every tile covered by the given rows
+    names = table.names
+    codes = table.codes
+    xs = table.xs
+    ys = table.ys
+    directions = table.directions
+    floor = math.floor
+    sizes = {}
+    tiles = {}
+    for row in rows:
+        key = (codes[row], directions[row])
+        size = sizes.get(key)
+        if size is None:
+            size = sizes[key] = footprint(names[key[0]], key[1] // 2 if sixteen_way else key[1])
+        if size == (1, 1):
+            tiles[floor(xs[row]), floor(ys[row])] = row
+        else:
+            for tile in _footprint_tiles(xs[row], ys[row], *size):
+                tiles[tile] = row
+    return tiles
+
+
+def _entity_tiles(name, direction, x, y, sixteen_way=False):
+    # Tiles covered by one entity, as tile_map counts them
+    size = footprint(name, direction // 2 if sixteen_way else direction)
+    if size == (1, 1):
+        return [_tile(x, y)]
+    return _footprint_tiles(x, y, *size)
+
+
+def inserter_links(table, tiles, sixteen_way=False, rows=None):
+    # (inserter row, pickup row, drop row) for every inserter, or the given inserter
+    # rows. An inserter's direction points at the side it picks up from and it drops on
+    # the opposite side; an end is None when nothing in `tiles` is there.
+    vectors = direction_vectors(sixteen_way)
+    names = table.names
+    codes = table.codes
+    links = []
+    for row in table.rows_with(INSERTER_RATES) if rows is None else rows:
+        direction = vectors[table.directions[row]]
+        if direction is None:
+            continue
+        reach = INSERTER_REACH.get(names[codes[row]], 1)
+        x = table.xs[row]
+        y = table.ys[row]
+        source = tiles.get(_tile(x + direction[0] * reach, y + direction[1] * reach))
+        target = tiles.get(_tile(x - direction[0] * reach, y - direction[1] * reach))
+        links.append((row, source, target))
+    return links
+
+
+def drill_drops(table, tiles, sixteen_way=False, rows=None):
+    # (drill row, row it drops ore onto) for drills, or the given drill rows, whose
+    # output lands on something in `tiles`
+    vectors = direction_vectors(sixteen_way)
+    drops = []
+    for row in table.rows_with(MINING_RATES) if rows is None else rows:
+        direction = vectors[table.directions[row]]
+        if direction is None:
+            continue
+        # Just past the drill's front edge
+        reach = ENTITY_FOOTPRINTS.get(table.name(row), (1, 1))[1] / 2 + 0.5
+        target = tiles.get(_tile(table.xs[row] + direction[0] * reach, table.ys[row] + direction[1] * reach))
+        if target is not None:
+            drops.append((row, target))
+    return drops
+
+
+def belt_successors(table, tiles, sixteen_way=False, rows=None, exits=None):
+    # Belt graph as {row: [rows it feeds]}, for every belt or the given belt rows, and
+    # only for belts that feed something. Each belt tile feeds the tile it faces,
+    # underground entrances feed their exit, and splitters feed the tiles in front of
+    # both halves. `tiles` must cover at least the belts, as from tile_map; `exits`, the
+    # underground pairs as {entrance row: exit row}, is worked out when not given.
+    codes = table.codes
+    xs = table.xs
+    ys = table.ys
+    directions = table.directions
+    vectors = direction_vectors(sixteen_way)
+    floor = math.floor
+    belt_codes = table.codes_of(BELT_CAPACITIES)
+    splitter_codes = table.codes_where(lambda name: 'splitter' in name)
+    exit_codes = table.codes_where(lambda name: 'underground' in name)
+    underground_exits = dict(pair_undergrounds(table, sixteen_way)[0]) if exits is None else exits
+    successors = {}
+    for row in table.rows_with_codes(belt_codes) if rows is None else rows:
+        direction = vectors[directions[row]]
+        if direction is None:
+            continue
+        if row in underground_exits:
+            successors[row] = [underground_exits[row]]
+            continue
+        dx, dy = direction
+        x = xs[row] + dx
+        y = ys[row] + dy
+        if codes[row] in splitter_codes:
+            fronts = ((x - abs(dy) / 2, y - abs(dx) / 2), (x + abs(dy) / 2, y + abs(dx) / 2))
+        else:
+            fronts = ((x, y),)
+        targets = []
+        for front_x, front_y in fronts:
+            target = tiles.get((floor(front_x), floor(front_y)))
+            if target is None or target == row or target in targets:
+                continue
+            target_code = codes[target]
+            if target_code not in belt_codes:
+                continue
+            # Nothing enters a belt head-on or an underground exit from behind
+            if vectors[directions[target]] == (-dx, -dy) or \
+               (target_code in exit_codes and table.types.get(target) == 'output'):
+                continue
+            targets.append(target)
+        if targets:
+            successors[row] = targets
+    return successors
+
+
+class _StackedTiles:
+    # Lookup over several tile maps as if they were one tile_map over all their rows,
+    # where the later row wins a shared tile
+
+    def __init__(self, *tile_maps):
+        self.tile_maps = tile_maps
+
+    def get(self, tile):
+        rows = [row for row in (tiles.get(tile) for tiles in self.tile_maps) if row is not None]
+        return max(rows) if rows else None
+
+
+class ItemFlows:
+    # Items/s the inserters and belts of a blueprint need to move if every machine ran at
+    # full speed. solve() builds the production graph (machines, the inserters feeding
+    # and emptying them, drills, and the belts of a BeltGraph between them) and solves
+    # for items/s on every inserter and belt tile. Inserter rates come from the machines
+    # they serve, split evenly between a machine's inserters. Belt flows form a sparse
+    # triangular system over each belt network, solved by forward substitution in
+    # topological order for what producers put on a belt, and backward for what
+    # consumers downstream take off it. update() redoes only the machines, inserters,
+    # drills and belt networks around an edit. Rates are keyed by table row.
+
+    # Tiles around an edited machine or belt within which inserters and drills may reach it
+    inserter_reach = 2.5
+    drill_reach = 3
+
+    def __init__(self, table, belt_graph, sixteen_way=False):
+        self.table = table
+        self.belt_graph = belt_graph
+        self.sixteen_way = sixteen_way
+        # Machine row -> (items/s consumed, produced), and machines whose recipe the
+        # solver doesn't know
+        self.machines = {}
+        self.unknown = set()
+        self.machine_tiles = {}
+        self.inserters = set()
+        # Inserter row -> (pickup row, drop row, pickup is a machine, drop is a machine),
+        # for inserters serving a machine, and the inserters of each machine
+        self.links = {}
+        self.machine_links = {}
+        self.machine_inputs = Counter()
+        self.machine_outputs = Counter()
+        # Drill row -> belt it drops on, and its ore/s
+        self.drill_targets = {}
+        self.drill_rates = {}
+        # Belt row -> inserters dropping on it, inserters taking from it, drills dropping on it
+        self.belt_inputs = {}
+        self.belt_outputs = {}
+        self.belt_drills = {}
+        self.inserter_rates = {}
+        self.belt_loads = {}
+        # Inserters and belts whose rate is over capacity, kept up to date with the rates
+        self.overloaded_inserter_rows = set()
+        self.overloaded_belt_rows = set()
+        self._stale_machines = set()
+        self._stale_belts = set()
+
+    @property
+    def belt_successors(self):
+        return self.belt_graph.successors
+
+    @property
+    def unknown_recipes(self):
+        # Reported only when there are inserters or belts to solve for
+        return len(self.unknown) if self.inserters or self.belt_graph.networks.network_of else 0
+
+    def _ends(self):
+        return _StackedTiles(self.machine_tiles, self.belt_graph.tiles)
+
+    def _set_machine(self, row):
+        table = self.table
+        rates = machine_rates(table.name(row), table.recipes.get(row), table.items.get(row))
+        if rates is not None:
+            self.machines[row] = rates
+        elif table.recipes.get(row) is not None:
+            self.unknown.add(row)
+
+    def _link(self, rows):
+        # Links the given inserter rows; returns the machines and belts they reach
+        table = self.table
+        machines = self.machines
+        belt_codes = table.codes_of(BELT_CAPACITIES)
+        reached = set()
+        for row, source, target in inserter_links(table, self._ends(), self.sixteen_way, rows):
+            from_machine = source in machines
+            to_machine = target in machines
+            if not (from_machine or to_machine):
+                continue
+            self.links[row] = (source, target, from_machine, to_machine)
+            if from_machine:
+                self.machine_outputs[source] += 1
+                self.machine_links.setdefault(source, set()).add(row)
+            elif source is not None and table.codes[source] in belt_codes:
+                self.belt_outputs.setdefault(source, set()).add(row)
+            if to_machine:
+                self.machine_inputs[target] += 1
+                self.machine_links.setdefault(target, set()).add(row)
+            elif target is not None and table.codes[target] in belt_codes:
+                self.belt_inputs.setdefault(target, set()).add(row)
+            reached.update(end for end in (source, target) if end is not None)
+        return reached
+
+    def _unlink(self, row):
+        # Drops an inserter's link; returns the rows it reached
+        link = self.links.pop(row, None)
+        self.inserter_rates.pop(row, None)
+        self.overloaded_inserter_rows.discard(row)
+        if link is None:
+            return ()
+        source, target, from_machine, to_machine = link
+        for end, is_machine, counts, belt_users in ((source, from_machine, self.machine_outputs, self.belt_outputs),
+                                                    (target, to_machine, self.machine_inputs, self.belt_inputs)):
+            if end is None:
+                continue
+            users = self.machine_links if is_machine else belt_users
+            if is_machine:
+                counts[end] -= 1
+                if not counts[end]:
+                    del counts[end]
+            if end in users:
+                users[end].discard(row)
+                if not users[end]:
+                    del users[end]
+        return [end for end in (source, target) if end is not None]
+
+    def _rate(self, row):
+        # A direct machine-to-machine inserter only carries what both ends allow
+        source, target, from_machine, to_machine = self.links[row]
+        rates = []
+        if from_machine:
+            rates.append(self.machines[source][1] / self.machine_outputs[source])
+        if to_machine:
+            rates.append(self.machines[target][0] / self.machine_inputs[target])
+        self.inserter_rates[row] = rate = min(rates)
+        if rate > INSERTER_RATES[self.table.name(row)] + 1e-9:
+            self.overloaded_inserter_rows.add(row)
+        else:
+            self.overloaded_inserter_rows.discard(row)
+
+    def _drop(self, rows):
+        # Finds where the given drill rows drop ore; returns the belts they drop on
+        table = self.table
+        belt_codes = table.codes_of(BELT_CAPACITIES)
+        reached = set()
+        for row, target in drill_drops(table, self._ends(), self.sixteen_way, rows):
+            if table.codes[target] in belt_codes:
+                speed, productivity = module_bonuses(table.items.get(row))
+                self.drill_targets[row] = target
+                self.drill_rates[row] = MINING_RATES[table.name(row)] * (1 + speed) * (1 + productivity)
+                self.belt_drills.setdefault(target, set()).add(row)
+                reached.add(target)
+        return reached
+
+    def _undrop(self, row):
+        target = self.drill_targets.pop(row, None)
+        self.drill_rates.pop(row, None)
+        if target is None:
+            return ()
+        drills = self.belt_drills[target]
+        drills.discard(row)
+        if not drills:
+            del self.belt_drills[target]
+        return (target,)
+
+    def _injected(self, row):
+        # Summed in the order a single pass over inserters, then drills, would add them
+        total = 0
+        for inserter in sorted(self.belt_inputs.get(row, ())):
+            total += self.inserter_rates[inserter]
+        for drill in sorted(self.belt_drills.get(row, ())):
+            total += self.drill_rates[drill]
+        return total
+
+    def _extracted(self, row):
+        total = 0
+        for inserter in sorted(self.belt_outputs.get(row, ())):
+            total += self.inserter_rates[inserter]
+        return total
+
+    def _solve_network(self, rows):
+        graph = self.belt_graph
+        successors = graph.successors
+        predecessors = graph.predecessors
+        belt_loads = self.belt_loads
+        for row in rows:
+            belt_loads.pop(row, None)
+        self.overloaded_belt_rows.difference_update(rows)
+        injected = {row: self._injected(row) for row in rows if row in self.belt_inputs or row in self.belt_drills}
+        extracted = {row: self._extracted(row) for row in rows if row in self.belt_outputs}
+        if not injected and not extracted:
+            return
+        in_degree = {row: len(predecessors[row]) for row in rows if row in predecessors}
+        
+        # Topological order (Kahn); belts caught in loops go last in table order
+        remaining = dict(in_degree)
+        order = [row for row in rows if row not in in_degree]
+        for row in order:
+            for target in successors.get(row, ()):
+                remaining[target] -= 1
+                if not remaining[target]:
+                    order.append(target)
+        if len(order) < len(rows):
+            ordered = set(order)
+            order.extend(row for row in rows if row not in ordered)
+        
+        # Forward: items producers put on the belt, split evenly at splitters
+        supply = dict.fromkeys(rows, 0.0)
+        for row in order:
+            load = supply[row] = supply[row] + injected.get(row, 0)
+            targets = successors.get(row)
+            if targets:
+                passed = max(0, load - extracted.get(row, 0)) / len(targets)
+                for target in targets:
+                    supply[target] += passed
+        
+        # Backward: items consumers at or past each tile need, shared between its feeders
+        demand = dict.fromkeys(rows, 0.0)
+        for row in reversed(order):
+            load = extracted.get(row, 0)
+            for target in successors.get(row, ()):
+                load += max(0, demand[target] - injected.get(target, 0)) / in_degree[target]
+            demand[row] = load
+        
+        table = self.table
+        for row in rows:
+            if supply[row] or demand[row]:
+                belt_loads[row] = load = max(supply[row], demand[row])
+                if load > BELT_CAPACITIES[table.name(row)] + 1e-9:
+                    self.overloaded_belt_rows.add(row)
+
+    def solve(self):
+        table = self.table
+        machine_rows = table.rows_with(CRAFTING_SPEEDS)
+        for row in machine_rows:
+            self._set_machine(row)
+        self.machine_tiles = tile_map(table, machine_rows, self.sixteen_way)
+        inserter_rows = table.rows_with(INSERTER_RATES)
+        self.inserters = set(inserter_rows)
+        self._link(inserter_rows)
+        for row in sorted(self.links):
+            self._rate(row)
+        self._drop(table.rows_with(MINING_RATES))
+        for rows in self.belt_graph.networks.members.values():
+            self._solve_network(rows)
+        return self
+
+    def renumber(self, renumbering):
+        new_rows = renumbering.new_rows
+        # Removed inserters and drills leave their machines and belts to redo
+        for row in renumbering.removed():
+            for end in self._unlink(row):
+                (self._stale_machines if end in self.machines else self._stale_belts).add(end)
+            self._stale_belts.update(self._undrop(row))
+        
+        def renumbered(row):
+            return new_rows[row] if row is not None else None
+        
+        self.machines = renumbering.keys(self.machines)
+        self.unknown = set(renumbering.rows(self.unknown))
+        self.machine_tiles = renumbering.values(self.machine_tiles)
+        self.inserters = set(renumbering.rows(self.inserters))
+        links = {}
+        for row, (source, target, from_machine, to_machine) in renumbering.keys(self.links).items():
+            source = renumbered(source)
+            target = renumbered(target)
+            links[row] = (source, target, from_machine and source is not None, to_machine and target is not None)
+        self.links = links
+        for name in ('machine_links', 'belt_inputs', 'belt_outputs', 'belt_drills'):
+            setattr(self, name, renumbering.lists(renumbering.keys(getattr(self, name))))
+        self.machine_inputs = Counter(renumbering.keys(self.machine_inputs))
+        self.machine_outputs = Counter(renumbering.keys(self.machine_outputs))
+        self.drill_targets = renumbering.values(renumbering.keys(self.drill_targets))
+        self.drill_rates = renumbering.keys(self.drill_rates)
+        self.inserter_rates = renumbering.keys(self.inserter_rates)
+        self.belt_loads = renumbering.keys(self.belt_loads)
+        self.overloaded_inserter_rows = set(renumbering.rows(self.overloaded_inserter_rows))
+        self.overloaded_belt_rows = set(renumbering.rows(self.overloaded_belt_rows))
+        self._stale_machines = set(renumbering.rows(self._stale_machines))
+        self._stale_belts = set(renumbering.rows(self._stale_belts))
+
+    def update(self, changes):
+        # Redoes the flows after an edit; the belt graph is already up to date
+        table = self.table
+        codes = table.codes
+        spatial_index = self.belt_graph.spatial_index
+        sixteen_way = self.sixteen_way
+        touched = set()
+        machine_touched = set()
+        edited_machines = set()
+        relink = set()
+        redrop = set()
+        for row, old_entity, new_entity in changes:
+            for entity in (old_entity, new_entity):
+                if entity is None:
+                    continue
+                name = entity['name']
+                if name in CRAFTING_SPEEDS or name in BELT_CAPACITIES:
+                    tiles = _entity_tiles(name, entity.get('direction', 0), entity['position']['x'], entity['position']['y'], sixteen_way)
+                    touched.update(tiles)
+                    if name in CRAFTING_SPEEDS:
+                        machine_touched.update(tiles)
+                        if row is not None:
+                            edited_machines.add(row)
+                elif row is not None and name in INSERTER_RATES:
+                    relink.add(row)
+                elif row is not None and name in MINING_RATES:
+                    redrop.add(row)
+        affected_machines = self._stale_machines | edited_machines
+        affected_belts = self._stale_belts
+        self._stale_machines = set()
+        self._stale_belts = set()
+        for x, y in touched:
+            relink.update(spatial_index.query_box(x + 0.5, y + 0.5, self.inserter_reach, name=INSERTER_RATES))
+            redrop.update(spatial_index.query_box(x + 0.5, y + 0.5, self.drill_reach, name=MINING_RATES))
+        
+        # Unlink first, while the links still match the machines they counted
+        for row in relink:
+            for end in self._unlink(row):
+                (affected_machines if end in self.machines else affected_belts).add(end)
+        for row in redrop:
+            affected_belts.update(self._undrop(row))
+        
+        for row in edited_machines:
+            self.machines.pop(row, None)
+            self.unknown.discard(row)
+        machine_codes = table.codes_of(CRAFTING_SPEEDS)
+        for row in edited_machines:
+            if codes[row] in machine_codes:
+                self._set_machine(row)
+        for tile in machine_touched:
+            self.machine_tiles.pop(tile, None)
+        nearby = set()
+        for x, y in machine_touched:
+            nearby.update(spatial_index.query_box(x + 0.5, y + 0.5, spatial_index.max_half_extent + 1, name=CRAFTING_SPEEDS))
+        for row in sorted(nearby):
+            for tile in _entity_tiles(table.names[codes[row]], table.directions[row], table.xs[row], table.ys[row], sixteen_way):
+                if tile in machine_touched:
+                    self.machine_tiles[tile] = row
+        
+        inserter_codes = table.codes_of(INSERTER_RATES)
+        for row in relink:
+            self.inserters.discard(row)
+        relink = sorted(row for row in relink if codes[row] in inserter_codes)
+        self.inserters.update(relink)
+        for end in self._link(relink):
+            (affected_machines if end in self.machines else affected_belts).add(end)
+        drill_codes = table.codes_of(MINING_RATES)
+        affected_belts |= self._drop(sorted(row for row in redrop if codes[row] in drill_codes))
+        
+        # Every inserter of a machine whose rates or inserter count changed
+        rerate = set()
+        for machine in affected_machines:
+            rerate.update(self.machine_links.get(machine, ()))
+        for row in sorted(rerate):
+            self._rate(row)
+            source, target, _, _ = self.links[row]
+            affected_belts.update(end for end in (source, target) if end is not None)
+        
+        graph = self.belt_graph
+        network_of = graph.networks.network_of
+        networks = set(graph.changed_networks)
+        networks.update(network_of[belt] for belt in affected_belts if belt in network_of)
+        belt_codes = table.codes_of(BELT_CAPACITIES)
+        for row, _, _ in changes:
+            if row is not None and codes[row] not in belt_codes:
+                self.belt_loads.pop(row, None)
+                self.overloaded_belt_rows.discard(row)
+        for network in networks:
+            self._solve_network(graph.networks.members[network])
+
+    def overloaded_inserters(self):
+        # (row, required rate, capacity) for inserters that can't keep up
+        table = self.table
+        return [
+            (row, self.inserter_rates[row], INSERTER_RATES[table.name(row)])
+            for row in sorted(self.overloaded_inserter_rows)
+        ]
+
+    def overloaded_belt_runs(self):
+        # (first row, peak load, tiles, capacity) for each stretch of belt carrying more
+        # than its tier allows, walked downstream from where the overload starts
+        table = self.table
+        successors = self.belt_successors
+        overloaded = self.overloaded_belt_rows
+        fed_from_overload = {
+            successor for row in overloaded for successor in successors.get(row, ()) if successor in overloaded
+        }
+        runs = []
+        for start in sorted(overloaded - fed_from_overload):
+            peak = 0
+            length = 0
+            row = start
+            seen = set()
+            while row is not None and row not in seen:
+                seen.add(row)
+                peak = max(peak, self.belt_loads[row])
+                length += 1
+                row = next((successor for successor in successors.get(row, ()) if successor in overloaded), None)
+            runs.append((start, peak, length, BELT_CAPACITIES[table.name(start)]))
+        return runs
+
+
+# (copper wire reach, supply area half-width) of each electric pole, in tiles
+POWER_POLES = {
+    'small-electric-pole': (7.5, 2.5),
+    'medium-electric-pole': (9, 3.5),
+    'big-electric-pole': (30, 2),
+    'substation': (18, 9),
+}
+
+# Entities that stop working without a power pole's supply area over them
+ELECTRIC_CONSUMERS = frozenset({
+    'assembling-machine-1', 'assembling-machine-2', 'assembling-machine-3',
+    'electric-furnace', 'electric-mining-drill', 'chemical-plant', 'oil-refinery', 'centrifuge',
+    'lab', 'beacon', 'radar', 'roboport', 'pumpjack', 'pump', 'small-lamp',
+    'inserter', 'long-handed-inserter', 'fast-inserter', 'filter-inserter',
+    'stack-inserter', 'stack-filter-inserter', 'bulk-inserter',
+})
+
+PIPES = frozenset({'pipe', 'pipe-to-ground'})
+
+# Factorio 2.0 wire connector ids for copper cables: poles, and either side of a power switch
+COPPER_CONNECTORS = frozenset({5, 6})
+
+
+class UnionFind:
+    # Disjoint sets over arbitrary hashable items, with union by size and path halving
+
+    def __init__(self, items=()):
+        self.parent = {item: item for item in items}
+        self.size = dict.fromkeys(self.parent, 1)
+
+    def add(self, item):
+        if item not in self.parent:
+            self.parent[item] = item
+            self.size[item] = 1
+
+    def find(self, item):
+        parent = self.parent
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    def union(self, a, b):
+        a = self.find(a)
+        b = self.find(b)
+        if a == b:
+            return a
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+        return a
+
+    def groups(self):
+        # Lists of items per set, each in insertion order, largest set first
+        groups = {}
+        for item in self.parent:
+            groups.setdefault(self.find(item), []).append(item)
+        return sorted(groups.values(), key=len, reverse=True)
+
+
+class RowNetworks:
+    # Connected networks of table rows, joined with UnionFind along a `neighbours(row)`
+    # function: network_of maps each row to its network's id and members each id to its
+    # rows in order. update() joins again only the networks around an edit.
+
+    def __init__(self, rows, neighbours):
+        self.network_of = {}
+        self.members = {}
+        self.next_id = 0
+        # Networks that lost rows in a renumbering, joined again on the next update
+        self.stale = set()
+        self._join(rows, neighbours)
+
+    def _join(self, rows, neighbours):
+        # Joins `rows`, in order and in no network yet, into new networks; returns their ids
+        sets = UnionFind(rows)
+        parent = sets.parent
+        for row in rows:
+            for neighbour in neighbours(row):
+                if neighbour in parent:
+                    sets.union(row, neighbour)
+        joined = set()
+        for group in sets.groups():
+            network = self.next_id
+            self.next_id += 1
+            self.members[network] = group
+            for row in group:
+                self.network_of[row] = network
+            joined.add(network)
+        return joined
+
+    def update(self, rows, neighbours, is_member):
+        # Regroups after an edit. `rows` are the rows whose links may have changed; their
+        # networks, those of their neighbours and the stale ones are broken up and their
+        # rows still passing is_member joined again. Returns the ids of the new networks.
+        network_of = self.network_of
+        broken = self.stale
+        self.stale = set()
+        regroup = set()
+        for row in rows:
+            network = network_of.get(row)
+            if network is not None:
+                broken.add(network)
+            if is_member(row):
+                regroup.add(row)
+                for neighbour in neighbours(row):
+                    network = network_of.get(neighbour)
+                    if network is not None:
+                        broken.add(network)
+        for network in broken:
+            for row in self.members.pop(network, ()):
+                del network_of[row]
+                if is_member(row):
+                    regroup.add(row)
+        return self._join(sorted(regroup), neighbours)
+
+    def renumber(self, renumbering):
+        members = {}
+        for network, rows in self.members.items():
+            kept = renumbering.rows(rows)
+            if not kept:
+                continue
+            if len(kept) < len(rows):
+                self.stale.add(network)
+            if renumbering.reordered:
+                kept.sort()
+            members[network] = kept
+        self.members = members
+        self.network_of = renumbering.keys(self.network_of)
+
+    def groups(self):
+        # Row lists per network, largest first and ties in order of their first row, as
+        # UnionFind.groups orders them
+        return sorted(self.members.values(), key=lambda rows: (-len(rows), rows[0]))
+
+
+def _renumber_links(links, renumbering):
+    # {row: [rows]} with rows renumbered, dropping removed rows and emptied lists
+    return renumbering.lists(renumbering.keys(links))
+
+
+class BeltGraph:
+    # The belts of a blueprint as a graph, shared by the analyzers through
+    # AnalysisContext.belt_graph: the belt on each tile, which belts each one feeds (see
+    # belt_successors) and is fed by, the networks they join into, and which belts
+    # inserters and drills put items on or take them off. apply_changes keeps it up to
+    # date through IncrementalAnalysis edits, redoing only the belts around them.
+
+    # Tiles around an edited belt within which belts may feed it or inserters and drills
+    # may reach it
+    feeder_reach = 2.5
+    loader_reach = 3
+
+    def __init__(self, table, spatial_index, sixteen_way=False):
+        self.table = table
+        self.spatial_index = spatial_index
+        self.sixteen_way = sixteen_way
+        belt_rows = table.rows_with(BELT_CAPACITIES)
+        self.tiles = tile_map(table, belt_rows, sixteen_way)
+        self.exits = dict(pair_undergrounds(table, sixteen_way)[0]) if belt_rows else {}
+        self.successors = belt_successors(table, self.tiles, sixteen_way, belt_rows, self.exits)
+        self.predecessors = {}
+        for row, targets in self.successors.items():
+            for target in targets:
+                self.predecessors.setdefault(target, []).append(row)
+        # Inserter or drill row -> (belt it takes from, belt it puts on), and each belt's
+        # loaders and unloaders
+        self.ends = {}
+        self.loaders = {}
+        self.unloaders = {}
+        if belt_rows:
+            for row, source, target in inserter_links(table, self.tiles, sixteen_way):
+                self._link(row, source, target)
+            for row, target in drill_drops(table, self.tiles, sixteen_way):
+                self._link(row, None, target)
+        self.networks = RowNetworks(belt_rows, self.neighbours)
+        # Networks whose belts, or what loads and unloads them, the last edit may have changed
+        self.changed_networks = set()
+        # Belts that lost a loader or unloader in a renumbering
+        self._unlinked = set()
+
+    def neighbours(self, row):
+        return self.successors.get(row, []) + self.predecessors.get(row, [])
+
+    def _link(self, row, source, target):
+        if source is None and target is None:
+            return
+        self.ends[row] = (source, target)
+        if source is not None:
+            self.unloaders.setdefault(source, set()).add(row)
+        if target is not None:
+            self.loaders.setdefault(target, set()).add(row)
+
+    def _unlink(self, row):
+        # Drops a row's links; returns the belts it had
+        ends = self.ends.pop(row, None)
+        if ends is None:
+            return ()
+        for belt, users in zip(ends, (self.unloaders, self.loaders)):
+            if belt is not None:
+                users[belt].discard(row)
+                if not users[belt]:
+                    del users[belt]
+        return [belt for belt in ends if belt is not None]
+
+    def renumber(self, renumbering):
+        new_rows = renumbering.new_rows
+        self.tiles = renumbering.values(self.tiles)
+        self.exits = {
+            new_rows[entrance]: new_rows[exit_row] for entrance, exit_row in self.exits.items()
+            if new_rows[entrance] is not None and new_rows[exit_row] is not None
+        }
+        self.successors = _renumber_links(self.successors, renumbering)
+        self.predecessors = _renumber_links(self.predecessors, renumbering)
+        for row in renumbering.removed():
+            self._unlinked.update(self._unlink(row))
+        self._unlinked = set(renumbering.rows(self._unlinked))
+        ends = {}
+        for row, (source, target) in renumbering.keys(self.ends).items():
+            source = new_rows[source] if source is not None else None
+            target = new_rows[target] if target is not None else None
+            if source is not None or target is not None:
+                ends[row] = (source, target)
+        self.ends = ends
+        self.loaders = renumbering.lists(renumbering.keys(self.loaders))
+        self.unloaders = renumbering.lists(renumbering.keys(self.unloaders))
+        self.networks.renumber(renumbering)
+
+    def apply_changes(self, changes):
+        # Updates the graph after an edit, see AnalysisContext.apply_changes, and sets
+        # changed_networks
+        table = self.table
+        sixteen_way = self.sixteen_way
+        touched = set()
+        redo = set()
+        relink = set()
+        pairing_changed = False
+        for row, old_entity, new_entity in changes:
+            for entity in (old_entity, new_entity):
+                if entity is None:
+                    continue
+                name = entity['name']
+                if name in BELT_CAPACITIES:
+                    touched.update(_entity_tiles(name, entity.get('direction', 0), entity['position']['x'], entity['position']['y'], sixteen_way))
+                    if row is not None:
+                        redo.add(row)
+                    if name in UNDERGROUND_MAX_SPANS:
+                        pairing_changed = True
+                elif row is not None and (name in INSERTER_RATES or name in MINING_RATES):
+                    relink.add(row)
+        relinked_belts = self._unlinked
+        self._unlinked = set()
+        self.changed_networks = set()
+        if not touched and not relink and not relinked_belts:
+            return
+        
+        spatial_index = self.spatial_index
+        codes = table.codes
+        belt_codes = table.codes_of(BELT_CAPACITIES)
+        # Which belt covers each touched tile now, the later row where belts overlap
+        for tile in touched:
+            self.tiles.pop(tile, None)
+        nearby = set()
+        for x, y in touched:
+            nearby.update(spatial_index.query_box(x + 0.5, y + 0.5, self.feeder_reach, name=BELT_CAPACITIES))
+            relink.update(spatial_index.query_box(x + 0.5, y + 0.5, self.loader_reach, name=INSERTER_RATES.keys() | MINING_RATES.keys()))
+        for row in sorted(nearby):
+            for tile in _entity_tiles(table.names[codes[row]], table.directions[row], table.xs[row], table.ys[row], sixteen_way):
+                if tile in touched:
+                    self.tiles[tile] = row
+        
+        # Belts whose targets may have changed: the edited ones and those near them,
+        # and underground entrances whose exit changed
+        redo |= nearby
+        if pairing_changed:
+            exits = dict(pair_undergrounds(table, sixteen_way)[0])
+            redo.update(row for row in exits.keys() | self.exits.keys() if exits.get(row) != self.exits.get(row))
+            self.exits = exits
+        seeds = set(redo)
+        for row in redo:
+            for target in self.successors.pop(row, ()):
+                feeders = self.predecessors[target]
+                feeders.remove(row)
+                if not feeders:
+                    del self.predecessors[target]
+                seeds.add(target)
+        belts = [row for row in sorted(redo) if codes[row] in belt_codes]
+        for row, targets in belt_successors(table, self.tiles, sixteen_way, belts, self.exits).items():
+            self.successors[row] = targets
+            for target in targets:
+                self.predecessors.setdefault(target, []).append(row)
+            seeds.update(targets)
+        self.changed_networks = self.networks.update(seeds, self.neighbours, lambda row: codes[row] in belt_codes)
+        
+        for row in relink:
+            relinked_belts.update(self._unlink(row))
+        inserter_codes = table.codes_of(INSERTER_RATES)
+        drill_codes = table.codes_of(MINING_RATES)
+        relink = sorted(relink)
+        for row, source, target in inserter_links(table, self.tiles, sixteen_way, [row for row in relink if codes[row] in inserter_codes]):
+            self._link(row, source, target)
+            relinked_belts.update(belt for belt in (source, target) if belt is not None)
+        for row, target in drill_drops(table, self.tiles, sixteen_way, [row for row in relink if codes[row] in drill_codes]):
+            self._link(row, None, target)
+            relinked_belts.add(target)
+        network_of = self.networks.network_of
+        self.changed_networks.update(network_of[belt] for belt in relinked_belts if belt in network_of)
+
+
+class PipeGraph:
+    # Connected pipe networks, kept up to date like BeltGraph. Pipes join every pipe
+    # beside them; a pipe-to-ground joins its underground partner and only the
+    # neighbour on its open side. Fluid machines aren't followed, so pipes meeting only
+    # inside a machine count as separate networks.
+
+    def __init__(self, table, sixteen_way=False):
+        self.table = table
+        self.sixteen_way = sixteen_way
+        self.vectors = direction_vectors(sixteen_way)
+        pipe_rows = table.rows_with(PIPES)
+        # Tile -> pipes on it; every pipe stacked on a tile connects
+        self.tiles = {}
+        for row in pipe_rows:
+            self.tiles.setdefault(_tile(table.xs[row], table.ys[row]), []).append(row)
+        self.partners = self._pair() if pipe_rows else {}
+        self.networks = RowNetworks(pipe_rows, self.neighbours)
+
+    def _pair(self):
+        # Pipe-to-ground partners, both ways
+        table = self.table
+        underground_codes = table.codes_of(['pipe-to-ground'])
+        partners = {}
+        for start, end in pair_undergrounds(table, self.sixteen_way)[0]:
+            if table.codes[start] in underground_codes:
+                partners[start] = end
+                partners[end] = start
+        return partners
+
+    def _open_toward(self, row, tile):
+        # Whether `row` accepts a connection from the neighbouring `tile`
+        table = self.table
+        if table.names[table.codes[row]] != 'pipe-to-ground':
+            return True
+        direction = self.vectors[table.directions[row]]
+        return direction is not None and _tile(table.xs[row] + direction[0], table.ys[row] + direction[1]) == tile
+
+    def neighbours(self, row):
+        tile = _tile(self.table.xs[row], self.table.ys[row])
+        found = []
+        for dx, dy in CARDINAL_VECTORS.values():
+            neighbour_tile = (tile[0] + dx, tile[1] + dy)
+            if not self._open_toward(row, neighbour_tile):
+                continue
+            found.extend(neighbour for neighbour in self.tiles.get(neighbour_tile, ()) if self._open_toward(neighbour, tile))
+        partner = self.partners.get(row)
+        if partner is not None:
+            found.append(partner)
+        return found
+
+    def renumber(self, renumbering):
+        new_rows = renumbering.new_rows
+        self.tiles = renumbering.lists(self.tiles)
+        self.partners = {new_rows[a]: new_rows[b] for a, b in self.partners.items() if new_rows[a] is not None and new_rows[b] is not None}
+        self.networks.renumber(renumbering)
+
+    def apply_changes(self, changes):
+        table = self.table
+        seeds = set()
+        touched = set()
+        pairing_changed = False
+        for row, old_entity, new_entity in changes:
+            if old_entity is not None and old_entity['name'] in PIPES:
+                tile = _tile(old_entity['position']['x'], old_entity['position']['y'])
+                touched.add(tile)
+                if row is not None:
+                    # Listed under its new row already
+                    pipes = self.tiles.get(tile)
+                    if pipes is not None and row in pipes:
+                        pipes.remove(row)
+                        if not pipes:
+                            del self.tiles[tile]
+                    seeds.add(row)
+                pairing_changed |= old_entity['name'] == 'pipe-to-ground'
+            if new_entity is not None and new_entity['name'] in PIPES:
+                tile = _tile(table.xs[row], table.ys[row])
+                touched.add(tile)
+                self.tiles.setdefault(tile, []).append(row)
+                seeds.add(row)
+                pairing_changed |= new_entity['name'] == 'pipe-to-ground'
+        if not touched and not self.networks.stale:
+            return
+        for x, y in touched:
+            for dx, dy in CARDINAL_VECTORS.values():
+                seeds.update(self.tiles.get((x + dx, y + dy), ()))
+        if pairing_changed:
+            partners = self._pair()
+            seeds.update(row for row in partners.keys() | self.partners.keys() if partners.get(row) != self.partners.get(row))
+            self.partners = partners
+        pipe_codes = table.codes_of(PIPES)
+        self.networks.update(seeds, self.neighbours, lambda row: table.codes[row] in pipe_codes)
+
+
+def copper_wires(table, blueprint):
+    # (row, row) pole-to-pole copper cables: `neighbours` entity numbers in 1.x
+    # blueprints, the blueprint's `wires` list in 2.0. None when the blueprint records
+    # no cables at all.
+    pole_rows = table.rows_with(POWER_POLES)
+    rows_by_number = {table.numbers[row]: row for row in pole_rows}
+    wires = blueprint.get('wires')
+    if not table.neighbours and wires is None:
+        return None
+    pairs = []
+    for row, neighbours in table.neighbours.items():
+        for number in neighbours:
+            neighbour = rows_by_number.get(number)
+            if neighbour is not None and neighbour > row:
+                pairs.append((row, neighbour))
+    for wire in wires or ():
+        if len(wire) == 4 and wire[1] in COPPER_CONNECTORS and wire[3] in COPPER_CONNECTORS:
+            a = rows_by_number.get(wire[0])
+            b = rows_by_number.get(wire[2])
+            if a is not None and b is not None:
+                pairs.append((a, b))
+    return pairs
+
+
+class PowerGrid:
+    # Electric networks and pole coverage, kept up to date like BeltGraph. Poles are
+    # joined by their copper cables, or, for blueprints that record none, by every pair
+    # within both poles' wire reach, as the game connects them on placement. Unpowered
+    # holds the consumer rows outside every pole's supply area.
+
+    # Widest supply area half-width of any pole
+    max_supply = max(supply for _, supply in POWER_POLES.values())
+
+    def __init__(self, table, blueprint, spatial_index):
+        self.table = table
+        self.spatial_index = spatial_index
+        self.wires = blueprint.get('wires')
+        self.cables = self._cables(blueprint)
+        pole_rows = table.rows_with(POWER_POLES)
+        self.networks = RowNetworks(pole_rows, self.neighbours)
+        powered = set()
+        for row in pole_rows:
+            supply = POWER_POLES[table.name(row)][1]
+            powered.update(spatial_index.query_box(table.xs[row], table.ys[row], supply, name=ELECTRIC_CONSUMERS, overlap=True))
+        self.unpowered = {row for row in table.rows_with(ELECTRIC_CONSUMERS) if row not in powered}
+
+    def _cables(self, blueprint):
+        # {pole row: [rows it has cables to]}, or None when the blueprint records none
+        wires = copper_wires(self.table, blueprint)
+        if wires is None:
+            return None
+        cables = {}
+        for a, b in wires:
+            cables.setdefault(a, []).append(b)
+            cables.setdefault(b, []).append(a)
+        return cables
+
+    def neighbours(self, row):
+        if self.cables is not None:
+            return self.cables.get(row, [])
+        table = self.table
+        names = table.names
+        codes = table.codes
+        xs = table.xs
+        ys = table.ys
+        reach = POWER_POLES[names[codes[row]]][0]
+        return [
+            neighbour for neighbour in self.spatial_index.query_radius(xs[row], ys[row], reach, name=POWER_POLES)
+            if neighbour != row and
+            (xs[neighbour] - xs[row]) ** 2 + (ys[neighbour] - ys[row]) ** 2 <= min(reach, POWER_POLES[names[codes[neighbour]]][0]) ** 2
+        ]
+
+    def _powered(self, row):
+        # Whether any pole's supply area overlaps the consumer at `row`, tested as
+        # query_box(..., overlap=True) does from the pole's side
+        table = self.table
+        x = table.xs[row]
+        y = table.ys[row]
+        width, height = footprint(table.name(row), table.directions[row])
+        reach = self.max_supply + max(width, height) / 2
+        for pole in self.spatial_index.query_box(x, y, reach, name=POWER_POLES):
+            supply = POWER_POLES[table.name(pole)][1]
+            min_x, max_x = table.xs[pole] - supply, table.xs[pole] + supply
+            min_y, max_y = table.ys[pole] - supply, table.ys[pole] + supply
+            if not (x + width / 2 <= min_x or x - width / 2 >= max_x or y + height / 2 <= min_y or y - height / 2 >= max_y):
+                return True
+        return False
+
+    def renumber(self, renumbering):
+        if self.cables is not None:
+            self.cables = _renumber_links(self.cables, renumbering)
+        self.networks.renumber(renumbering)
+        self.unpowered = set(renumbering.rows(self.unpowered))
+
+    def apply_changes(self, changes, blueprint):
+        table = self.table
+        spatial_index = self.spatial_index
+        poles = set()
+        recheck = set()
+        for row, old_entity, new_entity in changes:
+            for entity in (old_entity, new_entity):
+                if entity is None:
+                    continue
+                name = entity['name']
+                if name in POWER_POLES:
+                    if row is not None:
+                        poles.add(row)
+                    # Consumers this pole's supply area covered or now covers
+                    recheck.update(spatial_index.query_box(
+                        entity['position']['x'], entity['position']['y'], POWER_POLES[name][1], name=ELECTRIC_CONSUMERS, overlap=True))
+                elif name in ELECTRIC_CONSUMERS and row is not None:
+                    recheck.add(row)
+        
+        wires = blueprint.get('wires')
+        if poles or wires != self.wires or self.networks.stale:
+            pole_codes = table.codes_of(POWER_POLES)
+            cables = self._cables(blueprint)
+            if (cables is None) != (self.cables is None) or wires != self.wires:
+                self.wires = wires
+                self.cables = cables
+                self.networks = RowNetworks(table.rows_with_codes(pole_codes), self.neighbours)
+            else:
+                if cables is not None:
+                    # Poles whose cables changed, including those wired to an edited pole
+                    poles.update(row for row in cables.keys() | self.cables.keys() if cables.get(row) != self.cables.get(row))
+                    self.cables = cables
+                self.networks.update(poles, self.neighbours, lambda row: table.codes[row] in pole_codes)
+        
+        consumer_codes = table.codes_of(ELECTRIC_CONSUMERS)
+        for row in recheck:
+            if table.codes[row] in consumer_codes and not self._powered(row):
+                self.unpowered.add(row)
+            else:
+                self.unpowered.discard(row)
+
+
+def _changed_names(changes):
+    # Names an edit touched, before and after
+    return {entity['name'] for change in changes for entity in change[1:] if entity is not None}
+
+
+def _network_sizes(networks, unit, shown=5):
+    sizes = ", ".join(str(len(network)) for network in networks[:shown])
+    if len(networks) > shown:
+        sizes += ", ..."
+    return f"{sizes} {unit}"
+
+
+class AnalysisContext:
+    # State shared by every analyzer: the columnar entity table filled during the single
+    # pass over the entities, plus the per-name counts and bounding box derived from it.
+
+    def __init__(self, blueprint_data, spatial_index=None):
+        self.blueprint_data = blueprint_data
+        self.entities = blueprint_data['blueprint'].get('entities', [])
+        self.table = EntityTable()
+        self.entity_count = 0
+        self.name_counts = {}
+        self.min_x = self.min_y = float('inf')
+        self.max_x = self.max_y = float('-inf')
+        self._spatial_index = spatial_index
+        self._belt_graph = None
+
+    @property
+    def sixteen_way_directions(self):
+        version = self.blueprint_data['blueprint'].get('version', 0)
+        return version >> 48 >= 2
+
+    @property
+    def spatial_index(self):
+        if self._spatial_index is None:
+            self._spatial_index = SpatialIndex(self.table)
+        return self._spatial_index
+
+    @property
+    def belt_graph(self):
+        if self._belt_graph is None:
+            self._belt_graph = BeltGraph(self.table, self.spatial_index, self.sixteen_way_directions)
+        return self._belt_graph
+
+    def renumber(self, renumbering):
+        # Follows IncrementalAnalysis renumbering the table's rows
+        if self._belt_graph is not None:
+            if renumbering.reordered:
+                # Overlapping belts resolve by row; rebuilt on next use
+                self._belt_graph = None
+            else:
+                self._belt_graph.renumber(renumbering)
+
+    def finish_pass(self):
+        table = self.table
+        self.entity_count = len(table)
+        self.name_counts = table.name_counts()
+        if self.entity_count:
+            self.min_x, self.min_y, self.max_x, self.max_y = table.bounds()
+
+    def apply_changes(self, changes):
+        # Delta-updates the counts and bounding box after the table took an edit;
+        # `changes` holds (row, old_entity, new_entity), with no old entity for an added
+        # row and no new one for a removed entity
+        name_counts = self.name_counts
+        bounds_shrank = False
+        for _, old_entity, new_entity in changes:
+            if old_entity is not None:
+                old_name = old_entity['name']
+                name_counts[old_name] -= 1
+                if not name_counts[old_name]:
+                    del name_counts[old_name]
+                x = old_entity['position']['x']
+                y = old_entity['position']['y']
+                if x in (self.min_x, self.max_x) or y in (self.min_y, self.max_y):
+                    bounds_shrank = True
+            if new_entity is not None:
+                name_counts[new_entity['name']] = name_counts.get(new_entity['name'], 0) + 1
+        self.entity_count = len(self.table)
+        if self._belt_graph is not None:
+            self._belt_graph.apply_changes(changes)
+        if bounds_shrank:
+            if self.entity_count:
+                self.min_x, self.min_y, self.max_x, self.max_y = self.table.bounds()
+            else:
+                self.min_x = self.min_y = float('inf')
+                self.max_x = self.max_y = float('-inf')
+            return
+        for _, _, new_entity in changes:
+            if new_entity is None:
+                continue
+            x = new_entity['position']['x']
+            y = new_entity['position']['y']
+            self.min_x = min(self.min_x, x)
+            self.max_x = max(self.max_x, x)
+            self.min_y = min(self.min_y, y)
+            self.max_y = max(self.max_y, y)
+
+    def count(self, name):
+        return self.name_counts.get(name, 0)
+
+    def bounds(self):
+        if not self.entity_count:
+            raise ValueError("Blueprint contains no entities")
+        return self.min_x, self.min_y, self.max_x, self.max_y
+
+
+# Entity groups the analyzers check against, built once at import
+ASSEMBLING_MACHINES = frozenset({'assembling-machine-1', 'assembling-machine-2', 'assembling-machine-3'})
+HIGH_POWER_CONSUMERS = frozenset({'electric-furnace', 'electric-mining-drill', 'assembling-machine-3', 'chemical-plant'})
+CIRCUIT_NETWORK_COMPONENTS = frozenset({'arithmetic-combinator', 'decider-combinator', 'constant-combinator', 'programmable-speaker', 'power-switch'})
+LOGISTICS_COMPONENTS = frozenset({'logistic-chest-active-provider', 'logistic-chest-passive-provider', 'logistic-chest-storage', 'logistic-chest-buffer', 'logistic-chest-requester', 'roboport'})
+
+
+class BlueprintAnalyzer:
+    # Base class for analyzers run by run_analysis. The shared pass loads every entity
+    # into context.table; `finalize` then builds the suggestions from the context:
+    # whole-blueprint state from prepare, per-entity findings from check_rows, which
+    # report as leading (before the summary) or trailing (after it), around the
+    # aggregate checks in summarize. Analyzers read the table, never the entity dicts,
+    # so a streamed blueprint doesn't need to keep them.
+    #
+    # Per-entity findings may only depend on entities within entity_radius tiles, which
+    # lets IncrementalAnalysis recheck just the neighbourhood of an edit; analyzers
+    # without per-entity findings leave it as None.
+    #
+    # summarize may also set `status`, lines describing the blueprint rather than
+    # suggesting a change (network sizes, say). They're reported under 'status' and
+    # don't count as suggestions.
+    key = None
+    title = None
+    entity_radius = None
+    status = ()
+    # AnalysisContext indexes the analyzer builds on; the analysis pass builds them
+    # before the analyzers run, each timed as a stage of its own
+    indexes = ()
+
+    def prepare(self, context):
+        pass
+
+    def candidate_rows(self, context):
+        # Rows check_rows needs to see on a full analysis
+        return range(len(context.table)) if self.entity_radius is not None else ()
+
+    def check_rows(self, rows, context):
+        # Returns ({row: leading findings}, {row: trailing findings}) for rows with findings
+        return {}, {}
+
+    def summarize(self, context):
+        return []
+
+    def renumber(self, context, renumbering):
+        # Renumbers the row-keyed prepared state after IncrementalAnalysis matched an edit
+        # with added or removed entities; the table already holds the new rows, and
+        # apply_changes follows
+        pass
+
+    def apply_changes(self, context, changes):
+        # Updates prepared state after an edit; `changes` holds (row, old_entity,
+        # new_entity) by new row, see AnalysisContext.apply_changes. Returns any rows,
+        # beyond the edited neighbourhood, whose findings may have changed.
+        return set()
+
+    def finalize(self, context):
+        self.prepare(context)
+        self.leading_findings, self.trailing_findings = self.check_rows(self.candidate_rows(context), context)
+        return list(chain.from_iterable(self.leading_findings.values())) + \
+            self.summarize(context) + \
+            list(chain.from_iterable(self.trailing_findings.values()))
+
+
+class SpaceEfficiencyAnalyzer(BlueprintAnalyzer):
+    key = 'space_efficiency'
+    title = "Space Efficiency"
+    entity_radius = 1
+
+    def prepare(self, context):
+        table = context.table
+        self.positions = table.positions()
+        # Counted rather than a set so moving one of two stacked entities keeps the tile occupied
+        self.occupied = Counter(self.positions)
+        self.pairs, self.unpaired = pair_undergrounds(table, context.sixteen_way_directions)
+        self.pairing_stale = False
+
+    def check_rows(self, rows, context):
+        table = context.table
+        names = table.names
+        codes = table.codes
+        positions = self.positions
+        occupied = self.occupied
+        unpaired = self.unpaired
+        assembler_codes = table.codes_of(ASSEMBLING_MACHINES)
+        
+        findings = {}
+        for row in rows:
+            x, y = positions[row]
+            code = codes[row]
+            name = names[code]
+            suggestions = []
+            neighbors = [
+                (x + dx, y + dy)
+                for dx in (-1, 0, 1)
+                for dy in (-1, 0, 1)
+                if not (dx == 0 and dy == 0)
+            ]
+            empty_neighbors = [pos for pos in neighbors if pos not in occupied]
+            
+            if empty_neighbors:
+                suggestions.append(f"Entity '{name}' at ({x}, {y}) has empty adjacent spaces.")
+            
+            # Check for compact design
+            if code in assembler_codes:
+                if len(empty_neighbors) > 2:
+                    suggestions.append(f"Assembling machine '{name}' at ({x}, {y}) could be placed more compactly.")
+            
+            # Check for underground belts and pipes without a partner
+            if row in unpaired:
+                suggestions.append(f"Underground entity '{name}' at ({x}, {y}) doesn't seem to have a partner within range.")
+            
+            if suggestions:
+                findings[row] = suggestions
+        return findings, {}
+
+    def summarize(self, context):
+        suggestions = []
+        table = context.table
+        
+        # Check how much of their reach underground connections use
+        if self.pairs:
+            utilization = sum(
+                max(abs(table.xs[end] - table.xs[start]), abs(table.ys[end] - table.ys[start])) / UNDERGROUND_MAX_SPANS[table.name(start)]
+                for start, end in self.pairs
+            ) / len(self.pairs)
+            if utilization < 0.5:
+                suggestions.append(f"Underground connections use only {utilization:.0%} of their maximum span on average ({len(self.pairs)} pairs). Longer jumps could free up more space.")
+        
+        # Check for overall layout compactness
+        min_x, min_y, max_x, max_y = context.bounds()
+        total_entities = len(table)
+        total_area = (max_x - min_x) * (max_y - min_y)
+        density = total_entities / total_area
+        
+        if density < 0.5:  # This threshold can be adjusted
+            suggestions.append("The overall layout seems sparse. Consider a more compact design to improve space efficiency.")
+        
+        return suggestions
+
+    def renumber(self, context, renumbering):
+        self.positions = renumbering.column(self.positions)
+        new_rows = renumbering.new_rows
+        self.pairs = [
+            (new_rows[start], new_rows[end]) for start, end in self.pairs
+            if new_rows[start] is not None and new_rows[end] is not None
         ]
-        empty_neighbors = [pos for pos in neighbors if pos not in entity_positions]
-        
-        if empty_neighbors:
-            suggestions.append(f"Entity '{entity['name']}' at ({x}, {y}) has empty adjacent spaces.")
-        
-        # Check for compact design
-        if entity['name'] in ['assembling-machine-1', 'assembling-machine-2', 'assembling-machine-3']:
-            if len(empty_neighbors) > 2:
-                suggestions.append(f"Assembling machine '{entity['name']}' at ({x}, {y}) could be placed more compactly.")
-        
-        # Check for efficient use of underground belts and pipes
-        if entity['name'] in ['underground-belt', 'pipe-to-ground']:
-            underground_partner = None
-            for dx in range(-5, 6):  # Check up to 5 tiles in each direction
-                for dy in range(-5, 6):
-                    check_pos = (x + dx, y + dy)
-                    if check_pos in entity_positions and entity_positions[check_pos] == entity['name']:
-                        underground_partner = check_pos
-                        break
-                if underground_partner:
-                    break
+        self.unpaired = set(renumbering.rows(self.unpaired))
+        # Pairing breaks ties by row
+        self.pairing_stale = renumbering.reordered
+
+    def apply_changes(self, context, changes):
+        table = context.table
+        occupied = self.occupied
+        positions = self.positions
+        positions.extend(repeat(None, len(table) - len(positions)))
+        pairing_changed = self.pairing_stale
+        self.pairing_stale = False
+        for row, old_entity, new_entity in changes:
+            if old_entity is not None:
+                old_position = (old_entity['position']['x'], old_entity['position']['y'])
+                occupied[old_position] -= 1
+                if not occupied[old_position]:
+                    del occupied[old_position]
+            if new_entity is not None:
+                new_position = table.position(row)
+                occupied[new_position] += 1
+                positions[row] = new_position
+        if not UNDERGROUND_MAX_SPANS.keys().isdisjoint(_changed_names(changes)):
+            pairing_changed = True
+        
+        if not pairing_changed:
+            return set()
+        previously_unpaired = self.unpaired
+        self.pairs, self.unpaired = pair_undergrounds(table, context.sixteen_way_directions)
+        return previously_unpaired ^ self.unpaired
+
+
+class ThroughputAnalyzer(BlueprintAnalyzer):
+    key = 'throughput'
+    title = "Throughput"
+    entity_radius = 2
+    indexes = ('spatial_index', 'belt_graph')
+
+    def candidate_rows(self, context):
+        return context.table.rows_with(['splitter'])
+
+    def check_rows(self, rows, context):
+        table = context.table
+        codes = table.codes
+        splitter_codes = table.codes_of(['splitter'])
+        leading = {}
+        if not splitter_codes:
+            return leading, {}
+        spatial_index = context.spatial_index
+        indexed = spatial_index.table
+        belt_codes = indexed.codes_where(lambda name: 'transport-belt' in name)
+        
+        for row in rows:
+            # Check for balanced inputs using splitters
+            if codes[row] in splitter_codes:
+                x, y = table.position(row)
+                nearby_rows = spatial_index.query_box(x, y, 2)
+                if len([nearby for nearby in nearby_rows if indexed.codes[nearby] in belt_codes]) < 3:
+                    leading[row] = [f"Splitter at ({x}, {y}) may not be fully utilized for balancing."]
+        
+        return leading, {}
+
+    def prepare(self, context):
+        self.flows = ItemFlows(context.table, context.belt_graph, context.sixteen_way_directions).solve()
+
+    def summarize(self, context):
+        suggestions = []
+        table = context.table
+        
+        # Suggest belt upgrades
+        if context.count('transport-belt') > context.count('fast-transport-belt') + context.count('express-transport-belt'):
+            suggestions.append("Consider upgrading some yellow belts to red or blue belts to improve throughput in high-demand areas.")
+        
+        # Suggest inserter upgrades
+        if context.count('inserter') > context.count('fast-inserter') + context.count('stack-inserter'):
+            suggestions.append("Upgrade some regular inserters to fast or stack inserters, especially in high-throughput areas.")
+        
+        # Report links that can't carry what the machines around them need at full speed
+        for row, rate, capacity in self.flows.overloaded_inserters():
+            x, y = table.position(row)
+            suggestions.append(f"{table.name(row)} at ({x}, {y}) needs to move {rate:.2f} items/s but manages about {capacity:.2f}/s. Use a faster inserter or add another one.")
+        for row, peak, length, capacity in self.flows.overloaded_belt_runs():
+            x, y = table.position(row)
+            suggestions.append(f"{table.name(row)} at ({x}, {y}) needs to carry up to {peak:.1f} items/s over {length} tile(s) but carries {capacity}/s. Upgrade the belt or split the load.")
+        if self.flows.unknown_recipes:
+            suggestions.append(f"{self.flows.unknown_recipes} machine(s) use recipes the rate solver doesn't know and were left out of the flow analysis.")
+        
+        return suggestions
+
+    def renumber(self, context, renumbering):
+        if renumbering.reordered:
+            # Belts in loops are solved in table order, so solve again in apply_changes
+            self.flows = None
+        else:
+            self.flows.renumber(renumbering)
+
+    def apply_changes(self, context, changes):
+        if self.flows is None or self.flows.belt_graph is not context.belt_graph:
+            self.prepare(context)
+        else:
+            self.flows.update(changes)
+        return set()
+
+
+def _module_counts(items):
+    # (module slots, efficiency, productivity, speed) for one entity's `items`
+    module_slots = efficiency_modules = productivity_modules = speed_modules = 0
+    for item in items or ():
+        if 'module' in item:
+            module_slots += 1
+            if 'efficiency-module' in item:
+                efficiency_modules += 1
+            elif 'productivity-module' in item:
+                productivity_modules += 1
+            elif 'speed-module' in item:
+                speed_modules += 1
+    return module_slots, efficiency_modules, productivity_modules, speed_modules
+
+
+class PowerEfficiencyAnalyzer(BlueprintAnalyzer):
+    key = 'power_efficiency'
+    title = "Power Efficiency"
+    entity_radius = 0
+    indexes = ('spatial_index',)
+
+    high_power_consumers = HIGH_POWER_CONSUMERS
+
+    def prepare(self, context):
+        # Check for module usage
+        self.module_counts = [0, 0, 0, 0]
+        for items in context.table.items.values():
+            self._add_modules(items, 1)
+        self.grid = PowerGrid(context.table, context.blueprint_data['blueprint'], context.spatial_index)
+
+    def _add_modules(self, items, sign):
+        for index, count in enumerate(_module_counts(items)):
+            self.module_counts[index] += sign * count
+
+    def candidate_rows(self, context):
+        return context.table.rows_with(self.high_power_consumers)
+
+    def check_rows(self, rows, context):
+        table = context.table
+        consumer_codes = table.codes_of(self.high_power_consumers)
+        findings = {}
+        
+        # Suggest efficiency modules for high power consumers
+        for row in rows:
+            if table.codes[row] not in consumer_codes:
+                continue
+            items = table.items.get(row)
+            if items is None or not any('efficiency-module' in item for item in items):
+                x, y = table.position(row)
+                findings[row] = [f"Consider adding Efficiency Modules to {table.name(row)} at ({x}, {y}) to reduce power consumption."]
+        return findings, {}
+
+    def summarize(self, context):
+        suggestions = []
+        solar_panel_count = context.count('solar-panel')
+        accumulator_count = context.count('accumulator')
+        module_slots, efficiency_modules, productivity_modules, speed_modules = self.module_counts
+        
+        # Analyze solar panel and accumulator ratio
+        if solar_panel_count > 0 or accumulator_count > 0:
+            ideal_ratio = 23 / 21  # Approximately 1.095
+            actual_ratio = solar_panel_count / accumulator_count if accumulator_count > 0 else float('inf')
+            if abs(actual_ratio - ideal_ratio) > 0.1:  # Allow for some deviation
+                suggestions.append(f"The ratio of solar panels to accumulators is not optimal. Current ratio: {actual_ratio:.2f}, Ideal ratio: {ideal_ratio:.2f}")
+        
+        # Analyze module usage
+        if module_slots > 0:
+            if efficiency_modules / module_slots < 0.2:
+                suggestions.append("Consider using more Efficiency Modules in machines to reduce power consumption.")
+            if productivity_modules / module_slots < 0.3:
+                suggestions.append("Increase the use of Productivity Modules in appropriate machines to improve resource efficiency.")
+        
+        # Check electric networks and pole coverage. A snippet without poles is powered
+        # from outside, so its machines are only mentioned, and its inserters not at all.
+        table = context.table
+        networks = self.grid.networks.groups()
+        unpowered = sorted(self.grid.unpowered)
+        self.status = []
+        if not networks:
+            machines = sum(1 for row in unpowered if table.name(row) not in INSERTER_RATES)
+            if machines:
+                self.status.append(f"No power poles: {machines} machine(s) need power from outside this blueprint.")
+        else:
+            if len(networks) > 1:
+                suggestions.append(f"Power poles form {len(networks)} separate electric networks ({_network_sizes(networks, 'poles')}). Connect them so they share generation.")
+            for row in unpowered:
+                x, y = table.position(row)
+                suggestions.append(f"{table.name(row)} at ({x}, {y}) is outside every power pole's supply area.")
+        
+        return suggestions
+
+    def renumber(self, context, renumbering):
+        if renumbering.reordered:
+            # Copper cables resolve entity numbers by row
+            self.grid = None
+        else:
+            self.grid.renumber(renumbering)
+
+    def apply_changes(self, context, changes):
+        for _, old_entity, new_entity in changes:
+            if old_entity is not None:
+                self._add_modules(old_entity.get('items'), -1)
+            if new_entity is not None:
+                self._add_modules(new_entity.get('items'), 1)
+        if self.grid is None:
+            self.grid = PowerGrid(context.table, context.blueprint_data['blueprint'], context.spatial_index)
+        else:
+            self.grid.apply_changes(changes, context.blueprint_data['blueprint'])
+        return set()
+
+
+class ProductionBalancingAnalyzer(BlueprintAnalyzer):
+    key = 'production_balancing'
+    title = "Production Balancing"
+
+    # Share by which use may exceed supply before it's reported
+    tolerance = 0.05
+
+    def prepare(self, context):
+        # Item rates of each machine (see machine_item_rates) and ore/s of each drill, by
+        # row, and the rates by item of the machines using and making it. Totals are
+        # summed with fsum, which doesn't depend on the order rows were added in, and
+        # kept per item until a machine using or making it changes.
+        self.machines = {}
+        self.users = {}
+        self.makers = {}
+        self.mined = {}
+        self.totals = {}
+        self.mined_total = None
+        table = context.table
+        for row in table.rows_with(CRAFTING_SPEEDS.keys() | MINING_RATES.keys()):
+            self._add(row, table.name(row), table.recipes.get(row), table.items.get(row))
+
+    def _add(self, row, name, recipe, items):
+        if name in MINING_RATES:
+            speed, productivity = module_bonuses(items)
+            self.mined[row] = MINING_RATES[name] * (1 + speed) * (1 + productivity)
+            self.mined_total = None
+            return
+        rates = machine_item_rates(name, recipe, items) if name in CRAFTING_SPEEDS else None
+        if rates is None:
+            return
+        self.machines[row] = rates
+        for item_rates, by_item in zip(rates, (self.users, self.makers)):
+            for item, rate in item_rates.items():
+                by_item.setdefault(item, {})[row] = rate
+                self.totals.pop(item, None)
+
+    def _remove(self, row):
+        if self.mined.pop(row, None) is not None:
+            self.mined_total = None
+        rates = self.machines.pop(row, None)
+        if rates is None:
+            return
+        for item_rates, by_item in zip(rates, (self.users, self.makers)):
+            for item in item_rates:
+                del by_item[item][row]
+                if not by_item[item]:
+                    del by_item[item]
+                self.totals.pop(item, None)
+
+    def _total(self, item):
+        # (items/s used, items/s made) by the machines in the blueprint
+        totals = self.totals.get(item)
+        if totals is None:
+            totals = self.totals[item] = (
+                math.fsum(self.users.get(item, {}).values()),
+                math.fsum(self.makers.get(item, {}).values()),
+            )
+        return totals
+
+    def summarize(self, context):
+        suggestions = []
+        
+        # Intermediates made here that the machines here use faster than they're made
+        for item in sorted(self.users.keys() & self.makers.keys()):
+            used, made = self._total(item)
+            if used > made * (1 + self.tolerance):
+                suggestions.append(f"Machines here use {used:.2f} {item}/s but make only {made:.2f}/s. Add {item} production or bring more in.")
+        
+        # Ore the drills mine against what the furnaces and machines here smelt
+        if self.mined:
+            if self.mined_total is None:
+                self.mined_total = math.fsum(self.mined.values())
+            ore_used = math.fsum(self._total(item)[0] for item in sorted(MINED_ITEMS & self.users.keys()))
+            if ore_used > self.mined_total * (1 + self.tolerance):
+                suggestions.append(f"Furnaces and machines here use {ore_used:.2f} ore/s but the drills mine only {self.mined_total:.2f}/s. Add drills or bring in more ore.")
+        
+        return suggestions
+
+    def renumber(self, context, renumbering):
+        for row in renumbering.removed():
+            self._remove(row)
+        self.machines = renumbering.keys(self.machines)
+        self.mined = renumbering.keys(self.mined)
+        for by_item in (self.users, self.makers):
+            for item, rates in by_item.items():
+                by_item[item] = renumbering.keys(rates)
+
+    def apply_changes(self, context, changes):
+        for row, _, new_entity in changes:
+            # Removed entities were dropped in renumber
+            if row is not None:
+                self._remove(row)
+                self._add(row, new_entity['name'], new_entity.get('recipe'), new_entity.get('items'))
+        return set()
+
+
+class TransportOptimizationAnalyzer(BlueprintAnalyzer):
+    key = 'transport_optimization'
+    title = "Transport Optimization"
+    indexes = ('spatial_index', 'belt_graph')
+
+    def prepare(self, context):
+        self.belt_graph = context.belt_graph
+        # Ids of belt networks nothing loads or unloads, which carry items between
+        # whatever the blueprint is placed next to, and the last tiles of those loaded
+        # but never unloaded
+        self.isolated = set()
+        self.dead_ends = {}
+        self._check_networks(self.belt_graph.networks.members)
+        self.pipes = PipeGraph(context.table, context.sixteen_way_directions)
+
+    def _check_networks(self, networks):
+        graph = self.belt_graph
+        members = graph.networks.members
+        for network in networks:
+            rows = members.get(network)
+            if rows is None:
+                continue
+            unloaded = any(row in graph.unloaders for row in rows)
+            if not unloaded and not any(row in graph.loaders for row in rows):
+                self.isolated.add(network)
+            elif not unloaded:
+                self.dead_ends[network] = [row for row in rows if row not in graph.successors]
+
+    def summarize(self, context):
+        suggestions = []
+        table = context.table
+        belt_lengths = {name: context.count(name) for name in ('transport-belt', 'fast-transport-belt', 'express-transport-belt')}
+        train_components = {name: context.count(name) for name in ('train-stop', 'rail', 'rail-signal', 'rail-chain-signal')}
+        
+        total_belt_length = sum(belt_lengths.values())
+        
+        # Suggest train system for long distances
+        if total_belt_length > 1000:  # Arbitrary threshold, adjust as needed
+            suggestions.append("Consider implementing a train system for long-distance transport to improve efficiency.")
+        
+        # Analyze existing train network
+        if train_components['train-stop'] > 0:
+            if train_components['rail-signal'] == 0 and train_components['rail-chain-signal'] == 0:
+                suggestions.append("Your train network lacks signals. Add rail signals and chain signals to prevent deadlocks and improve efficiency.")
             
-            if not underground_partner:
-                suggestions.append(f"Underground entity '{entity['name']}' at ({x}, {y}) doesn't seem to have a partner within range.")
-            else:
-                distance = max(abs(underground_partner[0] - x), abs(underground_partner[1] - y))
-                if distance < 4:  # Assuming max underground distance is 4
-                    suggestions.append(f"Underground connection from ({x}, {y}) to {underground_partner} could potentially span a greater distance.")
-    
-    # Check for overall layout compactness
-    total_entities = len(entities)
-    total_area = (max(e['position']['x'] for e in entities) - min(e['position']['x'] for e in entities)) * \
-                 (max(e['position']['y'] for e in entities) - min(e['position']['y'] for e in entities))
-    density = total_entities / total_area
-    
-    if density < 0.5:  # This threshold can be adjusted
-        suggestions.append("The overall layout seems sparse. Consider a more compact design to improve space efficiency.")
-    
-    return suggestions
+            signal_ratio = (train_components['rail-signal'] + train_components['rail-chain-signal']) / train_components['rail']
+            if signal_ratio < 0.1:  # Arbitrary threshold, adjust as needed
+                suggestions.append("Your train network may benefit from more signals to improve throughput.")
+            
+            if train_components['train-stop'] < 2:
+                suggestions.append("Consider adding more train stops to distribute resources effectively across your factory.")
+        
+        # Suggest belt upgrades for high-throughput areas
+        if belt_lengths['transport-belt'] > belt_lengths['fast-transport-belt'] + belt_lengths['express-transport-belt']:
+            suggestions.append("Upgrade to faster belts in high-throughput areas to prevent bottlenecks.")
+        
+        # Check for potential long-distance belt transport
+        min_x, min_y, max_x, max_y = context.bounds()
+        
+        blueprint_size = max(max_x - min_x, max_y - min_y)
+        if blueprint_size > 200 and train_components['train-stop'] == 0:  # Arbitrary threshold, adjust as needed
+            suggestions.append("Your blueprint covers a large area. Consider implementing a train network for more efficient long-distance transport.")
+        
+        # Check belt and pipe connectivity
+        belt_networks = self.belt_graph.networks
+        networks = belt_networks.groups()
+        self.status = []
+        if networks:
+            self.status.append(f"Belts form {len(networks)} separate network(s) ({_network_sizes(networks, 'tiles')}).")
+        passing = [network for network in networks if belt_networks.network_of[network[0]] in self.isolated]
+        if passing:
+            self.status.append(f"{len(passing)} belt network(s) ({_network_sizes(passing, 'tiles')}) have no inserter or drill on them and are taken to pass items through.")
+        for row in sorted(chain.from_iterable(self.dead_ends.values())):
+            if self._leaves_blueprint(context, row):
+                # An output line, running on to whatever the blueprint is placed next to
+                continue
+            x, y = table.position(row)
+            suggestions.append(f"Belt at ({x}, {y}) is a dead end: items are loaded onto its network but nothing takes them off.")
+        pipe_networks = self.pipes.networks.groups()
+        if pipe_networks:
+            self.status.append(f"Pipes form {len(pipe_networks)} separate network(s) ({_network_sizes(pipe_networks, 'pipes')}).")
+        
+        return suggestions
 
+    def _leaves_blueprint(self, context, row):
+        # Whether the belt at `row` carries items on past the edge of the blueprint
+        table = context.table
+        vector = direction_vector(table.directions[row], context.sixteen_way_directions)
+        if vector is None:
+            return False
+        min_x, min_y, max_x, max_y = context.bounds()
+        x = table.xs[row] + vector[0]
+        y = table.ys[row] + vector[1]
+        return not (min_x <= x <= max_x and min_y <= y <= max_y)
 
-def analyze_throughput(blueprint_data):
-    suggestions = []
-    entities = blueprint_data['blueprint'].get('entities', [])
-    
-    belt_counts = {'transport-belt': 0, 'fast-transport-belt': 0, 'express-transport-belt': 0}
-    inserter_counts = {'inserter': 0, 'fast-inserter': 0, 'stack-inserter': 0}
-    
-    for entity in entities:
-        # Analyze belt types
-        if entity['name'] in belt_counts:
-            belt_counts[entity['name']] += 1
+    def renumber(self, context, renumbering):
+        # Network ids survive a renumbering
+        self.dead_ends = {network: renumbering.rows(rows) for network, rows in self.dead_ends.items()}
+        if renumbering.reordered:
+            # Pipe-to-ground pairing breaks ties by row
+            self.pipes = None
+        else:
+            self.pipes.renumber(renumbering)
+
+    def apply_changes(self, context, changes):
+        graph = context.belt_graph
+        if graph is not self.belt_graph:
+            # Rebuilt after a reordering
+            self.prepare(context)
+            return set()
+        members = graph.networks.members
+        self.isolated = {network for network in self.isolated if network in members and network not in graph.changed_networks}
+        for network in [network for network in self.dead_ends if network not in members or network in graph.changed_networks]:
+            del self.dead_ends[network]
+        self._check_networks(graph.changed_networks)
+        if self.pipes is None:
+            self.pipes = PipeGraph(context.table, context.sixteen_way_directions)
+        else:
+            self.pipes.apply_changes(changes)
+        return set()
+
+
+class AutomationAndCircuitsAnalyzer(BlueprintAnalyzer):
+    key = 'automation_and_circuits'
+    title = "Automation and Circuits"
+    entity_radius = 0
+
+    circuit_network_components = CIRCUIT_NETWORK_COMPONENTS
+    logistics_components = LOGISTICS_COMPONENTS
+
+    def candidate_rows(self, context):
+        return list(context.table.control_behavior)
+
+    def check_rows(self, rows, context):
+        table = context.table
+        inserter_codes = table.codes_where(lambda name: 'inserter' in name)
+        findings = {}
+        
+        # Check for circuit conditions on inserters
+        for row in rows:
+            control_behavior = table.control_behavior.get(row)
+            if control_behavior is not None and table.codes[row] in inserter_codes and 'circuit_condition' in control_behavior:
+                x, y = table.position(row)
+                findings[row] = [f"Inserter at ({x}, {y}) is using circuit conditions. Good job on automation!"]
+        return findings, {}
+
+    def summarize(self, context):
+        suggestions = []
+        
+        # Analyze circuit network usage
+        total_circuit_components = sum(context.count(name) for name in self.circuit_network_components)
+        if total_circuit_components == 0:
+            suggestions.append("Consider using circuit networks to optimize your factory. They can help control production and prevent overproduction.")
+        elif total_circuit_components < 5:
+            suggestions.append("You're using some circuit networks. Consider expanding their use for more complex automation.")
+        else:
+            suggestions.append("Great job utilizing circuit networks for automation!")
+        
+        # Analyze logistics system
+        total_logistics_chests = sum(context.count(name) for name in self.logistics_components) - context.count('roboport')
+        if context.count('roboport') == 0:
+            suggestions.append("Consider implementing a logistics system with roboports for more efficient item movement.")
+        elif total_logistics_chests == 0:
+            suggestions.append("You have roboports but no logistics chests. Add provider and requester chests to utilize your logistics network.")
+        else:
+            suggestions.append("Good use of a logistics network. Ensure provider chests are near production and requester chests near consumption for optimal efficiency.")
         
-        # Analyze inserter types
-        if entity['name'] in inserter_counts:
-            inserter_counts[entity['name']] += 1
+        # Check for balanced use of different chest types
+        if context.count('logistic-chest-requester') > 0 and context.count('logistic-chest-passive-provider') == 0:
+            suggestions.append("You're using requester chests but no passive provider chests. Consider adding passive providers for a more balanced logistics system.")
         
-        # Check for balanced inputs using splitters
-        if entity['name'] == 'splitter':
-            nearby_entities = [e for e in entities if abs(e['position']['x'] - entity['position']['x']) <= 2 and abs(e['position']['y'] - entity['position']['y']) <= 2]
-            if len([e for e in nearby_entities if 'transport-belt' in e['name']]) < 3:
-                suggestions.append(f"Splitter at ({entity['position']['x']}, {entity['position']['y']}) may not be fully utilized for balancing.")
+        return suggestions
+
+
+# Analyzer classes by key, in report order
+ANALYZER_REGISTRY = {
+    'space_efficiency': SpaceEfficiencyAnalyzer,
+    'throughput': ThroughputAnalyzer,
+    'power_efficiency': PowerEfficiencyAnalyzer,
+    'production_balancing': ProductionBalancingAnalyzer,
+    'transport_optimization': TransportOptimizationAnalyzer,
+    'automation_and_circuits': AutomationAndCircuitsAnalyzer,
+}
+
+ANALYZERS = list(ANALYZER_REGISTRY.values())
+
+
+def get_analyzers(keys=None):
+    # Analyzer classes for the given keys, or all of them, in report order
+    if keys is None:
+        return list(ANALYZERS)
+    for key in keys:
+        if key not in ANALYZER_REGISTRY:
+            raise ValueError(f"Unknown analyzer '{key}'. Choose from: {', '.join(ANALYZER_REGISTRY)}")
+    return [ANALYZER_REGISTRY[key] for key in keys]
+
+
+# Entities handled between cancellation checks during the shared pass
+CANCEL_CHECK_INTERVAL = 4096
+
+
+class AnalysisCancelled(Exception):
+    pass
+
+
+def run_analysis(blueprint_data, analyzers=None, spatial_index=None, profiler=None):
+    # Runs every analyzer over the blueprint in a single pass over its entities and
+    # returns the analysis_results dict consumed by generate_optimization_report.
+    # With a profiler, the per-stage timings are included under 'timings'.
+    analysis_results = collect_results(iter_analysis(blueprint_data, analyzers, spatial_index, profiler=profiler))
+    if profiler is not None:
+        analysis_results['timings'] = profiler.as_dict()
+    return analysis_results
+
+
+def collect_results(analyzed):
+    # analysis_results dict from (analyzer, suggestions) pairs as iter_analysis yields
+    # them, with the analyzers' status lines under 'status'
+    analysis_results = {}
+    status = {}
+    for analyzer, suggestions in analyzed:
+        analysis_results[analyzer.key] = suggestions
+        if analyzer.status:
+            status[analyzer.key] = list(analyzer.status)
+    if status:
+        analysis_results['status'] = status
+    return analysis_results
+
+
+def run_analysis_stream(entity_stream, analyzers=None, blueprint=None):
+    # Same as run_analysis, but consumes entities as they are decoded, e.g. from
+    # iter_blueprint_entities, without keeping them.
+    # `blueprint` holds the blueprint's other fields, which the entity stream doesn't
+    # carry: 'version' decides between 8- and 16-way directions and 2.0 blueprints keep
+    # their copper cables in 'wires'. They are read after the stream is exhausted.
+    context = AnalysisContext({'blueprint': blueprint if blueprint is not None else {}})
+    return collect_results(_iter_analysis_pass(context, entity_stream, analyzers))
+
+
+def analyze_stream(blueprint_source, analyzers=None, chunk_size=STREAM_CHUNK_SIZE):
+    # Streaming counterpart of analyze_string for a blueprint string or a text file
+    # holding one: each blueprint is analyzed as its entities are decoded, so memory
+    # stays flat however large the input. Returns analysis_results for a blueprint, or
+    # (label, analysis_results) pairs in book order for a book, where a blueprint that
+    # fails gets {'error': ...} as in analyze_blueprints.
+    events = iter_blueprint_events(blueprint_source, chunk_size)
+    for kind, value in events:
+        if kind == 'start':
+            entities = _entities_until_end(events)
+            try:
+                outcome = run_analysis_stream(entities, analyzers, value)
+            except Exception as e:
+                if events.gi_frame is None:
+                    # The stream itself is broken, not just this blueprint
+                    raise
+                outcome = e
+                # Skip the rest of this blueprint's entities
+                for _ in entities:
+                    pass
+            # Kept on the document's copy of the blueprint, to be labelled once the
+            # whole book has been read
+            value['analysis_results'] = outcome
+        elif kind == 'document':
+            document = value
     
-    # Suggest belt upgrades
-    if belt_counts['transport-belt'] > belt_counts['fast-transport-belt'] + belt_counts['express-transport-belt']:
-        suggestions.append("Consider upgrading some yellow belts to red or blue belts to improve throughput in high-demand areas.")
+    if 'blueprint' in document:
+        outcome = document['blueprint']['analysis_results']
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+    results = []
+    for label, blueprint_data in iter_blueprints(document):
+        outcome = blueprint_data['blueprint']['analysis_results']
+        if isinstance(outcome, Exception):
+            outcome = {'error': str(outcome) or type(outcome).__name__}
+        results.append((label, outcome))
+    if not results:
+        raise ValueError("The blueprint string doesn't contain any blueprints")
+    return results
+
+
+def _entities_until_end(events):
+    # Entities of the blueprint iter_blueprint_events just started
+    for kind, value in events:
+        if kind != 'entity':
+            return
+        yield value
+
+
+def iter_analysis(blueprint_data, analyzers=None, spatial_index=None, should_cancel=None, profiler=None):
+    # Yields (analyzer, suggestions) as each analyzer finishes, so callers can show
+    # partial reports. `should_cancel` is polled during the pass and between analyzers;
+    # when it returns True, AnalysisCancelled is raised.
+    context = AnalysisContext(blueprint_data, spatial_index)
+    return _iter_analysis_pass(context, context.entities, analyzers, should_cancel, profiler)
+
+
+def _iter_analysis_pass(context, entities, analyzers, should_cancel=None, profiler=None):
+    profiler = profiler or NULL_PROFILER
+    analyzers = [analyzer() if isinstance(analyzer, type) else analyzer for analyzer in (analyzers or get_analyzers())]
     
-    # Suggest inserter upgrades
-    if inserter_counts['inserter'] > inserter_counts['fast-inserter'] + inserter_counts['stack-inserter']:
-        suggestions.append("Upgrade some regular inserters to fast or stack inserters, especially in high-throughput areas.")
+    table = context.table
+    entities = iter(entities)
+    with profiler.stage('entity_pass') as timing:
+        while True:
+            batch = list(islice(entities, CANCEL_CHECK_INTERVAL)) if should_cancel else entities
+            table.extend(batch)
+            if not should_cancel or not batch:
+                break
+            if should_cancel():
+                raise AnalysisCancelled()
+        context.finish_pass()
+        timing['entities'] = context.entity_count
     
-    # Check for potential bottlenecks
-    high_throughput_areas = ['electronic-circuit', 'advanced-circuit', 'processing-unit', 'iron-plate', 'copper-plate', 'steel-plate']
-    for entity in entities:
-        if entity['name'] in high_throughput_areas:
-            nearby_belts = [e for e in entities if 'transport-belt' in e['name'] and abs(e['position']['x'] - entity['position']['x']) <= 1 and abs(e['position']['y'] - entity['position']['y']) <= 1]
-            if any('transport-belt' == belt['name'] for belt in nearby_belts):
-                suggestions.append(f"Consider upgrading belts near {entity['name']} at ({entity['position']['x']}, {entity['position']['y']}) to higher tier for better throughput.")
+    # Built here rather than by whichever analyzer uses them first, so the analyzers'
+    # timings don't depend on their order
+    for index in ('spatial_index', 'belt_graph'):
+        if any(index in analyzer.indexes for analyzer in analyzers):
+            if should_cancel and should_cancel():
+                raise AnalysisCancelled()
+            with profiler.stage(index):
+                getattr(context, index)
     
-    return suggestions
+    for analyzer in analyzers:
+        if should_cancel and should_cancel():
+            raise AnalysisCancelled()
+        with profiler.stage(analyzer.key) as timing:
+            suggestions = analyzer.finalize(context)
+            timing['entities'] = context.entity_count
+        yield analyzer, suggestions
+
+
+def analyze_space_efficiency(blueprint_data):
+    return run_analysis(blueprint_data, [SpaceEfficiencyAnalyzer])['space_efficiency']
+
+
+def analyze_throughput(blueprint_data, spatial_index=None):
+    return run_analysis(blueprint_data, [ThroughputAnalyzer], spatial_index)['throughput']
 
 
 def analyze_power_efficiency(blueprint_data):
-    suggestions = []
-    entities = blueprint_data['blueprint'].get('entities', [])
-    
-    solar_panel_count = 0
-    accumulator_count = 0
-    module_slots = 0
-    efficiency_modules = 0
-    productivity_modules = 0
-    speed_modules = 0
-    
-    high_power_consumers = ['electric-furnace', 'electric-mining-drill', 'assembling-machine-3', 'chemical-plant']
-    
-    for entity in entities:
-        if entity['name'] == 'solar-panel':
-            solar_panel_count += 1
-        elif entity['name'] == 'accumulator':
-            accumulator_count += 1
-        
-        # Check for module usage
-        if 'items' in entity:
-            for item in entity['items']:
-                if 'module' in item:
-                    module_slots += 1
-                    if 'efficiency-module' in item:
-                        efficiency_modules += 1
-                    elif 'productivity-module' in item:
-                        productivity_modules += 1
-                    elif 'speed-module' in item:
-                        speed_modules += 1
-        
-        # Suggest efficiency modules for high power consumers
-        if entity['name'] in high_power_consumers and ('items' not in entity or not any('efficiency-module' in item for item in entity['items'])):
-            suggestions.append(f"Consider adding Efficiency Modules to {entity['name']} at ({entity['position']['x']}, {entity['position']['y']}) to reduce power consumption.")
-    
-    # Analyze solar panel and accumulator ratio
-    if solar_panel_count > 0 or accumulator_count > 0:
-        ideal_ratio = 23 / 21  # Approximately 1.095
-        actual_ratio = solar_panel_count / accumulator_count if accumulator_count > 0 else float('inf')
-        if abs(actual_ratio - ideal_ratio) > 0.1:  # Allow for some deviation
-            suggestions.append(f"The ratio of solar panels to accumulators is not optimal. Current ratio: {actual_ratio:.2f}, Ideal ratio: {ideal_ratio:.2f}")
-    
-    # Analyze module usage
-    if module_slots > 0:
-        if efficiency_modules / module_slots < 0.2:
-            suggestions.append("Consider using more Efficiency Modules in machines to reduce power consumption.")
-        if productivity_modules / module_slots < 0.3:
-            suggestions.append("Increase the use of Productivity Modules in appropriate machines to improve resource efficiency.")
-    
-    return suggestions
+    return run_analysis(blueprint_data, [PowerEfficiencyAnalyzer])['power_efficiency']
 
 
 def analyze_production_balancing(blueprint_data):
-    suggestions = []
-    entities = blueprint_data['blueprint'].get('entities', [])
-    
-    # Count different types of entities
-    entity_counts = {}
-    for entity in entities:
-        entity_counts[entity['name']] = entity_counts.get(entity['name'], 0) + 1
-    
-    # Check smelting ratios
-    iron_furnaces = entity_counts.get('stone-furnace', 0) + entity_counts.get('steel-furnace', 0) + entity_counts.get('electric-furnace', 0)
-    steel_furnaces = entity_counts.get('steel-furnace', 0) + entity_counts.get('electric-furnace', 0)
-    if iron_furnaces > 0 and steel_furnaces > 0:
-        ideal_ratio = 5  # 5 iron furnaces to 1 steel furnace
-        actual_ratio = iron_furnaces / steel_furnaces
-        if abs(actual_ratio - ideal_ratio) > 0.5:
-            suggestions.append(f"The ratio of iron to steel furnaces is not optimal. Current ratio: {actual_ratio:.2f}, Ideal ratio: {ideal_ratio}")
-    
-    # Check circuit production ratios
-    copper_cable_assemblers = entity_counts.get('assembling-machine-1', 0) + entity_counts.get('assembling-machine-2', 0) + entity_counts.get('assembling-machine-3', 0)
-    green_circuit_assemblers = copper_cable_assemblers // 3 * 2
-    if copper_cable_assemblers > 0 and green_circuit_assemblers > 0:
-        ideal_ratio = 3/2  # 3 copper cable assemblers to 2 green circuit assemblers
-        actual_ratio = copper_cable_assemblers / green_circuit_assemblers
-        if abs(actual_ratio - ideal_ratio) > 0.2:
-            suggestions.append(f"The ratio of copper cable to green circuit assemblers is not optimal. Current ratio: {actual_ratio:.2f}, Ideal ratio: {ideal_ratio}")
-    
-    # Check mining to smelting ratio
-    miners = entity_counts.get('electric-mining-drill', 0) + entity_counts.get('burner-mining-drill', 0)
-    if miners > 0 and iron_furnaces > 0:
-        ideal_ratio = 1  # Assuming 1 miner can support 1 furnace (this may vary based on game settings)
-        actual_ratio = miners / iron_furnaces
-        if abs(actual_ratio - ideal_ratio) > 0.2:
-            suggestions.append(f"The ratio of miners to furnaces may not be balanced. Current ratio: {actual_ratio:.2f}, Consider adjusting for optimal production.")
-    
-    # Check for potential bottlenecks in production chains
-    if entity_counts.get('assembling-machine-3', 0) > entity_counts.get('electronic-circuit', 0):
-        suggestions.append("You may need more green circuit production to support your assembling machines.")
-    
-    if entity_counts.get('chemical-plant', 0) > entity_counts.get('oil-refinery', 0) * 3:
-        suggestions.append("Consider adding more oil refineries to support your chemical plants.")
-    
-    return suggestions
+    return run_analysis(blueprint_data, [ProductionBalancingAnalyzer])['production_balancing']
 
 
 def analyze_transport_optimization(blueprint_data):
-    suggestions = []
-    entities = blueprint_data['blueprint'].get('entities', [])
+    return run_analysis(blueprint_data, [TransportOptimizationAnalyzer])['transport_optimization']
+
+
+def analyze_automation_and_circuits(blueprint_data):
+    return run_analysis(blueprint_data, [AutomationAndCircuitsAnalyzer])['automation_and_circuits']
+
+
+def _entity_place(entity):
+    position = entity['position']
+    return entity['name'], position['x'], position['y']
+
+
+def match_entities(old_entities, new_entities):
+    # For each new entity, the index of the previous entity it continues, or None for an
+    # added one. Entities pair up by entity_number while name and position agree, then
+    # by name and position (exports that renumbered them), then by entity_number alone
+    # (an entity moved, rotated or replaced in place).
+    matches = [None] * len(new_entities)
+    taken = [False] * len(old_entities)
+    by_number = {}
+    for index, entity in enumerate(old_entities):
+        number = entity.get('entity_number')
+        if number is not None:
+            by_number.setdefault(number, index)
     
-    belt_lengths = {'transport-belt': 0, 'fast-transport-belt': 0, 'express-transport-belt': 0}
-    train_components = {'train-stop': 0, 'rail': 0, 'rail-signal': 0, 'rail-chain-signal': 0}
+    pending = []
+    for index, entity in enumerate(new_entities):
+        match = by_number.get(entity.get('entity_number'))
+        if match is not None and not taken[match] and _entity_place(old_entities[match]) == _entity_place(entity):
+            matches[index] = match
+            taken[match] = True
+        else:
+            pending.append(index)
+    if not pending:
+        return matches
     
-    for entity in entities:
-        # Analyze belt usage
-        if entity['name'] in belt_lengths:
-            belt_lengths[entity['name']] += 1
+    by_place = {}
+    for index in range(len(old_entities) - 1, -1, -1):
+        if not taken[index]:
+            by_place.setdefault(_entity_place(old_entities[index]), []).append(index)
+    unplaced = []
+    for index in pending:
+        candidates = by_place.get(_entity_place(new_entities[index]))
+        if candidates:
+            match = candidates.pop()
+            matches[index] = match
+            taken[match] = True
+        else:
+            unplaced.append(index)
+    for index in unplaced:
+        match = by_number.get(new_entities[index].get('entity_number'))
+        if match is not None and not taken[match]:
+            matches[index] = match
+            taken[match] = True
+    return matches
+
+
+class RowFindings:
+    # One analyzer's per-entity findings by row, for IncrementalAnalysis: the rows that
+    # have findings in order, and the findings flattened in that order. Replacing rows
+    # costs only those rows, and the flattened list is only rebuilt once some row's
+    # findings actually changed.
+
+    def __init__(self, findings):
+        self.findings = dict(sorted(findings.items()))
+        self.rows = list(self.findings)
+        self._flattened = None
+
+    def flattened(self):
+        if self._flattened is None:
+            self._flattened = list(chain.from_iterable(map(self.findings.__getitem__, self.rows)))
+        return self._flattened
+
+    def replace(self, rows, findings):
+        # Sets the findings of each of `rows` from {row: findings}, no entry meaning none
+        for row in rows:
+            old = self.findings.get(row)
+            new = findings.get(row)
+            if old == new:
+                continue
+            if new is None:
+                del self.findings[row]
+                del self.rows[bisect_left(self.rows, row)]
+            else:
+                if old is None:
+                    insort(self.rows, row)
+                self.findings[row] = new
+            self._flattened = None
+
+    def renumber(self, renumbering):
+        if any(row in self.findings for row in renumbering.removed()):
+            self._flattened = None
+        self.findings = renumbering.keys(self.findings)
+        self.rows = renumbering.rows(self.rows)
+        if renumbering.reordered:
+            self.rows.sort()
+            self._flattened = None
+
+
+class IncrementalAnalysis:
+    # Re-analyzes successive versions of one blueprint, e.g. as it is edited and pasted
+    # again in the GUI. The new entities are matched against the previous ones, see
+    # match_entities, after skipping the unchanged runs at either end; for a small edit
+    # (entities moved, rotated, replaced, given other modules or circuit conditions,
+    # added or removed) only the per-entity findings near the edit are rechecked and the
+    # aggregate checks rerun on delta-updated state. Rows follow the new entity order, so
+    # when entities were added before others or removed, each analyzer's state is
+    # renumbered first. Larger edits fall back to a full analysis. Blueprint data passed
+    # in is kept for the next diff and must not be modified afterwards.
+
+    # Beyond this share of edited entities a full analysis is about as fast
+    max_changed_fraction = 0.05
+
+    def __init__(self, analyzers=None):
+        self.analyzer_classes = analyzers or get_analyzers()
+        self.reset()
+
+    def reset(self):
+        self.context = None
+        self.analyzers = None
+        self.entities = None
+        self.row_findings = {}
+
+    def analyze(self, blueprint_data):
+        return collect_results(self.iter_analysis(blueprint_data))
+
+    def iter_analysis(self, blueprint_data, should_cancel=None):
+        # Same contract as iter_analysis. A cancelled or failed run forgets the previous
+        # blueprint, so the next one is analyzed in full.
+        entities = blueprint_data['blueprint'].get('entities', [])
+        try:
+            diff = self._diff(blueprint_data, entities)
+        except (KeyError, TypeError):
+            # Malformed entities; the full analysis reports them
+            diff = None
+        if diff is None:
+            return self._iter_full(blueprint_data, should_cancel)
+        return self._iter_update(blueprint_data, entities, *diff, should_cancel)
+
+    def _diff(self, blueprint_data, entities):
+        # Returns (renumbering, changes), changes holding (row, old_entity, new_entity) by
+        # new row as for AnalysisContext.apply_changes and renumbering being None when
+        # every previous entity kept its row, or None when a full analysis is due
+        if self.context is None:
+            return None
+        if blueprint_data['blueprint'].get('version', 0) != self.context.blueprint_data['blueprint'].get('version', 0):
+            return None
+        old_entities = self.entities
+        limit = self.max_changed_fraction * len(entities)
+        if abs(len(entities) - len(old_entities)) > limit:
+            return None
         
-        # Count train components
-        if entity['name'] in train_components:
-            train_components[entity['name']] += 1
-    
-    total_belt_length = sum(belt_lengths.values())
-    
-    # Suggest train system for long distances
-    if total_belt_length > 1000:  # Arbitrary threshold, adjust as needed
-        suggestions.append("Consider implementing a train system for long-distance transport to improve efficiency.")
-    
-    # Analyze existing train network
-    if train_components['train-stop'] > 0:
-        if train_components['rail-signal'] == 0 and train_components['rail-chain-signal'] == 0:
-            suggestions.append("Your train network lacks signals. Add rail signals and chain signals to prevent deadlocks and improve efficiency.")
+        # Entities before the first difference and after the last keep their place
+        shared = min(len(old_entities), len(entities))
+        start = next(compress(range(shared), map(ne, old_entities, entities)), shared)
+        end = next(compress(range(shared - start), map(ne, reversed(old_entities), reversed(entities))), shared - start)
+        old_end = len(old_entities) - end
+        new_end = len(entities) - end
+        if old_end == new_end:
+            changed = list(compress(range(start, new_end), map(ne, islice(old_entities, start, old_end), islice(entities, start, new_end))))
+            if len(changed) <= limit:
+                return None, [(row, old_entities[row], entities[row]) for row in changed]
         
-        signal_ratio = (train_components['rail-signal'] + train_components['rail-chain-signal']) / train_components['rail']
-        if signal_ratio < 0.1:  # Arbitrary threshold, adjust as needed
-            suggestions.append("Your train network may benefit from more signals to improve throughput.")
+        matches = match_entities(old_entities[start:old_end], entities[start:new_end])
+        old_rows = list(range(start))
+        changes = []
+        kept = [False] * (old_end - start)
+        for row, match in enumerate(matches, start):
+            if match is None:
+                old_rows.append(None)
+                changes.append((row, None, entities[row]))
+                continue
+            kept[match] = True
+            old_row = start + match
+            old_rows.append(old_row)
+            if old_entities[old_row] != entities[row]:
+                changes.append((row, old_entities[old_row], entities[row]))
+        removed = list(compress(range(start, old_end), map(not_, kept)))
+        changes.extend((None, old_entities[row], None) for row in removed)
+        if len(changes) > limit:
+            return None
+        old_rows.extend(range(old_end, len(old_entities)))
+        if not removed and old_rows[:len(old_entities)] == list(range(len(old_entities))):
+            # Only appended entities; every previous one kept its row
+            return None, changes
+        return RowRenumbering(old_rows, len(old_entities)), changes
+
+    def _iter_full(self, blueprint_data, should_cancel):
+        self.reset()
+        context = AnalysisContext(blueprint_data)
+        analyzers = [analyzer_class() for analyzer_class in self.analyzer_classes]
+        yield from _iter_analysis_pass(context, context.entities, analyzers, should_cancel)
         
-        if train_components['train-stop'] < 2:
-            suggestions.append("Consider adding more train stops to distribute resources effectively across your factory.")
-    
-    # Suggest belt upgrades for high-throughput areas
-    if belt_lengths['transport-belt'] > belt_lengths['fast-transport-belt'] + belt_lengths['express-transport-belt']:
-        suggestions.append("Upgrade to faster belts in high-throughput areas to prevent bottlenecks.")
-    
-    # Check for potential long-distance belt transport
-    max_x = max(entity['position']['x'] for entity in entities)
-    min_x = min(entity['position']['x'] for entity in entities)
-    max_y = max(entity['position']['y'] for entity in entities)
-    min_y = min(entity['position']['y'] for entity in entities)
-    
-    blueprint_size = max(max_x - min_x, max_y - min_y)
-    if blueprint_size > 200 and train_components['train-stop'] == 0:  # Arbitrary threshold, adjust as needed
-        suggestions.append("Your blueprint covers a large area. Consider implementing a train network for more efficient long-distance transport.")
-    
-    return suggestions
+        # Keep each analyzer's per-entity findings by row, so an update can replace
+        # just the rows it rechecks
+        for analyzer in analyzers:
+            if analyzer.entity_radius is not None:
+                self.row_findings[analyzer.key] = (RowFindings(analyzer.leading_findings), RowFindings(analyzer.trailing_findings))
+        self.context = context
+        self.analyzers = analyzers
+        self.entities = context.entities
 
+    def _iter_update(self, blueprint_data, entities, renumbering, changes, should_cancel):
+        try:
+            context = self.context
+            table = context.table
+            spatial_index = context.spatial_index
+            if renumbering is None:
+                for row, old_entity, new_entity in changes:
+                    if old_entity is None:
+                        table.append(new_entity)
+                        spatial_index.add(row)
+                        continue
+                    old_x = table.xs[row]
+                    old_y = table.ys[row]
+                    table.update_row(row, new_entity)
+                    spatial_index.move(row, old_x, old_y)
+            else:
+                table.renumber(renumbering, entities)
+                spatial_index.renumber(renumbering)
+                for row, old_entity, new_entity in changes:
+                    if old_entity is not None and new_entity is not None:
+                        old_x = table.xs[row]
+                        old_y = table.ys[row]
+                        table.update_row(row, new_entity)
+                        spatial_index.move(row, old_x, old_y)
+            context.blueprint_data = blueprint_data
+            context.entities = entities
+            self.entities = entities
+            if renumbering is not None:
+                context.renumber(renumbering)
+                for analyzer in self.analyzers:
+                    analyzer.renumber(context, renumbering)
+                for leading, trailing in self.row_findings.values():
+                    leading.renumber(renumbering)
+                    trailing.renumber(renumbering)
+            context.apply_changes(changes)
+            
+            # Rows whose findings may depend on an edited entity, by analyzer radius
+            edited = {row for row, _, new_entity in changes if new_entity is not None}
+            nearby = {}
+            for analyzer in self.analyzers:
+                radius = analyzer.entity_radius
+                if radius is None or radius in nearby:
+                    continue
+                rows = set(edited)
+                for _, old_entity, new_entity in changes:
+                    for entity in (old_entity, new_entity):
+                        if entity is not None:
+                            rows.update(spatial_index.query_box(entity['position']['x'], entity['position']['y'], radius))
+                nearby[radius] = rows
+            
+            for analyzer in self.analyzers:
+                if should_cancel and should_cancel():
+                    raise AnalysisCancelled()
+                extra_rows = analyzer.apply_changes(context, changes)
+                if analyzer.entity_radius is None:
+                    yield analyzer, analyzer.summarize(context)
+                    continue
+                leading, trailing = self.row_findings[analyzer.key]
+                rows = sorted(nearby[analyzer.entity_radius] | extra_rows)
+                new_leading, new_trailing = analyzer.check_rows(rows, context)
+                leading.replace(rows, new_leading)
+                trailing.replace(rows, new_trailing)
+                yield analyzer, leading.flattened() + analyzer.summarize(context) + trailing.flattened()
+        except BaseException:
+            # Including GeneratorExit: a partial update leaves the state inconsistent
+            self.reset()
+            raise
 
-def analyze_automation_and_circuits(blueprint_data):
-    suggestions = []
-    entities = blueprint_data['blueprint'].get('entities', [])
-    
-    circuit_network_components = {
-        'arithmetic-combinator': 0,
-        'decider-combinator': 0,
-        'constant-combinator': 0,
-        'programmable-speaker': 0,
-        'power-switch': 0
-    }
-    
-    logistics_components = {
-        'logistic-chest-active-provider': 0,
-        'logistic-chest-passive-provider': 0,
-        'logistic-chest-storage': 0,
-        'logistic-chest-buffer': 0,
-        'logistic-chest-requester': 0,
-        'roboport': 0
-    }
-    
-    for entity in entities:
-        # Count circuit network components
-        if entity['name'] in circuit_network_components:
-            circuit_network_components[entity['name']] += 1
-        
-        # Count logistics components
-        if entity['name'] in logistics_components:
-            logistics_components[entity['name']] += 1
-        
-        # Check for circuit conditions on inserters
-        if 'inserter' in entity['name'] and 'control_behavior' in entity:
-            if 'circuit_condition' in entity['control_behavior']:
-                suggestions.append(f"Inserter at ({entity['position']['x']}, {entity['position']['y']}) is using circuit conditions. Good job on automation!")
-    
-    # Analyze circuit network usage
-    total_circuit_components = sum(circuit_network_components.values())
-    if total_circuit_components == 0:
-        suggestions.append("Consider using circuit networks to optimize your factory. They can help control production and prevent overproduction.")
-    elif total_circuit_components < 5:
-        suggestions.append("You're using some circuit networks. Consider expanding their use for more complex automation.")
-    else:
-        suggestions.append("Great job utilizing circuit networks for automation!")
-    
-    # Analyze logistics system
-    total_logistics_chests = sum(logistics_components.values()) - logistics_components['roboport']
-    if logistics_components['roboport'] == 0:
-        suggestions.append("Consider implementing a logistics system with roboports for more efficient item movement.")
-    elif total_logistics_chests == 0:
-        suggestions.append("You have roboports but no logistics chests. Add provider and requester chests to utilize your logistics network.")
-    else:
-        suggestions.append("Good use of a logistics network. Ensure provider chests are near production and requester chests near consumption for optimal efficiency.")
+
+def iter_blueprints(blueprint_data, label_prefix=''):
+    # Yields (label, blueprint_data) for a single blueprint, or for every blueprint in a
+    # blueprint book, recursing into nested books. Planners inside books are skipped.
+    if 'blueprint' in blueprint_data:
+        label = blueprint_data['blueprint'].get('label') or 'Blueprint'
+        yield label_prefix + label, blueprint_data
+    elif 'blueprint_book' in blueprint_data:
+        book = blueprint_data['blueprint_book']
+        book_label = book.get('label') or 'Blueprint Book'
+        entries = sorted(book.get('blueprints', []), key=lambda entry: entry.get('index', 0))
+        for position, entry in enumerate(entries, start=1):
+            if 'blueprint' in entry and not entry['blueprint'].get('label'):
+                entry = {'blueprint': dict(entry['blueprint'], label=f"Blueprint {position}")}
+            yield from iter_blueprints(entry, f"{label_prefix}{book_label} / ")
+
+
+def _analyze_book_entry(blueprint_data, analyzers=None):
+    # Runs in a worker process; a broken blueprint shouldn't sink the rest of the book
+    try:
+        return run_analysis(blueprint_data, analyzers)
+    except Exception as e:
+        return {'error': str(e) or type(e).__name__}
+
+
+def analyze_blueprints(blueprint_data, max_workers=None, analyzers=None):
+    # Analyzes a blueprint or every blueprint in a book, returning a list of
+    # (label, analysis_results). Books are spread across a process pool.
+    return list(iter_analyze_blueprints(blueprint_data, max_workers, analyzers))
+
+
+def iter_analyze_blueprints(blueprint_data, max_workers=None, analyzers=None):
+    # Generator form of analyze_blueprints, yielding results in book order as they
+    # complete. Closing it early cancels the blueprints still queued in the pool.
+    labelled = list(iter_blueprints(blueprint_data))
+    if not labelled:
+        raise ValueError("The blueprint string doesn't contain any blueprints")
+    labels = [label for label, _ in labelled]
+    blueprints = [data for _, data in labelled]
     
-    # Check for balanced use of different chest types
-    if logistics_components['logistic-chest-requester'] > 0 and logistics_components['logistic-chest-passive-provider'] == 0:
-        suggestions.append("You're using requester chests but no passive provider chests. Consider adding passive providers for a more balanced logistics system.")
+    max_workers = min(max_workers or os.cpu_count() or 1, len(blueprints))
+    if max_workers <= 1:
+        yield from zip(labels, map(_analyze_book_entry, blueprints, repeat(analyzers)))
+        return
     
-    return suggestions
+    from concurrent.futures import ProcessPoolExecutor
+    chunksize = max(1, len(blueprints) // (max_workers * 4))
+    executor = ProcessPoolExecutor(max_workers=max_workers)
+    try:
+        yield from zip(labels, executor.map(_analyze_book_entry, blueprints, repeat(analyzers), chunksize=chunksize))
+    finally:
+        executor.shutdown(cancel_futures=True)
 
 
+def _report_sections(analysis_results):
+    # Sections for the analyzers present, so results from a subset of analyzers still render
+    return [(analyzer.title, analysis_results[analyzer.key]) for analyzer in get_analyzers() if analyzer.key in analysis_results]
 
-def generate_optimization_report(analysis_results):
-    report = "Factorio Blueprint Analysis Report\n"
-    report += "================================\n\n"
-    
-    sections = [
-        ("Space Efficiency", analysis_results['space_efficiency']),
-        ("Throughput", analysis_results['throughput']),
-        ("Power Efficiency", analysis_results['power_efficiency']),
-        ("Production Balancing", analysis_results['production_balancing']),
-        ("Transport Optimization", analysis_results['transport_optimization']),
-        ("Automation and Circuits", analysis_results['automation_and_circuits'])
-    ]
-    
+
+def _format_report_sections(sections):
+    report = ""
     for section_title, suggestions in sections:
         report += f"{section_title} Suggestions:\n"
         if suggestions:
@@ -351,48 +3201,619 @@ def generate_optimization_report(analysis_results):
         else:
             report += "- No specific suggestions. Good job!\n"
         report += "\n"
-    
-    report += "Overall Assessment:\n"
-    total_suggestions = sum(len(suggestions) for _, suggestions in sections)
+    return report
+
+
+def _format_status(status):
+    # Status lines, which describe the blueprint and aren't counted as suggestions
+    report = "Status:\n"
+    for lines in status.values():
+        for line in lines:
+            report += f"- {line}\n"
+    return report + "\n"
+
+
+def _overall_assessment(total_suggestions):
     if total_suggestions == 0:
-        report += "Excellent work! Your blueprint appears to be well-optimized in all areas.\n"
+        return "Excellent work! Your blueprint appears to be well-optimized in all areas.\n"
     elif total_suggestions < 5:
-        report += "Great job! Your blueprint is well-designed with only a few minor optimization opportunities.\n"
+        return "Great job! Your blueprint is well-designed with only a few minor optimization opportunities.\n"
     elif total_suggestions < 10:
-        report += "Good work! Your blueprint has several areas for potential improvement, but it's on the right track.\n"
+        return "Good work! Your blueprint has several areas for potential improvement, but it's on the right track.\n"
     else:
-        report += "There are multiple opportunities to optimize your blueprint. Consider implementing the suggestions above to improve efficiency.\n"
+        return "There are multiple opportunities to optimize your blueprint. Consider implementing the suggestions above to improve efficiency.\n"
+
+
+REPORT_HEADER = "Factorio Blueprint Analysis Report\n================================\n\n"
+
+
+def _format_timings(timings):
+    report = "Timing:\n"
+    for stage, timing in timings.items():
+        details = []
+        if 'entities' in timing:
+            details.append(f"{timing['entities']} entities")
+        if 'peak_bytes' in timing:
+            details.append(f"peak {timing['peak_bytes'] / (1 << 20):.1f} MB")
+        detail = f" ({', '.join(details)})" if details else ""
+        report += f"- {stage}: {timing['seconds'] * 1000:.2f} ms{detail}\n"
+    total = sum(timing['seconds'] for timing in timings.values())
+    report += f"- Total: {total * 1000:.2f} ms\n"
+    return report
+
+
+def generate_optimization_report(analysis_results):
+    report = REPORT_HEADER
+    
+    sections = _report_sections(analysis_results)
+    report += _format_report_sections(sections)
+    if analysis_results.get('status'):
+        report += _format_status(analysis_results['status'])
+    
+    report += "Overall Assessment:\n"
+    total_suggestions = sum(len(suggestions) for _, suggestions in sections)
+    report += _overall_assessment(total_suggestions)
+    
+    if 'timings' in analysis_results:
+        report += "\n" + _format_timings(analysis_results['timings'])
+    
+    return report
+
+
+def generate_book_report(labelled_results):
+    # Merged report for analyze_blueprints output, with one section per blueprint
+    report = "Factorio Blueprint Book Analysis Report\n"
+    report += "=======================================\n\n"
+    report += f"Blueprints analyzed: {len(labelled_results)}\n\n"
+    
+    for label, analysis_results in labelled_results:
+        heading = f"Blueprint: {label}"
+        report += f"{heading}\n{'-' * len(heading)}\n\n"
+        if 'error' in analysis_results:
+            report += f"- Analysis failed: {analysis_results['error']}\n\n"
+            continue
+        sections = _report_sections(analysis_results)
+        report += _format_report_sections(sections)
+        if analysis_results.get('status'):
+            report += _format_status(analysis_results['status'])
+        report += "Assessment: " + _overall_assessment(sum(len(suggestions) for _, suggestions in sections))
+        report += "\n"
     
     return report
 
 
+# Bump when analyzer output changes in a way the source fingerprint can't see
+ANALYZER_VERSION = 1
+
+_analyzer_fingerprint = None
+
+
+def analyzer_fingerprint():
+    # Cache entries are keyed on this, so editing any analyzer invalidates them
+    global _analyzer_fingerprint
+    if _analyzer_fingerprint is None:
+        import hashlib
+        digest = hashlib.sha256(f"{ANALYZER_VERSION}:".encode())
+        with open(os.path.abspath(__file__), 'rb') as source:
+            digest.update(source.read())
+        _analyzer_fingerprint = digest.hexdigest()
+    return _analyzer_fingerprint
+
+
+def default_cache_dir():
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'factorio-blueprint-analyser')
+
+
+class AnalysisCache:
+    # Content-addressed LRU cache for decoded blueprints ('blueprint') and analysis
+    # results ('results'), keyed by a hash of the raw blueprint string and the analyzer
+    # fingerprint. Entries live in memory and, when a directory is given, on disk as
+    # zlib-compressed JSON. Both tiers evict least recently used entries by size: on
+    # disk the file size, in memory an estimate of what the entry keeps alive (see
+    # _memory_size), so the budget holds however well a blueprint compresses.
+
+    def __init__(self, directory=None, max_memory_bytes=64 << 20, max_disk_bytes=512 << 20):
+        self.directory = directory
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.memory = OrderedDict()
+        self.memory_bytes = 0
+        self.disk_files = {}
+        self.disk_bytes = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._scan_disk()
+
+    def key(self, blueprint_string):
+        import hashlib
+        digest = hashlib.sha256(analyzer_fingerprint().encode())
+        digest.update(blueprint_string.strip().encode())
+        return digest.hexdigest()
+
+    def _path(self, kind, key):
+        return os.path.join(self.directory, key[:2], f"{key}.{kind}.json.z")
+
+    def _scan_disk(self):
+        for directory, _, filenames in os.walk(self.directory):
+            for filename in filenames:
+                if filename.endswith('.json.z'):
+                    path = os.path.join(directory, filename)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    self.disk_files[path] = (stat.st_mtime, stat.st_size)
+                    self.disk_bytes += stat.st_size
+        self._evict_disk()
+
+    def get(self, kind, blueprint_string):
+        memory_key = (kind, self.key(blueprint_string))
+        entry = self.memory.get(memory_key)
+        if entry is not None:
+            self.memory.move_to_end(memory_key)
+            return entry[0]
+        if not self.directory:
+            return None
+        
+        path = self._path(*memory_key)
+        try:
+            with open(path, 'rb') as cached:
+                payload = cached.read()
+            value = json.loads(zlib.decompress(payload))
+        except (OSError, ValueError, zlib.error):
+            return None
+        # Refresh the mtime so disk eviction sees this entry as recently used
+        try:
+            os.utime(path)
+            self.disk_files[path] = (time.time(), len(payload))
+        except OSError:
+            pass
+        self._remember(memory_key, value, _memory_size(kind, blueprint_string, value))
+        return value
+
+    def put(self, kind, blueprint_string, value):
+        memory_key = (kind, self.key(blueprint_string))
+        self._remember(memory_key, value, _memory_size(kind, blueprint_string, value))
+        if not self.directory:
+            return
+        
+        payload = zlib.compress(json.dumps(value).encode(), 1)
+        path = self._path(*memory_key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, 'wb') as cached:
+            cached.write(payload)
+        os.replace(temporary_path, path)
+        
+        previous = self.disk_files.get(path)
+        if previous:
+            self.disk_bytes -= previous[1]
+        self.disk_files[path] = (time.time(), len(payload))
+        self.disk_bytes += len(payload)
+        self._evict_disk()
+
+    def _remember(self, memory_key, value, size):
+        # `size` is the entry's weight in the memory budget, from _memory_size
+        previous = self.memory.pop(memory_key, None)
+        if previous is not None:
+            self.memory_bytes -= previous[1]
+        if size > self.max_memory_bytes:
+            return
+        self.memory[memory_key] = (value, size)
+        self.memory_bytes += size
+        while self.memory_bytes > self.max_memory_bytes:
+            _, (_, evicted_size) = self.memory.popitem(last=False)
+            self.memory_bytes -= evicted_size
+
+    def _evict_disk(self):
+        if self.disk_bytes <= self.max_disk_bytes:
+            return
+        for path, (_, size) in sorted(self.disk_files.items(), key=lambda item: item[1][0]):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                continue
+            del self.disk_files[path]
+            self.disk_bytes -= size
+            if self.disk_bytes <= self.max_disk_bytes:
+                break
+
+
+# In-memory bytes of a decoded blueprint per character of its blueprint string, from
+# 42 to 75 on the synthetic blueprints; the higher end keeps the budget an upper bound
+DECODED_BYTES_PER_CHARACTER = 75
+
+
+def _memory_size(kind, blueprint_string, value):
+    # Bytes a cache entry keeps alive. Walking a decoded blueprint would cost about as
+    # much as decoding it, so its size is estimated from the string instead; results
+    # are small enough to measure.
+    if kind == 'blueprint':
+        return len(blueprint_string) * DECODED_BYTES_PER_CHARACTER
+    return _object_size(value)
+
+
+def _object_size(value):
+    # sys.getsizeof over a JSON-like value and everything it holds
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_object_size(key) + _object_size(item) for key, item in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(map(_object_size, value))
+    return size
+
+
+def cached_results(blueprint_string, cache):
+    if cache is None:
+        return None
+    results = cache.get('results', blueprint_string)
+    if isinstance(results, list):
+        # JSON turned the (label, analysis_results) pairs into lists
+        return [tuple(labelled) for labelled in results]
+    return results
+
+
+def load_blueprint(blueprint_string, cache=None, profiler=None):
+    # parse_blueprint, going through the cache when given
+    if cache is None:
+        return parse_blueprint(blueprint_string, profiler)
+    with (profiler or NULL_PROFILER).stage('cache_lookup'):
+        blueprint_data = cache.get('blueprint', blueprint_string)
+    if blueprint_data is None:
+        blueprint_data = parse_blueprint(blueprint_string, profiler)
+        cache.put('blueprint', blueprint_string, blueprint_data)
+    return blueprint_data
+
+
+def analyze_string(blueprint_string, cache=None, max_workers=None, profiler=None):
+    # Parses and analyzes a blueprint string, going through the cache when given.
+    # Returns analysis_results for a blueprint, or analyze_blueprints' labelled list
+    # for a blueprint book.
+    stages = profiler or NULL_PROFILER
+    if cache is not None:
+        with stages.stage('cache_lookup'):
+            results = cached_results(blueprint_string, cache)
+        if results is not None:
+            return results
+        blueprint_data = load_blueprint(blueprint_string, cache, profiler)
+    elif profiler is None and max_workers == 1:
+        # Nothing needs the decoded document, so decode and analyze in one streaming pass
+        return analyze_stream(blueprint_string)
+    else:
+        blueprint_data = parse_blueprint(blueprint_string, profiler)
+    if 'blueprint_book' in blueprint_data:
+        with stages.stage('book_analysis'):
+            results = analyze_blueprints(blueprint_data, max_workers)
+    else:
+        results = run_analysis(blueprint_data, profiler=profiler)
+    
+    if cache is not None:
+        cache.put('results', blueprint_string, {key: value for key, value in results.items() if key != 'timings'} if isinstance(results, dict) else results)
+    return results
+
+
+def generate_report(results):
+    if isinstance(results, list):
+        return generate_book_report(results)
+    return generate_optimization_report(results)
+
+
+def iter_blueprint_lines(paths):
+    # Yields (source, blueprint_string) for every non-blank line of the given files,
+    # directories (walked recursively) or '-' for stdin
+    for path in paths or ['-']:
+        if path == '-':
+            files = [('<stdin>', sys.stdin)]
+        elif os.path.isdir(path):
+            files = []
+            for directory, subdirectories, filenames in os.walk(path):
+                subdirectories.sort()
+                files.extend(os.path.join(directory, filename) for filename in sorted(filenames))
+        else:
+            files = [path]
+        
+        for file in files:
+            if isinstance(file, tuple):
+                name, handle = file
+                yield from _iter_nonblank_lines(name, handle)
+            else:
+                with open(file, encoding='utf-8', errors='replace') as handle:
+                    yield from _iter_nonblank_lines(file, handle)
+
+
+def _iter_nonblank_lines(name, handle):
+    for line_number, line in enumerate(handle, start=1):
+        line = line.strip()
+        if line:
+            yield f"{name}:{line_number}", line
+
+
+def analyze_blueprint_string(source, blueprint_string, cache=None, profiler=None, report=False):
+    # One batch job: returns a JSON-serialisable record and never raises. With report,
+    # the rendered report is included under 'report'.
+    started = time.perf_counter()
+    record = {'source': source, 'ok': False}
+    try:
+        results = analyze_string(blueprint_string, cache, max_workers=1, profiler=profiler)
+        if report:
+            record['report'] = generate_report(results)
+        if isinstance(results, list):
+            record['blueprints'] = [{'label': label, 'results': book_results} for label, book_results in results]
+        else:
+            record['results'] = {key: value for key, value in results.items() if key != 'timings'}
+        record['ok'] = True
+    except Exception as e:
+        record['error'] = f"{type(e).__name__}: {e}"
+    record['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 3)
+    if profiler is not None:
+        record['timings'] = profiler.as_dict()
+    return record
+
+
+_batch_cache = None
+_batch_profile = None
+
+
+def init_batch_worker(cache_dir, profile=None):
+    # Process pool initializer for run_batch and the server's workers. `profile` is
+    # None, 'time' or 'memory'.
+    global _batch_cache, _batch_profile
+    _batch_cache = AnalysisCache(cache_dir) if cache_dir else None
+    _batch_profile = profile
+
+
+def _analyze_batch_job(job):
+    profiler = StageProfiler(trace_memory=_batch_profile == 'memory') if _batch_profile else None
+    return analyze_blueprint_string(*job, cache=_batch_cache, profiler=profiler)
+
+
+def run_batch(jobs, max_workers=1, cache_dir=None, profile=None):
+    # Yields a record per (source, blueprint_string) job, in input order. Only a small
+    # window of jobs is in flight at once so huge archives don't pile up in memory.
+    if max_workers <= 1:
+        init_batch_worker(cache_dir, profile)
+        for job in jobs:
+            yield _analyze_batch_job(job)
+        return
+    
+    from concurrent.futures import ProcessPoolExecutor
+    window = max_workers * 4
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=init_batch_worker, initargs=(cache_dir, profile)) as executor:
+        for job in jobs:
+            pending.append(executor.submit(_analyze_batch_job, job))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _percentile(sorted_values, percent):
+    if not sorted_values:
+        return 0.0
+    rank = max(0, math.ceil(percent / 100 * len(sorted_values)) - 1)
+    return sorted_values[rank]
+
+
+def batch_main(args):
+    profile = 'memory' if args.trace_memory or args.memory_dump else 'time' if args.profile else None
+    workers = args.workers
+    if (args.profile_dump or args.memory_dump) and workers > 1:
+        print("Profile dumps only cover this process; running with a single worker.", file=sys.stderr)
+        workers = 1
+    if profile == 'memory':
+        # Tracing from the start, so the snapshot covers the whole run even when no
+        # blueprint gets as far as a profiled stage
+        import tracemalloc
+        tracemalloc.start()
+    profile_dump = None
+    if args.profile_dump:
+        import cProfile
+        profile_dump = cProfile.Profile()
+        profile_dump.enable()
+    
+    output = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    latencies = []
+    failures = 0
+    started = time.perf_counter()
+    try:
+        for record in run_batch(iter_blueprint_lines(args.paths), workers, args.cache_dir, profile):
+            latencies.append(record['elapsed_ms'])
+            if not record['ok']:
+                failures += 1
+            output.write(json.dumps(record) + "\n")
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    elapsed = time.perf_counter() - started
+    
+    if profile_dump is not None:
+        profile_dump.disable()
+        profile_dump.dump_stats(args.profile_dump)
+    if args.memory_dump:
+        tracemalloc.take_snapshot().dump(args.memory_dump)
+    
+    latencies.sort()
+    rate = len(latencies) / elapsed if elapsed > 0 else 0.0
+    print(f"Analyzed {len(latencies)} blueprints in {elapsed:.2f}s ({rate:.1f} blueprints/sec)", file=sys.stderr)
+    print(f"Latency p50: {_percentile(latencies, 50):.2f} ms, p99: {_percentile(latencies, 99):.2f} ms", file=sys.stderr)
+    print(f"Failures: {failures}", file=sys.stderr)
+    return 0
+
+
+def analyze_server_batch(jobs):
+    # One pool job for AnalysisServer: several (source, blueprint_string) jobs from
+    # concurrent requests, analyzed back to back to save on round trips to the worker
+    return [analyze_blueprint_string(*job, cache=_batch_cache, report=True) for job in jobs]
+
+
+def warm_worker():
+    # Runs once per pool process at server start, so the first real request doesn't pay
+    # for process startup and first-use costs
+    run_analysis({'blueprint': {'entities': [
+        {'entity_number': 1, 'name': 'inserter', 'position': {'x': 0, 'y': 0}},
+        {'entity_number': 2, 'name': 'transport-belt', 'position': {'x': 1, 'y': 1}},
+    ]}})
+    return os.getpid()
+
+
+def analyze_main(args):
+    # Analysis of one blueprint string; the path of least startup cost. A blueprint is
+    # streamed, so a huge one never sits in memory decoded whole. A book is decoded and
+    # its blueprints spread across the process pool instead.
+    try:
+        analyzers = get_analyzers([key.strip() for key in args.only.split(',') if key.strip()]) if args.only else None
+        if args.path == '-':
+            blueprint_string = sys.stdin.read()
+        else:
+            with open(args.path, encoding='utf-8') as blueprint_file:
+                blueprint_string = blueprint_file.read()
+        if is_blueprint_book(blueprint_string):
+            results = analyze_blueprints(parse_blueprint(blueprint_string), args.workers, analyzers)
+        else:
+            results = analyze_stream(blueprint_string, analyzers)
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    
+    if not args.json:
+        print(generate_report(results))
+    elif isinstance(results, list):
+        print(json.dumps({'blueprints': [{'label': label, 'results': book_results} for label, book_results in results]}))
+    else:
+        print(json.dumps({'results': {key: value for key, value in results.items() if key != 'timings'}}))
+    return 0
+
+
+def serve_main(args):
+    import asyncio
+    from server import AnalysisServer
+    server = AnalysisServer(workers=args.workers, cache_dir=args.cache_dir, max_pending=args.max_pending, max_batch=args.max_batch)
+    try:
+        asyncio.run(server.serve_forever(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def _gui_analysis_worker(blueprint_string, cache, session, events, cancel_event):
+    # Runs on a background thread; everything it learns is posted to `events` for the
+    # Tk main loop to pick up, since Tk widgets may only be touched from that thread.
+    def should_cancel():
+        return cancel_event.is_set()
+    
+    try:
+        results = cached_results(blueprint_string, cache)
+        if results is not None:
+            events.put(('report', generate_report(results)))
+            return
+        
+        events.put(('progress', "Decoding blueprint...", 0, 1))
+        blueprint_data = load_blueprint(blueprint_string, cache)
+        if should_cancel():
+            raise AnalysisCancelled()
+        
+        if 'blueprint_book' in blueprint_data:
+            total = sum(1 for _ in iter_blueprints(blueprint_data))
+            results = []
+            analyses = iter_analyze_blueprints(blueprint_data)
+            try:
+                for label, analysis_results in analyses:
+                    if should_cancel():
+                        raise AnalysisCancelled()
+                    results.append((label, analysis_results))
+                    events.put(('progress', f"Analyzed {label}", len(results), total))
+            finally:
+                analyses.close()
+            events.put(('report', generate_book_report(results)))
+        else:
+            total = len(ANALYZER_REGISTRY)
+            events.put(('progress', "Scanning entities...", 0, total))
+            events.put(('report', REPORT_HEADER))
+            analyzed = []
+            for analyzer, suggestions in session.iter_analysis(blueprint_data, should_cancel=should_cancel):
+                analyzed.append((analyzer, suggestions))
+                events.put(('section', _format_report_sections([(analyzer.title, suggestions)])))
+                events.put(('progress', f"Finished {analyzer.title}", len(analyzed), total))
+            results = collect_results(analyzed)
+            if results.get('status'):
+                events.put(('section', _format_status(results['status'])))
+            total_suggestions = sum(len(suggestions) for _, suggestions in analyzed)
+            events.put(('section', "Overall Assessment:\n" + _overall_assessment(total_suggestions)))
+        
+        if cache is not None:
+            cache.put('results', blueprint_string, results)
+        events.put(('done', "Analysis complete."))
+    except AnalysisCancelled:
+        events.put(('cancelled', "Analysis cancelled."))
+    except Exception as e:
+        events.put(('error', f"An error occurred: {str(e)}"))
+
+
 def create_gui():
+    import tkinter as tk
+    from tkinter import scrolledtext, messagebox, ttk
+    
+    cache = AnalysisCache(default_cache_dir())
+    # Remembers the last blueprint so re-pasting an edited version is re-analyzed incrementally
+    session = IncrementalAnalysis()
+    events = queue.Queue()
+    cancel_event = threading.Event()
+
     def analyze_blueprint():
         blueprint_string = input_text.get("1.0", tk.END).strip()
+        cancel_event.clear()
+        output_text.delete("1.0", tk.END)
+        progress_bar['value'] = 0
+        status_label.config(text="Starting analysis...")
+        analyze_button.config(state=tk.DISABLED)
+        cancel_button.config(state=tk.NORMAL)
+        worker = threading.Thread(
+            target=_gui_analysis_worker,
+            args=(blueprint_string, cache, session, events, cancel_event),
+            daemon=True,
+        )
+        worker.start()
+
+    def cancel_analysis():
+        cancel_event.set()
+        cancel_button.config(state=tk.DISABLED)
+        status_label.config(text="Cancelling...")
+
+    def finish(status):
+        analyze_button.config(state=tk.NORMAL)
+        cancel_button.config(state=tk.DISABLED)
+        status_label.config(text=status)
+
+    def poll_events():
         try:
-            blueprint_data = parse_blueprint(blueprint_string)
-            
-            space_efficiency_results = analyze_space_efficiency(blueprint_data)
-            throughput_results = analyze_throughput(blueprint_data)
-            power_efficiency_results = analyze_power_efficiency(blueprint_data)
-            production_balancing_results = analyze_production_balancing(blueprint_data)
-            transport_optimization_results = analyze_transport_optimization(blueprint_data)
-            automation_circuit_results = analyze_automation_and_circuits(blueprint_data)
-            
-            analysis_results = {
-                'space_efficiency': space_efficiency_results,
-                'throughput': throughput_results,
-                'power_efficiency': power_efficiency_results,
-                'production_balancing': production_balancing_results,
-                'transport_optimization': transport_optimization_results,
-                'automation_and_circuits': automation_circuit_results,
-            }
-            
-            report = generate_optimization_report(analysis_results)
-            output_text.delete("1.0", tk.END)
-            output_text.insert(tk.END, report)
-        except Exception as e:
-            messagebox.showerror("Error", f"An error occurred: {str(e)}")
+            while True:
+                event = events.get_nowait()
+                kind = event[0]
+                if kind == 'progress':
+                    _, status, done, total = event
+                    progress_bar['maximum'] = max(total, 1)
+                    progress_bar['value'] = done
+                    status_label.config(text=status)
+                elif kind == 'report':
+                    output_text.delete("1.0", tk.END)
+                    output_text.insert(tk.END, event[1])
+                elif kind == 'section':
+                    output_text.insert(tk.END, event[1])
+                elif kind == 'done':
+                    progress_bar['value'] = progress_bar['maximum']
+                    finish(event[1])
+                elif kind == 'cancelled':
+                    finish(event[1])
+                elif kind == 'error':
+                    finish("Analysis failed.")
+                    messagebox.showerror("Error", event[1])
+        except queue.Empty:
+            pass
+        root.after(50, poll_events)
 
     root = tk.Tk()
     root.title("Factorio Blueprint Analyzer")
@@ -404,8 +3825,20 @@ def create_gui():
     input_text = scrolledtext.ScrolledText(root, height=10)
     input_text.pack(padx=10, pady=5, fill=tk.BOTH, expand=True)
 
-    analyze_button = tk.Button(root, text="Analyze Blueprint", command=analyze_blueprint)
-    analyze_button.pack(pady=10)
+    button_frame = tk.Frame(root)
+    button_frame.pack(pady=10)
+
+    analyze_button = tk.Button(button_frame, text="Analyze Blueprint", command=analyze_blueprint)
+    analyze_button.pack(side=tk.LEFT, padx=5)
+
+    cancel_button = tk.Button(button_frame, text="Cancel", command=cancel_analysis, state=tk.DISABLED)
+    cancel_button.pack(side=tk.LEFT, padx=5)
+
+    progress_bar = ttk.Progressbar(root, mode='determinate')
+    progress_bar.pack(padx=10, fill=tk.X)
+
+    status_label = tk.Label(root, text="Ready.")
+    status_label.pack()
 
     output_label = tk.Label(root, text="Analysis Report:")
     output_label.pack(pady=10)
@@ -413,11 +3846,51 @@ def create_gui():
     output_text = scrolledtext.ScrolledText(root, height=15)
     output_text.pack(padx=10, pady=5, fill=tk.BOTH, expand=True)
 
+    root.after(50, poll_events)
     root.mainloop()
 
 
-def main():
+def build_arg_parser():
+    import argparse
+    parser = argparse.ArgumentParser(description="Analyze Factorio blueprints. Starts the GUI when no command is given.")
+    subparsers = parser.add_subparsers(dest='command')
+    
+    analyze_parser = subparsers.add_parser('analyze', help="analyze one blueprint string and print the report")
+    analyze_parser.add_argument('path', nargs='?', default='-', help="file holding the blueprint string, '-' for stdin (default)")
+    analyze_parser.add_argument('--json', action='store_true', help="print the results as JSON instead of a report")
+    analyze_parser.add_argument('--only', metavar='KEYS', help=f"comma separated analyzers to run, from: {', '.join(ANALYZER_REGISTRY)}")
+    analyze_parser.add_argument('-w', '--workers', type=int, help="worker processes for the blueprints of a book (default: one per CPU)")
+    
+    batch_parser = subparsers.add_parser('batch', help="analyze blueprint strings headlessly, one per line")
+    batch_parser.add_argument('paths', nargs='*', help="files or directories of blueprint strings, '-' for stdin (default)")
+    batch_parser.add_argument('-w', '--workers', type=int, default=os.cpu_count() or 1, help="number of worker processes")
+    batch_parser.add_argument('-o', '--output', help="write JSON Lines results here instead of stdout")
+    batch_parser.add_argument('--cache-dir', help="reuse cached parse and analysis results from this directory")
+    batch_parser.add_argument('--profile', action='store_true', help="include per-stage timings in each record")
+    batch_parser.add_argument('--trace-memory', action='store_true', help="also record peak allocation per stage (slow)")
+    batch_parser.add_argument('--profile-dump', metavar='FILE', help="write cProfile stats for the whole run to FILE")
+    batch_parser.add_argument('--memory-dump', metavar='FILE', help="write a tracemalloc snapshot to FILE at the end")
+    
+    serve_parser = subparsers.add_parser('serve', help="serve analyses over a local HTTP/JSON API")
+    serve_parser.add_argument('--host', default='127.0.0.1', help="address to listen on")
+    serve_parser.add_argument('--port', type=int, default=8765, help="port to listen on, 0 for any free port")
+    serve_parser.add_argument('-w', '--workers', type=int, default=os.cpu_count() or 1, help="number of worker processes")
+    serve_parser.add_argument('--max-pending', type=int, default=256, help="blueprints queued or running before requests get 503")
+    serve_parser.add_argument('--max-batch', type=int, default=16, help="most blueprints handed to a worker at once")
+    serve_parser.add_argument('--cache-dir', help="reuse cached parse and analysis results from this directory")
+    
+    return parser
+
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    if args.command == 'analyze':
+        return analyze_main(args)
+    if args.command == 'batch':
+        return batch_main(args)
+    if args.command == 'serve':
+        return serve_main(args)
     create_gui()
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
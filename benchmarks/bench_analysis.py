@@ -0,0 +1,153 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import Main
+from synthetic_blueprints import generate_blueprint_string
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+# Stages slower than the baseline by more than this fraction are flagged...
+DEFAULT_TOLERANCE = 0.25
+# ...unless they are also within this many seconds of it, which is timer noise
+NOISE_FLOOR = 0.002
+
+
+def parse_size(text):
+    text = text.lower()
+    for suffix, factor in (('k', 1000), ('m', 1000000)):
+        if text.endswith(suffix):
+            return int(float(text[:-1]) * factor)
+    return int(text)
+
+
+def calibrate():
+    # A fixed pure-Python workload, timed so results from machines of different speed
+    # can be compared: every stage time is stored relative to this one
+    best = float('inf')
+    for _ in range(5):
+        started = time.perf_counter()
+        counts = {}
+        for value in range(300000):
+            key = value % 97
+            counts[key] = counts.get(key, 0) + 1
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def time_blueprint(blueprint_string, repeat):
+    # Best-of-`repeat` seconds for parse_blueprint, the shared pass, each analyzer and
+    # the full parse-analyze-report pipeline
+    best = {}
+    for _ in range(repeat):
+        profiler = Main.StageProfiler()
+        started = time.perf_counter()
+        parse_started = time.perf_counter()
+        blueprint_data = Main.parse_blueprint(blueprint_string, profiler)
+        parse_seconds = time.perf_counter() - parse_started
+        analysis_results = Main.run_analysis(blueprint_data, profiler=profiler)
+        Main.generate_optimization_report(analysis_results)
+        full_seconds = time.perf_counter() - started
+
+        timings = {'parse_blueprint': parse_seconds}
+        timings.update({stage: timing['seconds'] for stage, timing in profiler.as_dict().items()})
+        timings['full_report'] = full_seconds
+        for stage, seconds in timings.items():
+            best[stage] = min(best.get(stage, float('inf')), seconds)
+    return best
+
+
+def run(sizes, repeat, seed):
+    results = {}
+    for size in sizes:
+        blueprint_string = generate_blueprint_string(size, seed)
+        results[str(size)] = time_blueprint(blueprint_string, repeat if size < 1000000 else 1)
+        print(f"{size:>9} entities: full report {results[str(size)]['full_report'] * 1000:.1f} ms", file=sys.stderr)
+    return results
+
+
+def compare(results, calibration, baseline, tolerance):
+    # Returns a list of (size, stage, baseline seconds, current seconds) regressions,
+    # with baseline times rescaled to this machine's speed
+    scale = calibration / baseline['calibration_seconds']
+    regressions = []
+    for size, stages in results.items():
+        for stage, seconds in stages.items():
+            previous = baseline['results'].get(size, {}).get(stage)
+            if previous is None:
+                continue
+            expected = previous * scale
+            if seconds > expected * (1 + tolerance) and seconds - expected > NOISE_FLOOR:
+                regressions.append((size, stage, expected, seconds))
+    return regressions
+
+
+def print_table(results, baseline=None, scale=1.0):
+    stages = list(next(iter(results.values())))
+    header = f"{'stage':<26}" + "".join(f"{size + ' entities':>20}" for size in results)
+    print(header)
+    print('-' * len(header))
+    for stage in stages:
+        row = f"{stage:<26}"
+        for size, timings in results.items():
+            cell = f"{timings[stage] * 1000:.2f} ms"
+            previous = baseline['results'].get(size, {}).get(stage) if baseline else None
+            if previous:
+                cell += f" ({timings[stage] / (previous * scale) - 1:+.0%})"
+            row += f"{cell:>20}"
+        print(row)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark parse_blueprint and the analyzers on synthetic blueprints.")
+    parser.add_argument('--sizes', default=','.join(str(size) for size in DEFAULT_SIZES),
+                        help="comma separated entity counts, e.g. 1k,10k,100k,1m")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per size; the fastest is kept (1M runs once)")
+    parser.add_argument('--seed', type=int, default=0, help="seed for the synthetic blueprint generator")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="baseline JSON to compare against")
+    parser.add_argument('--update-baseline', action='store_true', help="write these results as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help="allowed slowdown before flagging")
+    args = parser.parse_args(argv)
+
+    sizes = [parse_size(size) for size in args.sizes.split(',') if size]
+    calibration = calibrate()
+    results = run(sizes, args.repeat, args.seed)
+
+    if args.update_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as baseline_file:
+            json.dump({'calibration_seconds': calibration, 'seed': args.seed, 'results': results}, baseline_file, indent=2)
+            baseline_file.write("\n")
+        print_table(results)
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline.get('seed', 0) != args.seed:
+            print("Baseline was recorded with a different seed; comparison skipped.", file=sys.stderr)
+            baseline = None
+
+    scale = calibration / baseline['calibration_seconds'] if baseline else 1.0
+    print_table(results, baseline, scale)
+    if baseline is None:
+        return 0
+
+    regressions = compare(results, calibration, baseline, args.tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+        for size, stage, expected, seconds in regressions:
+            print(f"- {stage} at {size} entities: {expected * 1000:.2f} ms -> {seconds * 1000:.2f} ms")
+        return 1
+    print("\nNo regressions against the baseline.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,78 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from synthetic_blueprints import generate_blueprint_string
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAIN = os.path.join(ROOT, 'Main.py')
+
+# Modules a headless run should never pay for; only the GUI and the server import them
+HEAVY_MODULES = ['tkinter', 'server', 'asyncio', 'concurrent.futures', 'argparse']
+
+# Entity count of the small blueprint timed end to end
+SMALL_BLUEPRINT = 200
+
+
+def time_command(command, repeat):
+    # Wall-clock seconds for each of `repeat` fresh interpreter runs of `command`
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        subprocess.run(command, cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def heavy_imports():
+    # Heavy modules that `import Main` pulls in, checked in a fresh interpreter
+    check = f"import sys, Main; print(','.join(name for name in {HEAVY_MODULES!r} if name in sys.modules))"
+    output = subprocess.run([sys.executable, '-c', check], cwd=ROOT, check=True, capture_output=True, text=True).stdout
+    return [name for name in output.strip().split(',') if name]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark interpreter startup, importing Main and a headless analyze of a small blueprint.")
+    parser.add_argument('--repeat', type=int, default=10, help="runs per command")
+    parser.add_argument('--seed', type=int, default=0, help="seed for the synthetic blueprint generator")
+    parser.add_argument('--budget-ms', type=float, help="fail when the median analyze run, less bare startup, exceeds this")
+    args = parser.parse_args(argv)
+
+    with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as blueprint_file:
+        blueprint_file.write(generate_blueprint_string(SMALL_BLUEPRINT, args.seed))
+    try:
+        commands = [
+            ('python -c pass', [sys.executable, '-c', 'pass']),
+            ('import Main', [sys.executable, '-c', 'import Main']),
+            (f'analyze ({SMALL_BLUEPRINT} entities)', [sys.executable, MAIN, 'analyze', blueprint_file.name]),
+        ]
+        results = {label: time_command(command, args.repeat) for label, command in commands}
+    finally:
+        os.unlink(blueprint_file.name)
+
+    header = f"{'command':<28}{'best':>12}{'median':>12}"
+    print(header)
+    print('-' * len(header))
+    for label, timings in results.items():
+        print(f"{label:<28}{min(timings) * 1000:>9.1f} ms{statistics.median(timings) * 1000:>9.1f} ms")
+
+    status = 0
+    loaded = heavy_imports()
+    if loaded:
+        print(f"\n'import Main' also imports: {', '.join(loaded)}")
+        status = 1
+    if args.budget_ms is not None:
+        interpreter, _, analyze = (statistics.median(timings) for timings in results.values())
+        cost = (analyze - interpreter) * 1000
+        if cost > args.budget_ms:
+            print(f"\nAnalyze took {cost:.1f} ms over bare startup, above the {args.budget_ms:.1f} ms budget.")
+            status = 1
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,191 @@
+import base64
+import json
+import random
+import zlib
+
+# Factorio 1.1 blueprint version number
+BLUEPRINT_VERSION = 281479278886912
+
+# Share of the entity budget given to each kind of layout
+LAYOUT_SHARES = [
+    ('smelter_columns', 0.30),
+    ('belt_bus', 0.25),
+    ('solar_field', 0.20),
+    ('rail_grid', 0.15),
+    ('splitter_balancers', 0.10),
+]
+
+# Horizontal gap, in tiles, left between two layouts
+LAYOUT_GAP = 10
+
+
+class BlueprintBuilder:
+    # Collects entities with sequential entity numbers and tracks how far right the
+    # layouts placed so far extend, so the next layout can start beside them.
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.entities = []
+        self.max_x = 0
+
+    def add(self, name, x, y, **fields):
+        entity = {'entity_number': len(self.entities) + 1, 'name': name, 'position': {'x': x, 'y': y}}
+        entity.update(fields)
+        self.entities.append(entity)
+        self.max_x = max(self.max_x, x)
+        return entity
+
+    def next_origin(self):
+        return (int(self.max_x) + LAYOUT_GAP if self.entities else 0), 0
+
+
+def smelter_columns(builder, budget):
+    # Pairs of furnace columns fed by ore belts, with output belts and poles between rows
+    rng = builder.rng
+    origin_x, origin_y = builder.next_origin()
+    furnace = rng.choice(['stone-furnace', 'steel-furnace'])
+    rows_per_column = 48
+    start = len(builder.entities)
+    column = 0
+    while len(builder.entities) - start < budget:
+        x = origin_x + column * 8
+        for row in range(rows_per_column):
+            if len(builder.entities) - start >= budget:
+                break
+            y = origin_y + row * 2
+            builder.add('transport-belt', x + 0.5, y + 0.5, direction=4)
+            builder.add('transport-belt', x + 0.5, y + 1.5, direction=4)
+            builder.add('inserter', x + 1.5, y + 0.5, direction=6)
+            builder.add(furnace, x + 3, y + 1)
+            builder.add('inserter', x + 4.5, y + 0.5, direction=6)
+            builder.add('transport-belt', x + 5.5, y + 0.5, direction=0)
+            builder.add('transport-belt', x + 5.5, y + 1.5, direction=0)
+            if row % 4 == 0:
+                builder.add('medium-electric-pole', x + 4.5, y + 1.5)
+        column += 1
+
+
+def belt_bus(builder, budget):
+    # A wide main bus of parallel belt lanes, with lane groups hopping under side
+    # roads via underground belt pairs
+    rng = builder.rng
+    origin_x, origin_y = builder.next_origin()
+    tier = rng.choice([
+        ('transport-belt', 'underground-belt'),
+        ('fast-transport-belt', 'fast-underground-belt'),
+        ('express-transport-belt', 'express-underground-belt'),
+    ])
+    lanes = 8
+    start = len(builder.entities)
+    y = origin_y
+    segment = 0
+    while len(builder.entities) - start < budget:
+        for lane in range(lanes):
+            x = origin_x + lane + (lane // 2) + 0.5
+            if segment % 20 == 19:
+                builder.add(tier[1], x, y + 0.5, direction=0, type='output')
+            elif segment % 20 == 16:
+                builder.add(tier[1], x, y + 0.5, direction=0, type='input')
+            elif segment % 20 in (17, 18):
+                continue
+            else:
+                builder.add(tier[0], x, y + 0.5, direction=0)
+        y -= 1
+        segment += 1
+
+
+def solar_field(builder, budget):
+    # Substation-covered tiles of 24 solar panels beside a block of 21 accumulators
+    origin_x, origin_y = builder.next_origin()
+    start = len(builder.entities)
+    tile = 0
+    tiles_per_row = 8
+    while len(builder.entities) - start < budget:
+        tile_x = origin_x + (tile % tiles_per_row) * 22
+        tile_y = origin_y + (tile // tiles_per_row) * 16
+        for index in range(25):
+            column, row = index % 5, index // 5
+            if (column, row) == (3, 3):
+                builder.add('substation', tile_x + 10, tile_y + 10)
+            else:
+                builder.add('solar-panel', tile_x + column * 3 + 1.5, tile_y + row * 3 + 1.5)
+        for index in range(21):
+            builder.add('accumulator', tile_x + 16 + (index % 3) * 2, tile_y + (index // 3) * 2 + 1)
+        tile += 1
+
+
+def rail_grid(builder, budget):
+    # Parallel double-track lines of straight rail with signals every few segments.
+    # No train stops: the grid is through-traffic only.
+    origin_x, origin_y = builder.next_origin()
+    start = len(builder.entities)
+    line = 0
+    while len(builder.entities) - start < budget:
+        x = origin_x + line * 12
+        for segment in range(100):
+            if len(builder.entities) - start >= budget:
+                break
+            y = origin_y + segment * 2 + 1
+            builder.add('straight-rail', x + 1, y)
+            builder.add('straight-rail', x + 5, y, direction=4)
+            if segment % 6 == 0:
+                builder.add('rail-signal', x - 0.5, y + 0.5, direction=4)
+                builder.add('rail-chain-signal', x + 6.5, y + 0.5)
+        line += 1
+
+
+def splitter_balancers(builder, budget):
+    # Rows of 4-lane balancers: splitters in two staggered ranks with belts between them
+    origin_x, origin_y = builder.next_origin()
+    start = len(builder.entities)
+    block = 0
+    while len(builder.entities) - start < budget:
+        x = origin_x + (block % 16) * 6
+        y = origin_y + (block // 16) * 8
+        for lane in range(4):
+            builder.add('transport-belt', x + lane + 0.5, y + 0.5, direction=0)
+        builder.add('splitter', x + 1, y - 0.5, direction=0)
+        builder.add('splitter', x + 3, y - 0.5, direction=0)
+        for lane in range(4):
+            builder.add('transport-belt', x + lane + 0.5, y - 1.5, direction=0)
+        builder.add('splitter', x + 2, y - 2.5, direction=0)
+        builder.add('transport-belt', x + 0.5, y - 2.5, direction=0)
+        builder.add('transport-belt', x + 3.5, y - 2.5, direction=0)
+        for lane in range(4):
+            builder.add('transport-belt', x + lane + 0.5, y - 3.5, direction=0)
+        block += 1
+
+
+LAYOUTS = {
+    'smelter_columns': smelter_columns,
+    'belt_bus': belt_bus,
+    'solar_field': solar_field,
+    'rail_grid': rail_grid,
+    'splitter_balancers': splitter_balancers,
+}
+
+
+def generate_blueprint(entity_count, seed=0):
+    # Returns blueprint JSON with about `entity_count` entities made of the layouts above.
+    # The same count and seed always produce the same blueprint.
+    builder = BlueprintBuilder(random.Random(seed))
+    for layout, share in LAYOUT_SHARES:
+        LAYOUTS[layout](builder, max(1, int(entity_count * share)))
+    return {
+        'blueprint': {
+            'icons': [{'signal': {'type': 'item', 'name': 'transport-belt'}, 'index': 1}],
+            'entities': builder.entities,
+            'item': 'blueprint',
+            'label': f"Synthetic {entity_count}",
+            'version': BLUEPRINT_VERSION,
+        }
+    }
+
+
+def encode_blueprint(blueprint_data):
+    # Inverse of parse_blueprint: JSON, zlib level 9, base64, version prefix '0'
+    return '0' + base64.b64encode(zlib.compress(json.dumps(blueprint_data, separators=(',', ':')).encode(), 9)).decode()
+
+
+def generate_blueprint_string(entity_count, seed=0):
+    return encode_blueprint(generate_blueprint(entity_count, seed))
@@ -0,0 +1,215 @@
+import asyncio
+import json
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+
+from Main import analyze_server_batch, init_batch_worker, warm_worker
+
+# The HTTP front end behind `Main.py serve`. It lives apart from Main so that headless
+# runs never import asyncio.
+
+
+class ServerBusy(Exception):
+    pass
+
+
+class AnalysisServer:
+    # Local HTTP/JSON front end to the analyzers:
+    #
+    #   GET  /health   -> {"status": "ok", "workers": ..., "pending": ..., "max_pending": ...}
+    #   POST /analyze  {"blueprint": "0eNq..."}       -> one batch-style record plus "report"
+    #   POST /analyze  {"blueprints": ["0eNq...", ...]} -> {"results": [record, ...]}
+    #
+    # Blueprint strings from concurrent requests are queued and handed to a pre-warmed
+    # process pool in batches of up to max_batch, one batch per idle worker. Requests
+    # that would take more than max_pending strings in flight get 503 with Retry-After;
+    # a single request holding more than max_pending strings gets 413.
+
+    # Seconds to keep reading what a client still sends after the response, see _linger
+    linger_timeout = 2
+
+    def __init__(self, workers=1, cache_dir=None, max_pending=256, max_batch=16, batch_window=0.005,
+                 max_body_bytes=16 << 20, read_timeout=30):
+        self.workers = max(1, workers)
+        self.cache_dir = cache_dir
+        self.max_pending = max_pending
+        self.max_batch = max_batch
+        self.batch_window = batch_window
+        self.max_body_bytes = max_body_bytes
+        self.read_timeout = read_timeout
+        self.pending = 0
+        self.executor = None
+        self.server = None
+        self.queue = None
+        self.dispatcher = None
+        self.batches = set()
+
+    async def start(self, host='127.0.0.1', port=8765):
+        # Starts the workers and begins listening; returns the bound (host, port), which
+        # tells callers the real port when `port` is 0
+        loop = asyncio.get_running_loop()
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=init_batch_worker, initargs=(self.cache_dir,))
+        await asyncio.gather(*(loop.run_in_executor(self.executor, warm_worker) for _ in range(self.workers)))
+        self.queue = asyncio.Queue()
+        self.slots = asyncio.Semaphore(self.workers)
+        self.dispatcher = asyncio.ensure_future(self._dispatch())
+        self.server = await asyncio.start_server(self._handle_connection, host, port)
+        return self.server.sockets[0].getsockname()[:2]
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        if self.dispatcher is not None:
+            self.dispatcher.cancel()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def serve_forever(self, host='127.0.0.1', port=8765):
+        try:
+            host, port = await self.start(host, port)
+            print(f"Serving blueprint analysis on http://{host}:{port} with {self.workers} worker(s)", file=sys.stderr)
+            await self.server.serve_forever()
+        finally:
+            await self.close()
+
+    async def analyze(self, blueprint_strings):
+        # Returns a record per blueprint string, in order. Raises ServerBusy instead of
+        # queueing past max_pending.
+        if self.pending + len(blueprint_strings) > self.max_pending:
+            raise ServerBusy()
+        loop = asyncio.get_running_loop()
+        futures = []
+        for index, blueprint_string in enumerate(blueprint_strings):
+            future = loop.create_future()
+            self.queue.put_nowait(((index, blueprint_string), future))
+            futures.append(future)
+        self.pending += len(futures)
+        return await asyncio.gather(*futures)
+
+    async def _dispatch(self):
+        while True:
+            batch = [await self.queue.get()]
+            # Waiting for an idle worker first lets requests pile up into larger
+            # batches while the pool is busy
+            await self.slots.acquire()
+            if self.queue.qsize() < self.max_batch - 1 and self.batch_window:
+                await asyncio.sleep(self.batch_window)
+            while len(batch) < self.max_batch and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            task = asyncio.ensure_future(self._run_batch(batch))
+            self.batches.add(task)
+            task.add_done_callback(self.batches.discard)
+
+    async def _run_batch(self, batch):
+        loop = asyncio.get_running_loop()
+        try:
+            records = await loop.run_in_executor(self.executor, analyze_server_batch, [job for job, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for (_, future), record in zip(batch, records):
+                if not future.done():
+                    future.set_result(record)
+        finally:
+            self.pending -= len(batch)
+            self.slots.release()
+
+    async def _handle_connection(self, reader, writer):
+        headers = {}
+        try:
+            try:
+                status, payload = await self._handle_request(reader, writer)
+            except asyncio.TimeoutError:
+                status, payload = 408, {'error': "Timed out reading the request"}
+            except ServerBusy:
+                status, payload = 503, {'error': "Too many blueprints queued, retry shortly"}
+                headers['Retry-After'] = '1'
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+                status, payload = 400, {'error': "Malformed HTTP request"}
+            except Exception as e:
+                status, payload = 500, {'error': f"{type(e).__name__}: {e}"}
+            self._write_response(writer, status, payload, headers)
+            await writer.drain()
+            await self._linger(reader, writer)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _linger(self, reader, writer):
+        # Errors like 411 and 413 are sent before the body is read. Closing with unread
+        # data makes the kernel reset the connection, often before the client has read
+        # the response, so half-close instead and discard the rest until the client
+        # closes its end or linger_timeout runs out.
+        if not writer.can_write_eof():
+            return
+        writer.write_eof()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.linger_timeout
+        try:
+            while await asyncio.wait_for(reader.read(1 << 16), max(0, deadline - loop.time())):
+                pass
+        except asyncio.TimeoutError:
+            pass
+
+    async def _handle_request(self, reader, writer):
+        # Only reading the request is subject to read_timeout, not the analysis
+        
+        def read(awaitable):
+            return asyncio.wait_for(awaitable, self.read_timeout)
+        
+        method, target, _ = (await read(reader.readline())).decode('latin-1').split(' ', 2)
+        headers = {}
+        while True:
+            line = (await read(reader.readline())).decode('latin-1').strip()
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        path = target.split('?', 1)[0]
+        
+        if path == '/health':
+            if method != 'GET':
+                return 405, {'error': "Use GET for /health"}
+            return 200, {'status': 'ok', 'workers': self.workers, 'pending': self.pending, 'max_pending': self.max_pending}
+        if path != '/analyze':
+            return 404, {'error': f"No such endpoint: {path}"}
+        if method != 'POST':
+            return 405, {'error': "Use POST for /analyze"}
+        
+        if 'content-length' not in headers:
+            return 411, {'error': "Content-Length is required"}
+        length = int(headers['content-length'])
+        if length > self.max_body_bytes:
+            return 413, {'error': f"Request body is larger than {self.max_body_bytes} bytes"}
+        if headers.get('expect', '').lower() == '100-continue':
+            writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+        try:
+            request = json.loads(await read(reader.readexactly(length)))
+        except json.JSONDecodeError as e:
+            return 400, {'error': f"Invalid JSON: {e}"}
+        
+        if isinstance(request, dict) and isinstance(request.get('blueprint'), str):
+            record = (await self.analyze([request['blueprint']]))[0]
+            return (200 if record['ok'] else 422), record
+        if isinstance(request, dict) and isinstance(request.get('blueprints'), list) and \
+           all(isinstance(blueprint_string, str) for blueprint_string in request['blueprints']):
+            # More than max_pending could never be queued, however long the client waits
+            if len(request['blueprints']) > self.max_pending:
+                return 413, {'error': f"A request may hold at most {self.max_pending} blueprints"}
+            return 200, {'results': await self.analyze(request['blueprints'])}
+        return 400, {'error': 'Expected {"blueprint": "..."} or {"blueprints": ["...", ...]}'}
+
+    def _write_response(self, writer, status, payload, headers):
+        body = json.dumps(payload).encode()
+        head = f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n" \
+               f"Content-Type: application/json\r\n" \
+               f"Content-Length: {len(body)}\r\n" \
+               f"Connection: close\r\n"
+        for name, value in headers.items():
+            head += f"{name}: {value}\r\n"
+        writer.write(head.encode('latin-1') + b"\r\n" + body)
@@ -0,0 +1,28 @@
+# Blueprints built by hand for the tests
+
+# Factorio 1.1 and 2.0 blueprint version numbers; 2.0 switches to 16-way directions and `wires`
+VERSION_1 = 281479275151360
+VERSION_2 = 2 << 48
+
+
+def entity(number, name, x, y, **fields):
+    placed = {'entity_number': number, 'name': name, 'position': {'x': x, 'y': y}}
+    placed.update(fields)
+    return placed
+
+
+def blueprint(entities, version=VERSION_1, **fields):
+    return {'blueprint': dict(fields, entities=entities, version=version)}
+
+
+def gear_line():
+    # A yellow belt running south, an inserter taking from it into a gear assembler,
+    # and a fast inserter putting the gears on a red belt running north
+    entities = [entity(number + 1, 'transport-belt', 0.5, number + 0.5, direction=4) for number in range(3)]
+    entities += [
+        entity(4, 'inserter', 1.5, 1.5, direction=6),
+        entity(5, 'assembling-machine-2', 3.5, 1.5, recipe='iron-gear-wheel'),
+        entity(6, 'fast-inserter', 5.5, 1.5, direction=6),
+    ]
+    entities += [entity(number + 7, 'fast-transport-belt', 6.5, number + 0.5, direction=0) for number in range(3)]
+    return blueprint(entities)
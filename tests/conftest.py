@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The tests import Main and the benchmarks' synthetic blueprints, neither of which is installed
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
@@ -0,0 +1,68 @@
+import Main
+from synthetic_blueprints import generate_blueprint_string
+
+
+def test_cache_round_trip_and_invalidation(tmp_path, monkeypatch):
+    blueprint_string = generate_blueprint_string(100)
+    results = Main.analyze_string(blueprint_string)
+    cache = Main.AnalysisCache(str(tmp_path))
+    cache.put('results', blueprint_string, results)
+    assert Main.cached_results(blueprint_string, cache) == results
+    # Read back from disk by a fresh cache
+    assert Main.cached_results(blueprint_string, Main.AnalysisCache(str(tmp_path))) == results
+
+    # Editing the analyzers changes the fingerprint the entries are keyed on
+    monkeypatch.setattr(Main, '_analyzer_fingerprint', 'edited')
+    assert Main.cached_results(blueprint_string, Main.AnalysisCache(str(tmp_path))) is None
+    assert Main.cached_results(blueprint_string, cache) is None
+
+
+def test_analyze_string_uses_cache():
+    blueprint_string = generate_blueprint_string(100)
+    cache = Main.AnalysisCache()
+    results = Main.analyze_string(blueprint_string, cache)
+    assert cache.get('results', blueprint_string) == results
+    assert cache.get('blueprint', blueprint_string) == Main.parse_blueprint(blueprint_string)
+
+
+def test_memory_tier_weighs_decoded_blueprints():
+    blueprint_string = generate_blueprint_string(1000)
+    cache = Main.AnalysisCache()
+    cache.put('blueprint', blueprint_string, Main.parse_blueprint(blueprint_string))
+    # Charged for the decoded dict, tens of times the string, not the compressed JSON
+    assert cache.memory_bytes == len(blueprint_string) * Main.DECODED_BYTES_PER_CHARACTER
+    assert cache.memory_bytes > 40 * len(blueprint_string)
+
+
+def test_memory_tier_evicts_least_recently_used():
+    blueprint_strings = [generate_blueprint_string(1000, seed) for seed in range(4)]
+    entry_size = max(len(blueprint_string) for blueprint_string in blueprint_strings) * Main.DECODED_BYTES_PER_CHARACTER
+    cache = Main.AnalysisCache(max_memory_bytes=entry_size * 5 // 2)
+    first, second, third, fourth = blueprint_strings
+    cache.put('blueprint', first, Main.parse_blueprint(first))
+    cache.put('blueprint', second, Main.parse_blueprint(second))
+    # Using the first makes the second the least recently used
+    assert cache.get('blueprint', first) is not None
+    cache.put('blueprint', third, Main.parse_blueprint(third))
+    assert cache.get('blueprint', second) is None
+    assert cache.get('blueprint', first) is not None
+    assert cache.get('blueprint', third) is not None
+    assert cache.memory_bytes <= cache.max_memory_bytes
+
+    # An entry larger than the whole budget isn't kept
+    small = Main.AnalysisCache(max_memory_bytes=1000)
+    small.put('blueprint', fourth, Main.parse_blueprint(fourth))
+    assert small.get('blueprint', fourth) is None
+    assert small.memory_bytes == 0
+
+
+def test_memory_only_cache_writes_no_files(tmp_path, monkeypatch):
+    # Without a directory nothing is serialized
+    def fail(*args, **kwargs):
+        raise AssertionError("serialized without a disk tier")
+
+    blueprint_string = generate_blueprint_string(100)
+    monkeypatch.setattr(Main.zlib, 'compress', fail)
+    cache = Main.AnalysisCache()
+    cache.put('blueprint', blueprint_string, Main.parse_blueprint(blueprint_string))
+    assert cache.get('blueprint', blueprint_string) is not None
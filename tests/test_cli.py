@@ -0,0 +1,50 @@
+import json
+import os
+import tracemalloc
+
+import Main
+from synthetic_blueprints import encode_blueprint, generate_blueprint, generate_blueprint_string
+
+
+def test_batch_memory_dump_without_blueprints(tmp_path):
+    # Nothing reaches a profiled stage, so tracing has to be started up front
+    dump = tmp_path / 'memory.dump'
+    try:
+        assert Main.main(['batch', os.devnull, '--memory-dump', str(dump)]) == 0
+    finally:
+        tracemalloc.stop()
+    assert tracemalloc.Snapshot.load(str(dump)) is not None
+
+
+def book_string():
+    return encode_blueprint({'blueprint_book': {'label': 'Book', 'blueprints': [
+        dict(generate_blueprint(200, seed), index=seed) for seed in range(3)
+    ]}})
+
+
+def test_analyze_spreads_a_book_across_workers(tmp_path, capsys, monkeypatch):
+    path = tmp_path / 'book.txt'
+    path.write_text(book_string())
+    expected = Main.analyze_blueprints(Main.parse_blueprint(book_string()), max_workers=1)
+    used = []
+    analyze_blueprints = Main.analyze_blueprints
+
+    def spy(blueprint_data, max_workers=None, analyzers=None):
+        used.append(max_workers)
+        return analyze_blueprints(blueprint_data, max_workers, analyzers)
+
+    monkeypatch.setattr(Main, 'analyze_blueprints', spy)
+    assert Main.main(['analyze', str(path), '--json', '--workers', '2']) == 0
+    printed = json.loads(capsys.readouterr().out)
+    assert used == [2]
+    assert [[entry['label'], entry['results']] for entry in printed['blueprints']] == [list(labelled) for labelled in json.loads(json.dumps(expected))]
+
+
+def test_analyze_streams_a_single_blueprint(tmp_path, capsys, monkeypatch):
+    blueprint_string = generate_blueprint_string(200)
+    path = tmp_path / 'blueprint.txt'
+    path.write_text(blueprint_string)
+    monkeypatch.setattr(Main, 'analyze_blueprints', None)
+    assert Main.main(['analyze', str(path), '--json']) == 0
+    printed = json.loads(capsys.readouterr().out)
+    assert printed['results'] == json.loads(json.dumps(Main.run_analysis(Main.parse_blueprint(blueprint_string))))
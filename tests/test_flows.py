@@ -0,0 +1,90 @@
+import copy
+
+import pytest
+
+from blueprints import blueprint, entity, gear_line
+
+import Main
+
+
+def solved(blueprint_data):
+    context = Main.AnalysisContext(blueprint_data)
+    context.table.extend(context.entities)
+    context.finish_pass()
+    return Main.ItemFlows(context.table, context.belt_graph, context.sixteen_way_directions).solve()
+
+
+def test_solver_rates_on_gear_line():
+    flows = solved(gear_line())
+    # Assembler 2 crafts at 0.75: gears take 2 plates per 0.5 s craft
+    assert flows.inserter_rates == {3: pytest.approx(3.0), 5: pytest.approx(1.5)}
+    # Plates are taken off the middle tile of the first belt, gears put on the middle
+    # of the second and carried north
+    assert flows.belt_loads == {
+        0: pytest.approx(3.0), 1: pytest.approx(3.0),
+        7: pytest.approx(1.5), 6: pytest.approx(1.5),
+    }
+    assert flows.overloaded_inserters() == [(3, pytest.approx(3.0), Main.INSERTER_RATES['inserter'])]
+    assert flows.unknown_recipes == 0
+
+
+def test_solver_skips_unknown_recipes():
+    blueprint_data = gear_line()
+    blueprint_data['blueprint']['entities'][4]['recipe'] = 'no-such-recipe'
+    flows = solved(blueprint_data)
+    assert flows.inserter_rates == {}
+    assert flows.belt_loads == {}
+    assert flows.unknown_recipes == 1
+
+
+def smelting(furnaces, drills):
+    # Stone furnaces in a row, fed by electric drills that aren't connected to them
+    entities = [entity(number + 1, 'stone-furnace', number * 2 + 1, 1) for number in range(furnaces)]
+    entities += [entity(furnaces + number + 1, 'electric-mining-drill', number * 3 + 1.5, 5.5) for number in range(drills)]
+    return blueprint(entities)
+
+
+def test_balancing_flags_intermediates_used_faster_than_made():
+    blueprint_data = blueprint([
+        entity(1, 'stone-furnace', 1, 1),
+        entity(2, 'assembling-machine-2', 4.5, 1.5, recipe='iron-gear-wheel'),
+        entity(3, 'assembling-machine-2', 8.5, 1.5, recipe='iron-gear-wheel'),
+    ])
+    # Each assembler crafts 1.5 gears/s from 3 plates/s; the furnace smelts 1/3.2 plates/s
+    assert Main.analyze_production_balancing(blueprint_data) == [
+        "Machines here use 6.00 iron-plate/s but make only 0.31/s. Add iron-plate production or bring more in.",
+    ]
+
+    # Items that are only made or only used, like the gears and the ore, are inputs and outputs
+    blueprint_data['blueprint']['entities'][2]['recipe'] = 'copper-cable'
+    blueprint_data['blueprint']['entities'][1]['recipe'] = 'copper-cable'
+    assert Main.analyze_production_balancing(blueprint_data) == []
+
+
+def test_balancing_compares_drills_with_smelting():
+    # Two furnaces smelt 0.625 ore/s, a drill mines 0.5/s
+    assert Main.analyze_production_balancing(smelting(2, 1)) == [
+        "Furnaces and machines here use 0.62 ore/s but the drills mine only 0.50/s. Add drills or bring in more ore.",
+    ]
+    assert Main.analyze_production_balancing(smelting(2, 2)) == []
+    # Modules count: two speed modules make the drill mine 1/s
+    blueprint_data = smelting(2, 1)
+    blueprint_data['blueprint']['entities'][2]['items'] = {'speed-module-3': 2}
+    assert Main.analyze_production_balancing(blueprint_data) == []
+
+
+def test_balancing_follows_incremental_edits():
+    blueprint_data = smelting(8, 5)
+    session = Main.IncrementalAnalysis([Main.ProductionBalancingAnalyzer])
+    assert session.analyze(blueprint_data) == Main.run_analysis(blueprint_data, [Main.ProductionBalancingAnalyzer])
+    for edit in ('remove_drill', 'add_furnace', 'module'):
+        blueprint_data = copy.deepcopy(blueprint_data)
+        entities = blueprint_data['blueprint']['entities']
+        if edit == 'remove_drill':
+            del entities[9]
+        elif edit == 'add_furnace':
+            entities.insert(3, entity(100, 'steel-furnace', 1, 10))
+        else:
+            entities[0]['items'] = {'productivity-module': 2}
+        assert session.analyze(blueprint_data) == Main.run_analysis(blueprint_data, [Main.ProductionBalancingAnalyzer]), edit
+        assert session.context is not None
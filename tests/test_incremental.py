@@ -0,0 +1,87 @@
+import copy
+
+import pytest
+
+from blueprints import VERSION_2, entity
+
+import Main
+from synthetic_blueprints import generate_blueprint
+
+
+def edits():
+    # Edits to a blueprint's entity list, each small enough to be applied incrementally
+    def move(entities):
+        entities[40]['position'] = {'x': entities[40]['position']['x'] + 1, 'y': entities[40]['position']['y']}
+
+    def rotate(entities):
+        belt = next(placed for placed in entities if placed['name'] == 'transport-belt')
+        belt['direction'] = (belt.get('direction', 0) + 2) % 8
+
+    def rename(entities):
+        entities[120]['name'] = 'fast-inserter'
+
+    def modules(entities):
+        machine = next(placed for placed in entities if placed['name'] in Main.CRAFTING_SPEEDS)
+        machine['items'] = {'speed-module': 2}
+
+    def insert(entities):
+        added = copy.deepcopy(entities[200])
+        added['entity_number'] = 10 ** 6
+        added['position'] = {'x': added['position']['x'], 'y': added['position']['y'] + 1}
+        entities.insert(100, added)
+
+    def delete(entities):
+        del entities[150]
+
+    def delete_pole(entities):
+        entities.remove(next(placed for placed in entities if placed['name'] in Main.POWER_POLES))
+
+    def append(entities):
+        entities.append(entity(10 ** 6 + 1, 'inserter', -3.5, -3.5, direction=2))
+
+    return [move, rotate, rename, modules, insert, delete, delete_pole, append]
+
+
+@pytest.mark.parametrize('seed', [0, 3])
+def test_incremental_matches_full(seed):
+    blueprint_data = generate_blueprint(1000, seed)
+    session = Main.IncrementalAnalysis()
+    assert session.analyze(blueprint_data) == Main.run_analysis(blueprint_data)
+    for edit in edits():
+        blueprint_data = copy.deepcopy(blueprint_data)
+        edit(blueprint_data['blueprint']['entities'])
+        assert session.analyze(blueprint_data) == Main.run_analysis(blueprint_data), edit.__name__
+        # The edit was applied as a delta, not by starting over
+        assert session.context is not None
+
+
+def test_incremental_follows_wire_changes():
+    poles = [entity(number + 1, 'small-electric-pole', number * 5 + 0.5, 0.5) for number in range(30)]
+    blueprint_data = {'blueprint': {
+        'entities': poles + [entity(31, 'assembling-machine-1', 2.5, 2.5, recipe='iron-gear-wheel')],
+        'wires': [[number, 5, number + 1, 5] for number in range(1, 30)],
+        'version': VERSION_2,
+    }}
+    session = Main.IncrementalAnalysis()
+    session.analyze(blueprint_data)
+
+    blueprint_data = copy.deepcopy(blueprint_data)
+    del blueprint_data['blueprint']['wires'][10]
+    results = session.analyze(blueprint_data)
+    assert results == Main.run_analysis(blueprint_data)
+    assert any("form 2 separate electric networks" in suggestion for suggestion in results['power_efficiency'])
+
+
+def test_row_renumbering_copies_unchanged_spans():
+    # Row 2 removed and an entity added after row 3; rows 0, 1, 4 and 5 keep their place
+    renumbering = Main.RowRenumbering([0, 1, 3, None, 4, 5], 6)
+    assert (renumbering.start, renumbering.old_end, renumbering.new_end) == (2, 4, 4)
+    assert renumbering.new_rows == [0, 1, None, 2, 4, 5]
+    assert renumbering.added() == [3]
+    assert renumbering.removed() == [2]
+    assert not renumbering.reordered
+    assert renumbering.column([10, 11, 12, 13, 14, 15], 0) == [10, 11, 13, 0, 14, 15]
+    assert renumbering.keys({2: 'a', 3: 'b', 5: 'c'}) == {2: 'b', 5: 'c'}
+    assert renumbering.values({'x': 2, 'y': 3}) == {'y': 2}
+    links = {0: [2, 3], 1: [2], 5: {3, 4}}
+    assert renumbering.lists(links) == {0: [2], 5: {2, 4}}
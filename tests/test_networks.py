@@ -0,0 +1,57 @@
+from blueprints import blueprint, entity, gear_line
+
+import Main
+
+
+def test_row_networks_join_neighbours():
+    links = {0: [1], 1: [2], 3: [4], 5: []}
+
+    def neighbours(row):
+        return links.get(row, []) + [other for other, targets in links.items() if row in targets]
+
+    networks = Main.RowNetworks(range(6), neighbours)
+    assert networks.groups() == [[0, 1, 2], [3, 4], [5]]
+
+    # Cutting the link between 0 and 1 splits their network
+    links[0] = []
+    networks.update({0, 1}, neighbours, lambda row: True)
+    assert networks.groups() == [[1, 2], [3, 4], [0], [5]]
+    assert networks.network_of[1] == networks.network_of[2] != networks.network_of[0]
+
+
+def test_union_find_groups():
+    sets = Main.UnionFind('abcde')
+    sets.union('a', 'c')
+    sets.union('d', 'e')
+    sets.union('c', 'e')
+    assert sets.groups() == [['a', 'c', 'd', 'e'], ['b']]
+
+
+def test_belt_network_count_is_status_not_suggestion():
+    results = Main.run_analysis(gear_line())
+    assert "Belts form 2 separate network(s) (3, 3 tiles)." in results['status']['transport_optimization']
+    assert not any("separate network" in suggestion for suggestion in results['transport_optimization'])
+
+
+def belt_loop_corner():
+    # Belts running south, then east, with nothing loading or unloading them
+    entities = [entity(number + 1, 'transport-belt', 0.5, number + 0.5, direction=4) for number in range(3)]
+    entities += [entity(number + 4, 'transport-belt', number + 0.5, 3.5, direction=2) for number in range(5)]
+    return blueprint(entities)
+
+
+def test_belts_without_inserters_pass_items_through():
+    results = Main.run_analysis(belt_loop_corner())
+    assert not any("Belt" in suggestion for suggestion in results['transport_optimization'])
+    assert "1 belt network(s) (8 tiles) have no inserter or drill on them and are taken to pass items through." \
+        in results['status']['transport_optimization']
+
+
+def test_output_belt_leaving_the_blueprint_is_not_a_dead_end():
+    assert not any("dead end" in suggestion for suggestion in Main.run_analysis(gear_line())['transport_optimization'])
+
+    # With a chest past its end, the gear belt stops inside the blueprint
+    blueprint_data = gear_line()
+    blueprint_data['blueprint']['entities'].append(entity(10, 'wooden-chest', 6.5, -5.5))
+    assert "Belt at (6.5, 0.5) is a dead end: items are loaded onto its network but nothing takes them off." \
+        in Main.run_analysis(blueprint_data)['transport_optimization']
@@ -0,0 +1,93 @@
+import asyncio
+import json
+
+import Main
+import server
+from synthetic_blueprints import generate_blueprint_string
+
+
+async def request(port, method, path, body=None, headers=None):
+    # (status, headers, decoded JSON) for one request to the server on localhost
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    head = f"{method} {path} HTTP/1.1\r\nHost: localhost\r\n"
+    if body is not None:
+        head += f"Content-Length: {len(body)}\r\n"
+    for name, value in (headers or {}).items():
+        head += f"{name}: {value}\r\n"
+    writer.write(head.encode('latin-1') + b"\r\n" + (body or b''))
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, payload = response.partition(b"\r\n\r\n")
+    status_line, *header_lines = head.decode('latin-1').split("\r\n")
+    response_headers = dict(line.split(': ', 1) for line in header_lines)
+    return int(status_line.split(' ')[1]), response_headers, json.loads(payload)
+
+
+def serve(test, **options):
+    # Runs `test(server, port)` against a server started on a free localhost port
+    async def run():
+        analysis_server = server.AnalysisServer(workers=1, **options)
+        _, port = await analysis_server.start('127.0.0.1', 0)
+        try:
+            await test(analysis_server, port)
+        finally:
+            await analysis_server.close()
+
+    asyncio.run(run())
+
+
+def test_health_and_analyze():
+    blueprint_string = generate_blueprint_string(200)
+
+    async def test(analysis_server, port):
+        status, _, health = await request(port, 'GET', '/health')
+        assert status == 200
+        assert health == {'status': 'ok', 'workers': 1, 'pending': 0, 'max_pending': 256}
+
+        status, _, record = await request(port, 'POST', '/analyze', json.dumps({'blueprint': blueprint_string}).encode())
+        assert status == 200
+        expected = Main.run_analysis(Main.parse_blueprint(blueprint_string))
+        assert record['ok'] and record['results'] == json.loads(json.dumps(expected))
+        assert record['report'] == Main.generate_optimization_report(expected)
+
+        status, _, record = await request(port, 'POST', '/analyze', json.dumps({'blueprint': 'not a blueprint'}).encode())
+        assert status == 422 and not record['ok']
+
+        status, _, batch = await request(port, 'POST', '/analyze', json.dumps({'blueprints': [blueprint_string, 'x']}).encode())
+        assert status == 200
+        assert [record['ok'] for record in batch['results']] == [True, False]
+
+        status, _, _ = await request(port, 'GET', '/analyze')
+        assert status == 405
+
+    serve(test)
+
+
+def test_rejects_oversized_requests():
+    async def test(analysis_server, port):
+        # Answered before the body is read, which the client can still send in full
+        status, _, error = await request(port, 'POST', '/analyze', b'x' * (1 << 20))
+        assert status == 413 and '1000 bytes' in error['error']
+
+        status, _, _ = await request(port, 'POST', '/analyze', headers={'Transfer-Encoding': 'chunked'})
+        assert status == 411
+
+        # More strings than could ever be queued isn't worth retrying
+        status, headers, error = await request(port, 'POST', '/analyze', json.dumps({'blueprints': ['x'] * 3}).encode())
+        assert status == 413 and 'Retry-After' not in headers
+
+    serve(test, max_body_bytes=1000, max_pending=2)
+
+
+def test_busy_server_asks_to_retry():
+    async def test(analysis_server, port):
+        analysis_server.pending = analysis_server.max_pending
+        status, headers, _ = await request(port, 'POST', '/analyze', json.dumps({'blueprint': 'x'}).encode())
+        assert status == 503 and headers['Retry-After'] == '1'
+
+        analysis_server.pending = 0
+        status, _, _ = await request(port, 'POST', '/analyze', json.dumps({'blueprint': 'x'}).encode())
+        assert status == 422
+
+    serve(test, max_pending=2)
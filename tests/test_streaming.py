@@ -0,0 +1,73 @@
+import copy
+
+import pytest
+
+from blueprints import VERSION_2, blueprint, entity
+
+import Main
+from synthetic_blueprints import encode_blueprint, generate_blueprint, generate_blueprint_string
+
+
+def parsed_results(blueprint_string):
+    # What analyze_string returns without the stream path
+    blueprint_data = Main.parse_blueprint(blueprint_string)
+    if 'blueprint' in blueprint_data:
+        return Main.run_analysis(blueprint_data)
+    return Main.analyze_blueprints(blueprint_data, max_workers=1)
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+@pytest.mark.parametrize('chunk_size', [Main.STREAM_CHUNK_SIZE, 97, 7])
+def test_stream_matches_parse_blueprint(seed, chunk_size):
+    blueprint_string = generate_blueprint_string(600, seed)
+    assert Main.analyze_stream(blueprint_string, chunk_size=chunk_size) == parsed_results(blueprint_string)
+
+
+def test_stream_reads_version_and_wires():
+    blueprint_data = blueprint([
+        entity(1, 'small-electric-pole', 0.5, 0.5),
+        entity(2, 'small-electric-pole', 10.5, 0.5),
+        entity(3, 'assembling-machine-1', 2.5, 2.5, recipe='iron-gear-wheel'),
+    ], VERSION_2, wires=[[1, 5, 2, 5]])
+    expected = Main.run_analysis(copy.deepcopy(blueprint_data))
+    assert Main.analyze_stream(encode_blueprint(blueprint_data), chunk_size=97) == expected
+
+    # Without the wire the poles are out of each other's reach
+    del blueprint_data['blueprint']['wires']
+    assert Main.analyze_stream(encode_blueprint(blueprint_data), chunk_size=97) != expected
+
+
+def nested_book():
+    # A book holding a blueprint, two planners and a nested book with a 2.0 blueprint
+    # and a broken one, its entries out of index order
+    broken = blueprint([entity(1, 'inserter', 0.5, 0.5)])
+    del broken['blueprint']['entities'][0]['position']
+    return {'blueprint_book': {'label': 'Outer', 'blueprints': [
+        dict(generate_blueprint(300, 1), index=2),
+        {'index': 0, 'upgrade_planner': {'settings': {'mappers': []}}},
+        {'index': 1, 'deconstruction_planner': {'settings': {}}},
+        {'index': 3, 'blueprint_book': {'label': 'Inner', 'blueprints': [
+            dict(blueprint([
+                entity(1, 'small-electric-pole', 0.5, 0.5),
+                entity(2, 'assembling-machine-1', 2.5, 2.5, recipe='iron-gear-wheel'),
+            ], VERSION_2, wires=[], label='Two'), index=0),
+            dict(broken, index=1),
+        ]}},
+    ]}}
+
+
+@pytest.mark.parametrize('chunk_size', [Main.STREAM_CHUNK_SIZE, 97])
+def test_stream_matches_parse_blueprint_for_nested_book(chunk_size):
+    blueprint_string = encode_blueprint(nested_book())
+    results = Main.analyze_stream(blueprint_string, chunk_size=chunk_size)
+    assert results == parsed_results(blueprint_string)
+    # Planners are skipped; the broken blueprint fails on its own
+    assert [label for label, _ in results] == ['Outer / Synthetic 300', 'Outer / Inner / Two', 'Outer / Inner / Blueprint 2']
+    assert 'error' in results[2][1] and 'error' not in results[0][1]
+
+
+def test_iter_blueprint_entities_walks_every_blueprint():
+    blueprint_string = encode_blueprint(nested_book())
+    entities = list(Main.iter_blueprint_entities(blueprint_string, chunk_size=97))
+    expected = [placed for _, blueprint_data in Main.iter_blueprints(Main.parse_blueprint(blueprint_string)) for placed in blueprint_data['blueprint']['entities']]
+    assert entities == expected
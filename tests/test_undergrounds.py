@@ -0,0 +1,82 @@
+import pytest
+
+from blueprints import entity
+
+import Main
+
+
+def pairs(entities, sixteen_way=False):
+    # pair_undergrounds over the entities, as entity numbers
+    table = Main.EntityTable.from_entities(entities)
+    paired, unpaired = Main.pair_undergrounds(table, sixteen_way)
+    numbers = table.numbers
+    return sorted((numbers[row], numbers[partner]) for row, partner in paired), sorted(numbers[row] for row in unpaired)
+
+
+def belt_line(name, direction, start, end, axis='x'):
+    # An input end at `start` and an output end at `end` along one axis
+    def position(coordinate):
+        return (coordinate + 0.5, 0.5) if axis == 'x' else (0.5, coordinate + 0.5)
+
+    return [
+        entity(1, name, *position(start), direction=direction, type='input'),
+        entity(2, name, *position(end), direction=direction, type='output'),
+    ]
+
+
+@pytest.mark.parametrize('name', sorted(set(Main.UNDERGROUND_MAX_SPANS) - {'pipe-to-ground'}))
+def test_belt_pair_at_max_span(name):
+    span = Main.UNDERGROUND_MAX_SPANS[name]
+    assert pairs(belt_line(name, 2, 0, span)) == ([(1, 2)], [])
+    assert pairs(belt_line(name, 2, 0, span + 1)) == ([], [1, 2])
+
+
+def test_belt_pair_running_backwards():
+    # Heading west the input end is the one further east
+    assert pairs(belt_line('underground-belt', 6, 4, 0)) == ([(1, 2)], [])
+    assert pairs(belt_line('underground-belt', 6, 0, 4)) == ([], [1, 2])
+    # and heading north, the one further south
+    assert pairs(belt_line('underground-belt', 0, 4, 0, axis='y')) == ([(1, 2)], [])
+
+
+def test_belts_pair_only_along_their_direction():
+    entities = belt_line('underground-belt', 2, 0, 3)
+    entities[1]['direction'] = 6
+    assert pairs(entities) == ([], [1, 2])
+
+
+def test_belts_pair_with_nearest_end_of_their_tier():
+    entities = belt_line('underground-belt', 2, 0, 4) + [
+        entity(3, 'fast-underground-belt', 2.5, 0.5, direction=2, type='output'),
+        entity(4, 'underground-belt', 6.5, 0.5, direction=2, type='input'),
+    ]
+    assert pairs(entities) == ([(1, 2)], [3, 4])
+
+
+@pytest.mark.parametrize('axis', ['x', 'y'])
+def test_pipe_to_ground_pairs(axis):
+    # The lower end's pipe connection faces away from the other end
+    lower, upper = (6, 2) if axis == 'x' else (0, 4)
+
+    def end(number, coordinate, direction):
+        x, y = (coordinate + 0.5, 0.5) if axis == 'x' else (0.5, coordinate + 0.5)
+        return entity(number, 'pipe-to-ground', x, y, direction=direction)
+
+    assert pairs([end(1, 0, lower), end(2, 10, upper)]) == ([(1, 2)], [])
+    assert pairs([end(1, 0, lower), end(2, 11, upper)]) == ([], [1, 2])
+    # Both facing the same way, or facing each other, don't connect underground
+    assert pairs([end(1, 0, upper), end(2, 5, upper)]) == ([], [1, 2])
+    assert pairs([end(1, 0, upper), end(2, 5, lower)]) == ([], [1, 2])
+
+
+def test_sixteen_way_directions():
+    # 2.0 numbers east 4 and south 8; odd directions have no underground axis
+    assert pairs(belt_line('underground-belt', 4, 0, 5), sixteen_way=True) == ([(1, 2)], [])
+    assert pairs(belt_line('underground-belt', 8, 0, 5, axis='y'), sixteen_way=True) == ([(1, 2)], [])
+    assert pairs([
+        entity(1, 'pipe-to-ground', 0.5, 0.5, direction=12),
+        entity(2, 'pipe-to-ground', 8.5, 0.5, direction=4),
+    ], sixteen_way=True) == ([(1, 2)], [])
+    assert pairs(belt_line('underground-belt', 5, 0, 5), sixteen_way=True) == ([], [])
+    # Read as 8-way, direction 4 is south, so the ends sit on different columns
+    assert pairs(belt_line('underground-belt', 4, 0, 5)) == ([], [1, 2])